@@ -0,0 +1,359 @@
+"""
+ExcelTool吞吐量基准测试
+每个用例在独立子进程中运行（峰值RSS互不影响），记录每次耗时和峰值内存，结果写入JSON；
+可与之前的结果对比，列出变慢超过阈值的用例
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from queue import Empty
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate_workbooks import (  # noqa: E402
+    DAILY_SHEET, DETAIL_SHEET, GENERATOR_VERSION, HEADER_ROW, STORE_SHEET, daily_days, ensure_workbook,
+)
+
+# write_cell 循环的最大次数
+WRITE_CELL_CALLS = 10000
+# write_daily_data 调用次数（一半更新已有日期，一半追加新日期）
+DAILY_CALLS = 500
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值常驻内存（MB）"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+
+# ========== 用例 ==========
+# 每个用例接收 (工作簿路径, 行数, 临时目录)，完成准备工作后返回被计时的函数
+
+
+def _tool():
+    from rpa_tools.excel_tools import ExcelTool
+    from rpa_tools.memo_cache import get_memo_cache
+    from rpa_tools.workbook_cache import get_workbook_cache
+    # 测的是解析本身，关闭结果缓存和工作簿缓存
+    get_memo_cache().enabled = False
+    get_workbook_cache().enabled = False
+    return ExcelTool()
+
+
+def _detail(tool, path):
+    return _check(tool.read_excel(path, sheet_name=DETAIL_SHEET, header=HEADER_ROW))["data"]
+
+
+def _check(result: Dict[str, Any]) -> Dict[str, Any]:
+    if result.get("status") != "success":
+        raise RuntimeError(result.get("message"))
+    return result
+
+
+def case_read_excel(path, rows, tmp):
+    tool = _tool()
+    return lambda: _check(tool.read_excel(path, sheet_name=DETAIL_SHEET, header=HEADER_ROW))
+
+
+def case_read_excel_chunked(path, rows, tmp):
+    tool = _tool()
+
+    def run():
+        result = _check(tool.read_excel(path, sheet_name=DETAIL_SHEET, header=HEADER_ROW,
+                                        chunksize=50000))
+        for _ in result["data"]:
+            pass
+    return run
+
+
+def case_write_excel(path, rows, tmp):
+    tool = _tool()
+    df = _detail(tool, path)
+    return lambda: _check(tool.write_excel(df, os.path.join(tmp, "out.xlsx")))
+
+
+def case_write_excel_streaming(path, rows, tmp):
+    tool = _tool()
+    df = _detail(tool, path)
+    return lambda: _check(tool.write_excel(df, os.path.join(tmp, "out_stream.xlsx"), streaming=True))
+
+
+def case_open_workbook(path, rows, tmp):
+    tool = _tool()
+
+    def run():
+        _check(tool.open_workbook(path, mode="edit"))
+        tool.close_workbook()
+    return run
+
+
+def case_open_workbook_read(path, rows, tmp):
+    tool = _tool()
+
+    def run():
+        _check(tool.open_workbook(path, mode="read"))
+        _check(tool.select_sheet(DETAIL_SHEET))
+        _check(tool.read_cell(HEADER_ROW + 2, 1))
+        tool.close_workbook()
+    return run
+
+
+def case_write_cell_loop(path, rows, tmp):
+    tool = _tool()
+    _check(tool.open_workbook(path, mode="edit"))
+    _check(tool.select_sheet(DETAIL_SHEET))
+    calls = min(rows, WRITE_CELL_CALLS)
+
+    def run():
+        for i in range(calls):
+            tool.write_cell(HEADER_ROW + 2 + i, 10, i)
+    return run
+
+
+def case_find_header_row(path, rows, tmp):
+    tool = _tool()
+    _check(tool.open_workbook(path, mode="edit"))
+    _check(tool.select_sheet(DETAIL_SHEET))
+
+    def run():
+        for _ in range(100):
+            _check(tool.find_header_row(["日期", "金额", "门店编号"]))
+    return run
+
+
+def case_write_daily_data(path, rows, tmp):
+    tool = _tool()
+    _check(tool.open_workbook(path, mode="edit"))
+    _check(tool.select_sheet(DAILY_SHEET))
+    days = daily_days(rows)
+    start = date(2020, 1, 1)
+    targets = [start + timedelta(days=i * days // DAILY_CALLS) for i in range(DAILY_CALLS // 2)]
+    targets += [start + timedelta(days=days + i) for i in range(DAILY_CALLS - len(targets))]
+
+    def run():
+        for i, target in enumerate(targets):
+            _check(tool.write_daily_data(target, i, "日期", "数值"))
+    return run
+
+
+def case_filter_data(path, rows, tmp):
+    tool = _tool()
+    df = _detail(tool, path)
+    return lambda: _check(tool.filter_data(df, "金额", ">", 500))
+
+
+def case_query_data(path, rows, tmp):
+    tool = _tool()
+    df = _detail(tool, path)
+    where = {"and": [["金额", ">", 500], ["区域", "in", ["华东", "华南"]], {"not": ["备注", "isnull"]}]}
+    return lambda: _check(tool.query_data(df, where=where, columns=["订单号", "金额"]))
+
+
+def case_merge_data(path, rows, tmp):
+    tool = _tool()
+    df = _detail(tool, path)
+    stores = _check(tool.read_excel(path, sheet_name=STORE_SHEET))["data"]
+    return lambda: _check(tool.merge_data(df, stores, on="门店编号"))
+
+
+def case_group_aggregate(path, rows, tmp):
+    tool = _tool()
+    df = _detail(tool, path)
+    return lambda: _check(tool.group_aggregate(df, "区域", "金额", "sum"))
+
+
+def case_group_aggregate_multi(path, rows, tmp):
+    tool = _tool()
+    df = _detail(tool, path)
+    aggregations = {"金额": ["sum", "mean", "max"], "门店编号": "approx_distinct"}
+    return lambda: _check(tool.group_aggregate(df, ["区域", "商品名称"], aggregations=aggregations))
+
+
+CASES: Dict[str, Callable] = {
+    "read_excel": case_read_excel,
+    "read_excel_chunked": case_read_excel_chunked,
+    "write_excel": case_write_excel,
+    "write_excel_streaming": case_write_excel_streaming,
+    "open_workbook": case_open_workbook,
+    "open_workbook_read": case_open_workbook_read,
+    "write_cell_loop": case_write_cell_loop,
+    "find_header_row": case_find_header_row,
+    "write_daily_data": case_write_daily_data,
+    "filter_data": case_filter_data,
+    "query_data": case_query_data,
+    "merge_data": case_merge_data,
+    "group_aggregate": case_group_aggregate,
+    "group_aggregate_multi": case_group_aggregate_multi,
+}
+
+
+# 按明细行数计算吞吐量的用例
+ROW_CASES = {"read_excel", "read_excel_chunked", "write_excel", "write_excel_streaming",
+             "open_workbook", "filter_data", "query_data", "merge_data", "group_aggregate",
+             "group_aggregate_multi"}
+
+
+# ========== 执行 ==========
+
+
+def _run_case(name: str, path: str, rows: int, repeat: int, queue):
+    """子进程: 每次重复都重新准备，只计时用例函数本身"""
+    try:
+        times, setup_rss = [], None
+        with tempfile.TemporaryDirectory() as tmp:
+            for _ in range(repeat):
+                run = CASES[name](path, rows, tmp)
+                if setup_rss is None:
+                    setup_rss = peak_rss_mb()
+                start = time.perf_counter()
+                run()
+                times.append(time.perf_counter() - start)
+                del run
+        queue.put({"status": "success", "times": times, "setup_rss_mb": setup_rss,
+                   "peak_rss_mb": peak_rss_mb()})
+    except Exception as e:
+        queue.put({"status": "error", "error": f"{type(e).__name__}: {e}"})
+
+
+def run_case(name: str, path: str, rows: int, repeat: int = 3,
+             timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    在独立子进程中运行一个用例
+
+    子进程被杀（如内存不足）或崩溃时不会写回结果，等待期间轮询子进程状态，
+    以退出码报告失败而不是一直等待；timeout 为整体超时（None=不限）。
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_case, args=(name, path, rows, repeat, queue))
+    process.start()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    outcome = None
+    while outcome is None:
+        wait = 1.0 if deadline is None else max(0.0, min(1.0, deadline - time.monotonic()))
+        try:
+            outcome = queue.get(timeout=wait)
+        except Empty:
+            if not process.is_alive():
+                try:
+                    outcome = queue.get(timeout=1.0)  # 退出前刚写入的结果
+                except Empty:
+                    outcome = {"status": "error", "exitcode": process.exitcode,
+                               "error": f"子进程异常退出（exitcode={process.exitcode}）"}
+            elif deadline is not None and time.monotonic() >= deadline:
+                process.terminate()
+                outcome = {"status": "error", "error": f"超时（{timeout}s）"}
+    process.join()
+
+    record = {"case": name, "rows": rows, "repeat": repeat, **outcome}
+    if outcome["status"] == "success":
+        times = outcome["times"]
+        record.update(min=min(times), median=statistics.median(times),
+                      rows_per_sec=rows / min(times) if name in ROW_CASES and min(times) else None)
+    return record
+
+
+def environment() -> Dict[str, Any]:
+    import numpy
+    import openpyxl
+    import pandas
+    env = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "openpyxl": openpyxl.__version__,
+        "generator_version": GENERATOR_VERSION,
+    }
+    try:
+        env["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                       text=True, timeout=10, cwd=REPO_ROOT).stdout.strip() or None
+    except Exception:
+        env["commit"] = None
+    return env
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> List[str]:
+    """与之前的结果对比，返回变慢超过阈值的用例说明"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["case"], r["rows"]): r for r in json.load(f)["results"]
+                    if r.get("status") == "success"}
+    regressions = []
+    for r in results:
+        old = baseline.get((r["case"], r["rows"]))
+        if r.get("status") != "success" or old is None:
+            continue
+        ratio = r["min"] / old["min"] if old["min"] else float("inf")
+        r["baseline_min"] = old["min"]
+        r["ratio"] = round(ratio, 3)
+        if ratio > threshold:
+            regressions.append(f"{r['case']} ({r['rows']} 行): {old['min']:.3f}s -> {r['min']:.3f}s (x{ratio:.2f})")
+    return regressions
+
+
+def main(argv=None):
+    """命令行: 运行基准测试"""
+    parser = argparse.ArgumentParser(description="ExcelTool吞吐量基准测试")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="明细行数（可多个）")
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES), metavar="CASE",
+                        help=f"要运行的用例（默认全部）: {', '.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例重复次数")
+    parser.add_argument("--data-dir", default="benchmarks/data", help="合成工作簿目录（已存在则复用）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=None, help="单个用例的超时秒数")
+    parser.add_argument("--output", default=None, help="结果JSON（默认 benchmarks/results/excel_<时间>.json）")
+    parser.add_argument("--baseline", default=None, help="对比的历史结果JSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="耗时超过基线该倍数视为变慢")
+    args = parser.parse_args(argv)
+
+    results = []
+    for rows in args.rows:
+        start = time.perf_counter()
+        path = ensure_workbook(args.data_dir, rows, args.seed)
+        print(f"== {rows} 行: {path} ({time.perf_counter() - start:.1f}s)")
+        for name in args.cases:
+            record = run_case(name, path, rows, args.repeat, args.timeout)
+            results.append(record)
+            if record["status"] == "success":
+                print(f"  {name:<24} min {record['min']:8.3f}s  median {record['median']:8.3f}s  "
+                      f"peak RSS {record['peak_rss_mb'] or 0:8.1f} MB")
+            else:
+                print(f"  {name:<24} 失败: {record['error']}")
+
+    regressions = compare(results, args.baseline, args.threshold) if args.baseline else []
+    output = args.output or os.path.join("benchmarks", "results",
+                                         f"excel_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results, "regressions": regressions},
+                  f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+    for line in regressions:
+        print(f"  变慢: {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+基准测试用的合成工作簿
+离线生成固定随机种子的销售明细表：数值、日期、中文字符串、空值、混合类型列，
+另含门店主表和每日数据表（用于 merge_data / write_daily_data）
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from rpa_tools.excel_writer import ExcelStreamWriter  # noqa: E402
+
+
+DETAIL_SHEET = "明细"
+STORE_SHEET = "门店"
+DAILY_SHEET = "每日"
+TITLE = "销售明细报表"
+# 明细表第1行为标题，第2行为表头（header=1）
+HEADER_ROW = 1
+
+REGIONS = ["华北", "华东", "华南", "华中", "西南", "西北", "东北"]
+PRODUCTS = ["办公椅", "显示器", "机械键盘", "无线鼠标", "笔记本电脑", "打印纸", "投影仪", "路由器",
+            "移动硬盘", "会议平板", "碎纸机", "电源插座"]
+REMARKS = ["加急", "已开票", "待确认", "客户自提", "分批发货"]
+
+CHUNK_ROWS = 100000
+
+# 生成逻辑（列、分布、工作表结构）变化时加1，文件名随之变化，不会复用旧的缓存工作簿
+GENERATOR_VERSION = 1
+
+
+def store_count(rows: int) -> int:
+    return max(10, min(rows // 100, 5000))
+
+
+def daily_days(rows: int) -> int:
+    return min(rows, 3000)
+
+
+def make_detail_chunk(rng: np.random.Generator, start: int, rows: int, stores: int) -> pd.DataFrame:
+    """明细表的一块"""
+    amount = np.round(rng.gamma(2.0, 300.0, rows), 2)
+    amount[rng.random(rows) < 0.02] = np.nan
+    remark = np.array(REMARKS, dtype=object)[rng.integers(0, len(REMARKS), rows)]
+    remark[rng.random(rows) < 0.6] = None
+    numeric_remark = rng.random(rows) < 0.05
+    remark[numeric_remark] = rng.integers(1000, 9999, int(numeric_remark.sum()))  # 混合类型
+    return pd.DataFrame({
+        "订单号": np.arange(start, start + rows) + 10000000,
+        "日期": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 730, rows), unit="D"),
+        "门店编号": rng.integers(1, stores + 1, rows),
+        "区域": np.array(REGIONS, dtype=object)[rng.integers(0, len(REGIONS), rows)],
+        "商品名称": np.array(PRODUCTS, dtype=object)[rng.integers(0, len(PRODUCTS), rows)],
+        "数量": rng.integers(1, 50, rows),
+        "金额": amount,
+        "是否完成": rng.random(rows) < 0.8,
+        "备注": remark,
+    })
+
+
+def make_stores(rng: np.random.Generator, stores: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "门店编号": np.arange(1, stores + 1),
+        "门店名称": [f"{REGIONS[i % len(REGIONS)]}第{i + 1}店" for i in range(stores)],
+        "店长": [f"店长{i + 1:04d}" for i in range(stores)],
+        "面积": np.round(rng.uniform(50, 800, stores), 1),
+    })
+
+
+def generate_workbook(path: str, rows: int, seed: int = 42) -> str:
+    """
+    生成合成工作簿（流式写入，1M行也不需要把整表放进内存）
+
+    Args:
+        path: 输出路径
+        rows: 明细行数
+        seed: 随机种子（相同参数生成相同内容）
+    """
+    rng = np.random.default_rng(seed)
+    stores = store_count(rows)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with ExcelStreamWriter(path) as writer:
+        writer.add_sheet(DETAIL_SHEET)
+        writer.append([TITLE])
+        first = True
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = make_detail_chunk(rng, start, min(CHUNK_ROWS, rows - start), stores)
+            writer.write_dataframe(chunk, header=first)
+            first = False
+
+        writer.add_sheet(STORE_SHEET)
+        writer.write_dataframe(make_stores(rng, stores))
+
+        writer.add_sheet(DAILY_SHEET, header=["日期", "数值"])
+        start_day = date(2020, 1, 1)
+        days = daily_days(rows)
+        values = np.round(rng.uniform(0, 1000, days), 2)
+        writer.append_rows((start_day + timedelta(days=i), float(values[i])) for i in range(days))
+    return path
+
+
+def workbook_name(rows: int, seed: int = 42) -> str:
+    """工作簿文件名（包含生成参数和生成器版本）"""
+    return f"bench_v{GENERATOR_VERSION}_{rows}_{seed}.xlsx"
+
+
+def ensure_workbook(directory: str, rows: int, seed: int = 42) -> str:
+    """返回 directory 下指定行数的工作簿（不存在时生成）"""
+    path = os.path.join(directory, workbook_name(rows, seed))
+    if not os.path.exists(path):
+        generate_workbook(path, rows, seed)
+    return path
+
+
+def main(argv=None):
+    """命令行: 生成合成工作簿"""
+    parser = argparse.ArgumentParser(description="生成基准测试用的合成工作簿")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="明细行数")
+    parser.add_argument("--out-dir", default="benchmarks/data", help="输出目录")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    for rows in args.rows:
+        start = time.perf_counter()
+        path = os.path.join(args.out_dir, workbook_name(rows, args.seed))
+        generate_workbook(path, rows, args.seed)
+        print(f"{path}: {rows} 行, {os.path.getsize(path) / 1e6:.1f} MB, {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,68 @@
 """
 RPA Tools Package
 基于现有RPA项目提取的工具集
+
+所有导出按需导入：import rpa_tools 不会加载cv2、pandas、pyautogui、langchain等重量级依赖，
+首次访问对应名称时才导入所在模块。
 """
+import importlib
+
+# 导出名称 -> 所在模块
+_EXPORTS = {
+    'RPAToolBase': '.base_tool',
+    'SafetyMixin': '.base_tool',
+    'AuditStore': '.audit_store',
+    'ArtifactStore': '.artifact_store',
+    'use_artifact_store': '.artifact_store',
+    'MemoCache': '.memo_cache',
+    'get_memo_cache': '.memo_cache',
+    'get_workbook_cache': '.workbook_cache',
+    'SidecarCache': '.excel_sidecar',
+    'ExcelPipeline': '.excel_pipeline',
+    'StreamingAggregator': '.stream_aggregate',
+    'Profiler': '.profiling',
+    'HistogramSink': '.profiling',
+    'PrometheusSink': '.profiling',
+    'JsonTraceSink': '.profiling',
+    'get_profiler': '.profiling',
+    'ScreenTool': '.screen_tools',
+    'VisionTool': '.vision_tools',
+    'ExcelTool': '.excel_tools',
+    'WordTool': '.word_tools',
+    'DataTool': '.data_tools',
+    'HarvestTool': '.harvest_tools',
+    'FrameWatcher': '.frame_watcher',
+    'ScreenshotWriter': '.screenshot_writer',
+    'SaveHandle': '.screenshot_writer',
+    'SessionRecorder': '.session_recorder',
+    'SessionReader': '.session_recorder',
+    'SharedFrameRing': '.shared_frames',
+    'FrameCaptureDaemon': '.shared_frames',
+    'RPAToolRegistry': '.tool_registry',
+    'get_registry': '.tool_registry',
+    'get_rpa_tools': '.tool_registry',
+    'get_tool_by_name': '.tool_registry',
+    'AsyncToolExecutor': '.async_tools',
+    'PlanExecutor': '.plan_executor',
+    'ToolSelector': '.tool_selector',
+    'PromptPrefix': '.prompt_prefix',
+    'RemoteToolServer': '.remote_tools',
+    'RemoteToolClient': '.remote_tools',
+}
 
-from .base_tool import RPAToolBase, SafetyMixin
-from .screen_tools import ScreenTool
-from .vision_tools import VisionTool
-from .excel_tools import ExcelTool
-from .word_tools import WordTool
-from .data_tools import DataTool
-from .tool_registry import RPAToolRegistry, get_rpa_tools, get_tool_by_name
-
-__all__ = [
-    'RPAToolBase',
-    'SafetyMixin',
-    'ScreenTool',
-    'VisionTool',
-    'ExcelTool',
-    'WordTool',
-    'DataTool',
-    'RPAToolRegistry',
-    'get_rpa_tools',
-    'get_tool_by_name',
-]
+__all__ = list(_EXPORTS)
 
 __version__ = '1.0.0'
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
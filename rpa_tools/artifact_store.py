@@ -0,0 +1,332 @@
+"""
+会话级大对象存储
+把DataFrame、图像、长文本等大结果留在内存或磁盘，只把紧凑的句柄和预览交给LLM
+"""
+import contextvars
+import itertools
+import logging
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+HANDLE_PREFIX = "artifact://"
+PREVIEW_ROWS = 5
+PREVIEW_CHARS = 300
+
+# 按store_id查找存储，句柄在任意位置都能解析
+_STORES: "weakref.WeakValueDictionary[str, ArtifactStore]" = weakref.WeakValueDictionary()
+_current_store: contextvars.ContextVar = contextvars.ContextVar("rpa_artifact_store", default=None)
+
+
+def _type_name(value: Any) -> str:
+    return type(value).__name__
+
+
+def _is_image(value: Any) -> bool:
+    return hasattr(value, "getbands") and hasattr(value, "save") and hasattr(value, "size")
+
+
+def is_handle(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(HANDLE_PREFIX)
+
+
+def _usage_total(usage: Any) -> int:
+    return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+
+
+def pandas_nbytes(value: Any, sample: int = 1000) -> int:
+    """
+    DataFrame/Series 的内存估算（包含字符串等Python对象本身）
+
+    deep=True 要逐个遍历对象元素，大表很慢；行数超过 sample 时只对等距抽样的行
+    计算深度大小，按行数外推对象部分，数值列仍按实际字节数。
+    """
+    shallow = _usage_total(value.memory_usage(index=True, deep=False))
+    rows = len(value)
+    if rows <= sample:
+        return _usage_total(value.memory_usage(index=True, deep=True))
+    part = value.iloc[::rows // sample][:sample]
+    extra = (_usage_total(part.memory_usage(index=True, deep=True))
+             - _usage_total(part.memory_usage(index=True, deep=False)))
+    return shallow + int(extra * rows / len(part))
+
+
+def estimate_bytes(value: Any) -> int:
+    """估算对象内存占用（字节）"""
+    type_name = _type_name(value)
+    if type_name in ("DataFrame", "Series"):
+        return pandas_nbytes(value)
+    if type_name == "ndarray":
+        return int(value.nbytes)
+    if _is_image(value):
+        width, height = value.size
+        return width * height * len(value.getbands())
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (list, tuple, dict)):
+        return 64 * len(value)
+    return 64
+
+
+class ArtifactStore:
+    """
+    会话级大对象存储
+
+    put() 保存对象并返回形如 artifact://<store>/<n> 的句柄；超出内存预算时
+    把最久未使用的对象溢写到磁盘，get() 时再读回。compact() 把结果字典中的
+    大对象替换为句柄+预览，resolve() 把参数中的句柄还原为对象。
+    """
+
+    def __init__(self, session_id: Optional[str] = None, spill_dir: Optional[str] = None,
+                 memory_budget: int = 512 * 1024 * 1024, text_threshold: int = 2000,
+                 list_threshold: int = 100):
+        """
+        Args:
+            session_id: 会话ID（默认随机生成）
+            spill_dir: 溢写目录（默认 artifacts/<session_id>）
+            memory_budget: 内存中保留对象的总预算（字节）
+            text_threshold: 超过该长度的文本存为句柄
+            list_threshold: 超过该长度的列表存为句柄
+        """
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.spill_dir = Path(spill_dir) if spill_dir else Path("artifacts") / self.session_id
+        self.memory_budget = memory_budget
+        self.text_threshold = text_threshold
+        self.list_threshold = list_threshold
+
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._spilled: Dict[str, Path] = {}
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._memory_bytes = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self.stats = {"stored": 0, "spilled": 0, "loaded": 0}
+        _STORES[self.session_id] = self
+
+    # ========== 存取 ==========
+
+    def put(self, value: Any, source: Optional[str] = None) -> str:
+        """保存对象，返回句柄"""
+        with self._lock:
+            handle = f"{HANDLE_PREFIX}{self.session_id}/{next(self._ids)}"
+            size = estimate_bytes(value)
+            self._memory[handle] = value
+            self._sizes[handle] = size
+            self._memory_bytes += size
+            self._meta[handle] = self._describe(value, handle, source)
+            self.stats["stored"] += 1
+            self._enforce_budget(keep=handle)
+        return handle
+
+    def get(self, handle: str) -> Any:
+        """按句柄取回对象"""
+        with self._lock:
+            if handle in self._memory:
+                self._memory.move_to_end(handle)
+                return self._memory[handle]
+            path = self._spilled.get(handle)
+            if path is None:
+                raise KeyError(f"句柄不存在: {handle}")
+            value = self._load(path)
+            self.stats["loaded"] += 1
+            self._memory[handle] = value
+            self._memory_bytes += self._sizes[handle]
+            self._enforce_budget(keep=handle)
+            return value
+
+    def describe(self, handle: str) -> Dict[str, Any]:
+        """句柄的紧凑描述（类型、形状、预览）"""
+        return dict(self._meta[handle])
+
+    def __contains__(self, handle: str) -> bool:
+        return handle in self._meta
+
+    def __len__(self):
+        return len(self._meta)
+
+    def discard(self, handle: str):
+        """删除对象"""
+        with self._lock:
+            if handle in self._memory:
+                del self._memory[handle]
+                self._memory_bytes -= self._sizes[handle]
+            path = self._spilled.pop(handle, None)
+            if path is not None and path.exists():
+                path.unlink()
+            self._sizes.pop(handle, None)
+            self._meta.pop(handle, None)
+
+    def clear(self):
+        """清空会话中的全部对象"""
+        for handle in list(self._meta):
+            self.discard(handle)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    # ========== 结果压缩 / 参数解析 ==========
+
+    def is_large(self, value: Any) -> bool:
+        """是否应存为句柄"""
+        type_name = _type_name(value)
+        if type_name in ("DataFrame", "Series", "ndarray") or _is_image(value):
+            return True
+        if isinstance(value, str):
+            return len(value) > self.text_threshold
+        if isinstance(value, (list, tuple)):
+            return len(value) > self.list_threshold
+        return False
+
+    def compact(self, result: Any, source: Optional[str] = None) -> Any:
+        """把结果中的大对象替换为句柄描述（只处理顶层和一层嵌套）"""
+        if isinstance(result, dict):
+            compacted = {}
+            for key, value in result.items():
+                if self.is_large(value):
+                    handle = self.put(value, source=f"{source}.{key}" if source else key)
+                    compacted[key] = self.describe(handle)
+                else:
+                    compacted[key] = value
+            return compacted
+        if self.is_large(result):
+            return self.describe(self.put(result, source=source))
+        return result
+
+    def resolve(self, value: Any) -> Any:
+        """把参数中的句柄（或句柄描述字典）还原为对象"""
+        return resolve_handles(value)
+
+    # ========== 内部实现 ==========
+
+    def _describe(self, value: Any, handle: str, source: Optional[str]) -> Dict[str, Any]:
+        type_name = _type_name(value)
+        meta: Dict[str, Any] = {"handle": handle, "type": type_name}
+        if source:
+            meta["source"] = source
+        if type_name == "DataFrame":
+            meta["shape"] = list(value.shape)
+            meta["columns"] = [str(c) for c in value.columns]
+            meta["dtypes"] = {str(k): str(v) for k, v in value.dtypes.items()}
+            head = value.head(PREVIEW_ROWS).astype(str)
+            meta["preview"] = [
+                {str(k): v[:50] for k, v in row.items()}
+                for row in head.to_dict("records")
+            ]
+        elif type_name in ("Series", "ndarray"):
+            meta["shape"] = list(value.shape)
+            meta["dtype"] = str(value.dtype)
+        elif _is_image(value):
+            meta["size"] = list(value.size)
+            meta["mode"] = value.mode
+        elif isinstance(value, str):
+            meta["length"] = len(value)
+            meta["preview"] = value[:PREVIEW_CHARS]
+        elif isinstance(value, (list, tuple)):
+            meta["length"] = len(value)
+            meta["preview"] = [str(v)[:50] for v in list(value)[:PREVIEW_ROWS]]
+        return meta
+
+    def _enforce_budget(self, keep: str):
+        while self._memory_bytes > self.memory_budget and len(self._memory) > 1:
+            handle = next(iter(self._memory))
+            if handle == keep:
+                self._memory.move_to_end(handle)
+                continue
+            value = self._memory.pop(handle)
+            self._memory_bytes -= self._sizes[handle]
+            if handle not in self._spilled:
+                self._spilled[handle] = self._spill(handle, value)
+                self.stats["spilled"] += 1
+
+    def _spill(self, handle: str, value: Any) -> Path:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        stem = self.spill_dir / handle.rsplit("/", 1)[-1]
+        type_name = _type_name(value)
+        if type_name in ("DataFrame", "Series"):
+            path = stem.with_suffix(".pkl")
+            value.to_pickle(path)
+        elif type_name == "ndarray":
+            import numpy as np
+            path = stem.with_suffix(".npy")
+            np.save(path, value)
+        elif _is_image(value):
+            path = stem.with_suffix(".png")
+            value.save(path, format="PNG", compress_level=1)
+        elif isinstance(value, str):
+            path = stem.with_suffix(".txt")
+            path.write_text(value, encoding="utf-8")
+        else:
+            import pickle
+            path = stem.with_suffix(".pickle")
+            with open(path, "wb") as f:
+                pickle.dump(value, f)
+        logger.debug(f"对象溢写到磁盘: {handle} -> {path}")
+        return path
+
+    @staticmethod
+    def _load(path: Path) -> Any:
+        if path.suffix == ".pkl":
+            import pandas as pd
+            return pd.read_pickle(path)
+        if path.suffix == ".npy":
+            import numpy as np
+            return np.load(path)
+        if path.suffix == ".png":
+            from PIL import Image
+            with Image.open(path) as img:
+                return img.copy()
+        if path.suffix == ".txt":
+            return path.read_text(encoding="utf-8")
+        import pickle
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+# ========== 句柄解析 / 会话上下文 ==========
+
+def get_artifact(handle: str) -> Any:
+    """按句柄取回对象（在所属存储中查找）"""
+    store_id = handle[len(HANDLE_PREFIX):].split("/", 1)[0]
+    store = _STORES.get(store_id)
+    if store is None:
+        raise KeyError(f"句柄所属的存储不存在: {handle}")
+    return store.get(handle)
+
+
+def resolve_handles(value: Any) -> Any:
+    """递归把句柄字符串或句柄描述字典替换为对象"""
+    if is_handle(value):
+        return get_artifact(value)
+    if isinstance(value, dict):
+        if is_handle(value.get("handle")) and "type" in value:
+            return get_artifact(value["handle"])
+        return {k: resolve_handles(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_handles(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(resolve_handles(v) for v in value)
+    return value
+
+
+def current_artifact_store() -> Optional[ArtifactStore]:
+    """当前会话的存储（见 use_artifact_store）"""
+    return _current_store.get()
+
+
+@contextmanager
+def use_artifact_store(store: Optional[ArtifactStore]):
+    """在当前上下文（线程/协程）中使用指定的会话存储"""
+    token = _current_store.set(store)
+    try:
+        yield store
+    finally:
+        _current_store.reset(token)
@@ -0,0 +1,105 @@
+"""
+RPA工具异步执行
+为注册中心中的每个工具提供协程版本，阻塞调用交给有界执行器，GUI操作按显示器串行
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+# 工具类别说明:
+#   gui - 鼠标键盘/截屏操作，同一显示器上必须串行
+#   io  - 文件读写（Excel、Word），可并发
+#   cpu - 纯计算（文本解析等），可并发
+TOOL_KINDS = ("gui", "io", "cpu")
+
+
+def default_display() -> str:
+    """当前显示器标识（X11取DISPLAY，其他平台为default）"""
+    return os.environ.get("DISPLAY") or "default"
+
+
+class AsyncToolExecutor:
+    """
+    异步工具执行器
+
+    - io / cpu 类工具在有界线程池中执行（可替换为自定义Executor，
+      例如对可序列化的纯函数使用ProcessPoolExecutor）
+    - gui 类工具按显示器分配单线程执行器，同一显示器上的操作严格串行，
+      不同显示器之间互不阻塞
+
+    并发任务数不受线程数限制：协程在等待执行器时不占用线程。
+    """
+
+    def __init__(self, registry=None, io_workers: int = 8, cpu_workers: Optional[int] = None,
+                 io_executor: Optional[Executor] = None, cpu_executor: Optional[Executor] = None):
+        """
+        Args:
+            registry: RPAToolRegistry（默认全局注册表）
+            io_workers: IO线程池大小
+            cpu_workers: 计算线程池大小（默认CPU核数）
+            io_executor: 自定义IO执行器
+            cpu_executor: 自定义计算执行器
+        """
+        if registry is None:
+            from .tool_registry import get_registry
+            registry = get_registry()
+        self.registry = registry
+        self._executors: Dict[str, Executor] = {
+            "io": io_executor or ThreadPoolExecutor(io_workers, thread_name_prefix="rpa-io"),
+            "cpu": cpu_executor or ThreadPoolExecutor(cpu_workers or os.cpu_count() or 4,
+                                                      thread_name_prefix="rpa-cpu"),
+        }
+        self._gui_executors: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def executor_for(self, kind: str, display: Optional[str] = None) -> Executor:
+        """获取工具类别对应的执行器"""
+        if kind != "gui":
+            return self._executors[kind]
+        display = display or default_display()
+        with self._lock:
+            executor = self._gui_executors.get(display)
+            if executor is None:
+                executor = ThreadPoolExecutor(1, thread_name_prefix=f"rpa-gui-{display}")
+                self._gui_executors[display] = executor
+        return executor
+
+    async def ainvoke(self, name: str, *args, display: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """
+        异步调用已注册工具
+
+        Args:
+            name: 工具名
+            display: GUI工具使用的显示器（默认当前显示器）
+            *args, **kwargs: 工具参数
+        """
+        entry = self.registry.get_tool(name)
+        if entry is None:
+            return {"status": "error", "message": f"工具不存在: {name}"}
+        executor = self.executor_for(entry.get("kind", "io"), display)
+        loop = asyncio.get_running_loop()
+        # 复制上下文，使会话级设置（如大对象存储）在执行器线程中生效
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, entry["func"], *args, **kwargs)
+        return await loop.run_in_executor(executor, call)
+
+    def coroutine_for(self, name: str) -> Callable:
+        """生成指定工具的协程函数（用于LangChain Tool的coroutine参数）"""
+        async def call(*args, **kwargs):
+            return await self.ainvoke(name, *args, **kwargs)
+        call.__name__ = f"a{name}"
+        return call
+
+    def shutdown(self, wait: bool = True):
+        """关闭所有执行器"""
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
+        with self._lock:
+            for executor in self._gui_executors.values():
+                executor.shutdown(wait=wait)
+            self._gui_executors.clear()
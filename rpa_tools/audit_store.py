@@ -0,0 +1,417 @@
+"""
+执行审计存储
+后台线程把工具执行记录追加写入SQLite，大对象（DataFrame、图像等）落盘后按路径引用
+"""
+import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .artifact_store import pandas_nbytes
+
+
+logger = logging.getLogger(__name__)
+
+MAX_TEXT_PREVIEW = 200
+MAX_INLINE_TEXT = 64 * 1024
+MAX_ITEMS = 50
+
+
+def _type_name(value: Any) -> str:
+    return type(value).__name__
+
+
+def summarize_value(value: Any, depth: int = 0) -> Any:
+    """
+    生成值的轻量摘要（用于内存中的执行历史）
+
+    DataFrame、图像、数组只保留形状等元信息，长文本截断，嵌套容器限制长度。
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        if len(value) <= MAX_TEXT_PREVIEW:
+            return value
+        return value[:MAX_TEXT_PREVIEW] + f"...({len(value)} 字符)"
+
+    type_name = _type_name(value)
+    if type_name == "DataFrame":
+        return {"type": "DataFrame", "shape": list(value.shape),
+                "columns": [str(c) for c in list(value.columns)[:MAX_ITEMS]]}
+    if type_name == "Series":
+        return {"type": "Series", "length": len(value), "dtype": str(value.dtype)}
+    if type_name == "ndarray":
+        return {"type": "ndarray", "shape": list(value.shape), "dtype": str(value.dtype)}
+    if hasattr(value, "size") and hasattr(value, "mode") and hasattr(value, "getbands"):
+        return {"type": "Image", "size": list(value.size), "mode": value.mode}
+
+    if depth >= 3:
+        return f"<{type_name}>"
+    if isinstance(value, dict):
+        items = list(value.items())[:MAX_ITEMS]
+        return {str(k): summarize_value(v, depth + 1) for k, v in items}
+    if isinstance(value, (list, tuple, set)):
+        items = list(value)
+        summary = [summarize_value(v, depth + 1) for v in items[:MAX_ITEMS]]
+        if len(items) > MAX_ITEMS:
+            summary.append(f"...({len(items)} 项)")
+        return summary
+    if isinstance(value, (datetime,)) or hasattr(value, "isoformat"):
+        return value.isoformat()
+    return summarize_value(str(value), depth + 1)
+
+
+def value_nbytes(value: Any) -> int:
+    """大对象（DataFrame、数组、图像）的内存估算，其他值为0"""
+    type_name = _type_name(value)
+    if type_name in ("DataFrame", "Series"):
+        return pandas_nbytes(value)
+    if type_name == "ndarray":
+        return int(value.nbytes)
+    if hasattr(value, "getbands") and hasattr(value, "size"):
+        width, height = value.size
+        return width * height * len(value.getbands())
+    return 0
+
+
+def _pandas_copy_on_write() -> bool:
+    import pandas as pd
+    return int(pd.__version__.split(".")[0]) >= 3
+
+
+def snapshot_value(value: Any, budget: Optional[List[int]] = None) -> Any:
+    """
+    入队时的值快照（后台线程序列化时不受调用方之后修改的影响）
+
+    容器逐层复制，其他不可识别的对象转为字符串。DataFrame/Series 在 pandas>=3（写时复制）
+    下只做浅拷贝，不复制数据；数组、图像复制一份。
+
+    Args:
+        budget: [剩余字节数]，大对象按估算大小扣减；超出时只保留摘要（不复制、不落盘）
+    """
+    if value is None or isinstance(value, (str, bytes, bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return {k: snapshot_value(v, budget) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [snapshot_value(v, budget) for v in value]
+
+    size = value_nbytes(value)
+    if size:
+        if budget is not None:
+            if size > budget[0]:
+                summary = summarize_value(value)
+                if not isinstance(summary, dict):
+                    summary = {"type": _type_name(value), "preview": summary}
+                summary["$omitted"] = f"待写入数据超出内存预算，未保存 ({size} 字节)"
+                return summary
+            budget[0] -= size
+        if _type_name(value) in ("DataFrame", "Series"):
+            return value.copy(deep=not _pandas_copy_on_write())
+        return value.copy()
+    if isinstance(value, datetime) or hasattr(value, "isoformat"):
+        return value
+    if hasattr(value, "item") and hasattr(value, "dtype"):
+        return value.item()  # numpy标量
+    return str(value)
+
+
+def _safe_stem(key: Any) -> str:
+    """字典键转为可用作文件名的片段"""
+    return re.sub(r"[^\w.-]", "_", str(key))[:64] or "_"
+
+
+class AuditStore:
+    """
+    执行审计存储（SQLite，仅追加）
+
+    log_execution 只负责快照并入队，序列化、大对象落盘和批量写库都在后台线程完成。
+    待写入的大对象按估算大小计入 max_queue_bytes，超出预算时该记录中的大对象只保存摘要。
+    executions 表按工具、时间、状态建立索引，可用 query() 检索。
+
+    大对象按引用存储：
+        DataFrame -> .pkl    图像 -> .png    ndarray -> .npy    超长文本 -> .txt
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS executions (
+            id TEXT PRIMARY KEY,
+            ts REAL NOT NULL,
+            tool TEXT NOT NULL,
+            status TEXT,
+            message TEXT,
+            duration REAL,
+            params TEXT,
+            result TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_executions_tool_ts ON executions (tool, ts);
+        CREATE INDEX IF NOT EXISTS idx_executions_status_ts ON executions (status, ts);
+        CREATE INDEX IF NOT EXISTS idx_executions_ts ON executions (ts);
+    """
+
+    def __init__(self, db_path: str = "audit/executions.db",
+                 artifact_dir: Optional[str] = None, max_queue: int = 10000,
+                 max_queue_bytes: int = 256 * 1024 * 1024,
+                 batch_size: int = 200, flush_interval: float = 0.5):
+        """
+        Args:
+            db_path: SQLite数据库路径
+            artifact_dir: 大对象存储目录（默认与数据库同级的artifacts目录）
+            max_queue: 待写入记录上限（超出时丢弃并计数）
+            max_queue_bytes: 待写入大对象（DataFrame、数组、图像）的内存预算（字节）
+            batch_size: 每批写入的记录数
+            flush_interval: 最长写入间隔（秒）
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.artifact_dir = Path(artifact_dir) if artifact_dir else self.db_path.parent / "artifacts"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_bytes = max_queue_bytes
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "artifacts": 0, "errors": 0,
+                      "omitted": 0}
+        self._pending_bytes = 0
+        self._bytes_lock = threading.Lock()
+
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        conn.close()
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="AuditStore", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ========== 写入 ==========
+
+    def append(self, tool: str, params: Dict[str, Any], result: Dict[str, Any],
+               timestamp: Optional[float] = None, duration: Optional[float] = None) -> Optional[str]:
+        """
+        追加一条执行记录（非阻塞）
+
+        Returns:
+            记录ID；队列已满或已关闭时返回None
+        """
+        if self._closed:
+            self.stats["dropped"] += 1
+            return None
+        record_id = uuid.uuid4().hex
+        with self._bytes_lock:
+            budget = [self.max_queue_bytes - self._pending_bytes]
+            available = budget[0]
+            params = snapshot_value(params, budget)
+            result = snapshot_value(result, budget)
+            size = available - budget[0]
+            self._pending_bytes += size
+        if self._has_omitted(params) or self._has_omitted(result):
+            self.stats["omitted"] += 1
+        try:
+            self._queue.put_nowait((size, (record_id, timestamp or time.time(), tool,
+                                           params, result, duration)))
+        except queue.Full:
+            self._release(size)
+            self.stats["dropped"] += 1
+            return None
+        self.stats["queued"] += 1
+        return record_id
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._pending_bytes
+
+    def _release(self, size: int):
+        with self._bytes_lock:
+            self._pending_bytes -= size
+
+    @classmethod
+    def _has_omitted(cls, value: Any) -> bool:
+        if isinstance(value, dict):
+            return "$omitted" in value or any(cls._has_omitted(v) for v in value.values())
+        if isinstance(value, list):
+            return any(cls._has_omitted(v) for v in value)
+        return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已入队记录全部写入"""
+        if self._closed:
+            # 关闭后不再处理新的等待请求；后台线程已退出即表示全部写完
+            return not self._thread.is_alive()
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """写完剩余记录后停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _loop(self):
+        conn = self._connect()
+        batch = []
+        last_flush = time.time()
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+
+            waiters = []
+            if item is None:
+                running = False
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not False:
+                size, record = item
+                try:
+                    batch.append(self._to_row(*record))
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"审计记录序列化失败: {e}")
+                finally:
+                    self._release(size)  # 大对象已落盘，不再占用预算
+
+            due = time.time() - last_flush >= self.flush_interval
+            if batch and (len(batch) >= self.batch_size or due or waiters or not running):
+                try:
+                    conn.executemany(
+                        "INSERT INTO executions (id, ts, tool, status, message, duration, params, result) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                    conn.commit()
+                    self.stats["written"] += len(batch)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"审计记录写入失败: {e}")
+                batch = []
+                last_flush = time.time()
+            for waiter in waiters:
+                waiter.set()
+        conn.close()
+
+    def _to_row(self, record_id, ts, tool, params, result, duration) -> tuple:
+        artifacts_prefix = f"{datetime.fromtimestamp(ts):%Y%m%d}/{record_id}"
+        params_json = json.dumps(self._externalize(params, f"{artifacts_prefix}_params"),
+                                 ensure_ascii=False, default=str)
+        result_json = json.dumps(self._externalize(result, f"{artifacts_prefix}_result"),
+                                 ensure_ascii=False, default=str)
+        status = result.get("status") if isinstance(result, dict) else None
+        message = result.get("message") if isinstance(result, dict) else None
+        return (record_id, ts, tool, status, message, duration, params_json, result_json)
+
+    def _externalize(self, value: Any, stem: str) -> Any:
+        """把大对象写入artifact目录，替换为引用"""
+        if isinstance(value, dict):
+            return {str(k): self._externalize(v, f"{stem}_{_safe_stem(k)}") for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._externalize(v, f"{stem}_{i}") for i, v in enumerate(value)]
+        if isinstance(value, str) and len(value) > MAX_INLINE_TEXT:
+            return self._save_artifact(value, stem, ".txt",
+                                       lambda p: p.write_text(value, encoding="utf-8"))
+
+        type_name = _type_name(value)
+        if type_name == "DataFrame":
+            return self._save_artifact(value, stem, ".pkl", value.to_pickle)
+        if type_name == "ndarray":
+            import numpy as np
+            return self._save_artifact(value, stem, ".npy", lambda p: np.save(p, value))
+        if hasattr(value, "getbands") and hasattr(value, "save"):
+            return self._save_artifact(value, stem, ".png",
+                                       lambda p: value.save(p, format="PNG", compress_level=1))
+        return value
+
+    def _save_artifact(self, value: Any, stem: str, suffix: str, writer) -> Dict[str, Any]:
+        path = self.artifact_dir / f"{stem}{suffix}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        writer(path)
+        self.stats["artifacts"] += 1
+        ref = summarize_value(value)
+        if not isinstance(ref, dict):
+            ref = {"type": _type_name(value), "preview": ref}
+        ref["$artifact"] = str(path)
+        return ref
+
+    # ========== 查询 ==========
+
+    def query(self, tool: Optional[str] = None, status: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              limit: int = 100, include_payload: bool = False) -> List[Dict[str, Any]]:
+        """
+        按工具、状态、时间范围查询执行记录（按时间倒序）
+
+        Args:
+            tool: 工具名（"ExcelTool" 同时匹配 "ExcelTool.read_excel" 等各方法的记录）
+            status: 'success' | 'error'
+            since, until: 时间范围（Unix时间戳或datetime）
+            limit: 最多返回条数
+            include_payload: 是否返回完整params/result
+        """
+        clauses, args = [], []
+        if tool is not None:
+            # 范围条件可使用 (tool, ts) 索引；"ExcelTool." 到 "ExcelTool/" 之间为该类的各方法
+            clauses.append("tool >= ? AND tool < ? AND (tool = ? OR substr(tool, 1, ?) = ?)")
+            args += [tool, tool + "/", tool, len(tool) + 1, tool + "."]
+        if status is not None:
+            clauses.append("status = ?")
+            args.append(status)
+        if since is not None:
+            clauses.append("ts >= ?")
+            args.append(since.timestamp() if isinstance(since, datetime) else since)
+        if until is not None:
+            clauses.append("ts < ?")
+            args.append(until.timestamp() if isinstance(until, datetime) else until)
+
+        columns = "id, ts, tool, status, message, duration"
+        if include_payload:
+            columns += ", params, result"
+        sql = f"SELECT {columns} FROM executions"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        args.append(limit)
+
+        conn = self._connect()
+        try:
+            conn.row_factory = sqlite3.Row
+            rows = [dict(r) for r in conn.execute(sql, args)]
+        finally:
+            conn.close()
+
+        for row in rows:
+            if include_payload:
+                row["params"] = json.loads(row["params"]) if row["params"] else None
+                row["result"] = json.loads(row["result"]) if row["result"] else None
+        return rows
+
+    @staticmethod
+    def load_artifact(ref: Dict[str, Any]) -> Any:
+        """按引用读取大对象"""
+        path = Path(ref["$artifact"])
+        if path.suffix == ".pkl":
+            import pandas as pd
+            return pd.read_pickle(path)
+        if path.suffix == ".npy":
+            import numpy as np
+            return np.load(path)
+        if path.suffix == ".png":
+            from PIL import Image
+            return Image.open(path)
+        return path.read_text(encoding="utf-8")
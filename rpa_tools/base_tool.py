@@ -3,10 +3,13 @@ RPA工具基类
 提供所有RPA工具的通用接口和功能
 """
 from abc import ABC, abstractmethod
+from collections import deque
 from typing import Any, Dict, Optional
 import logging
 import time
 from datetime import datetime
+from .audit_store import summarize_value
+from .profiling import profiler
 
 # 配置日志
 logging.basicConfig(
@@ -16,14 +19,36 @@ logging.basicConfig(
 )
 
 
+def redact_text(value: Any) -> str:
+    """敏感文本（如可能包含密码的输入内容）的替代表示，只保留长度"""
+    return f"<已隐藏 {len(str(value))} 字符>"
+
+
 class RPAToolBase(ABC):
     """RPA工具抽象基类"""
     
+    # 内存中保留的执行摘要条数
+    history_size: int = 200
+    
+    # 审计存储（所有工具共享，见 set_audit_store）
+    audit_store = None
+    
     def __init__(self):
         self.name: str = self.__class__.__name__
         self.description: str = ""
         self.logger = logging.getLogger(self.name)
-        self.execution_history = []
+        self.execution_history = deque(maxlen=self.history_size)
+    
+    @classmethod
+    def set_audit_store(cls, store):
+        """
+        设置审计存储（完整params/result由后台线程写入磁盘）
+        
+        Args:
+            store: AuditStore实例（None=关闭审计）
+        """
+        RPAToolBase.audit_store = store
+        return store
     
     @abstractmethod
     def execute(self, **kwargs) -> Dict[str, Any]:
@@ -46,37 +71,81 @@ class RPAToolBase(ABC):
         """执行后的结果处理"""
         return result
     
-    def log_execution(self, params: dict, result: dict):
-        """记录执行日志"""
+    def log_execution(self, params: dict, result: dict, duration: Optional[float] = None,
+                      action: Optional[str] = None):
+        """
+        记录执行日志（run() 和注册表调用都会记录）
+        
+        内存中只保留最近history_size条轻量摘要（DataFrame、图像等只记录形状），
+        完整记录交给审计存储异步落盘。
+        
+        Args:
+            params: 调用参数
+            result: 结果字典
+            duration: 执行耗时（秒）
+            action: 调用的方法名（审计记录的工具名为 "<工具类>.<方法名>"）
+        """
+        now = time.time()
+        started = now - duration if duration is not None else now
+        # 方法声明的敏感参数（见 screen_tools._recorded 的 redact）不写入历史和审计
+        redacted = getattr(getattr(type(self), action, None), "redacted_params", ()) if action else ()
+        if redacted:
+            params = {k: redact_text(v) if k in redacted and v is not None else v
+                      for k, v in params.items()}
+        if not isinstance(result, dict):
+            result = {"result": result}
         log_entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.fromtimestamp(started).isoformat(),
             "tool": self.name,
-            "params": params,
-            "result": result
+            "action": action,
+            "status": result.get("status"),
+            "message": result.get("message", ""),
+            "duration": duration,
+            "params": summarize_value(params),
+            "result": summarize_value(result)
         }
+        if self.audit_store is not None:
+            tool = f"{self.name}.{action}" if action else self.name
+            log_entry["audit_id"] = self.audit_store.append(tool, params, result, started, duration)
         self.execution_history.append(log_entry)
         self.logger.info(f"执行 {self.name}: {result.get('message', '')}")
     
     def run(self, **kwargs) -> Dict[str, Any]:
         """
         完整的执行流程（包含前置检查、执行、后处理、日志）
+        
+        各阶段耗时记录在 "<工具名>.run" span 中（见 profiling.profiler）
         """
+        with profiler.span(f"{self.name}.run", tool=self.name) as span:
+            result = self._run_phases(kwargs)
+            if span is not None:
+                span.status = result.get("status", "success")
+            return result
+    
+    def _run_phases(self, kwargs: dict) -> Dict[str, Any]:
         try:
             # 前置检查
-            if not self.pre_check():
+            with profiler.phase("pre_check"):
+                passed = self.pre_check()
+            if not passed:
                 return {
                     "status": "error",
                     "message": "前置检查失败"
                 }
             
             # 执行核心逻辑
-            result = self.execute(**kwargs)
+            started = time.perf_counter()
+            with profiler.phase("execute"):
+                result = self.execute(**kwargs)
+            duration = time.perf_counter() - started
             
             # 后处理
-            result = self.post_process(result)
+            with profiler.phase("post_process"):
+                result = self.post_process(result)
             
             # 记录日志
-            self.log_execution(kwargs, result)
+            with profiler.phase("log"):
+                self.log_execution(kwargs, result, duration, "execute")
             
             return result
             
@@ -0,0 +1,211 @@
+"""
+多工作簿并行汇总
+按通配符找到的工作簿在进程池中并行读取、统一列名和类型、与主表合并并做部分聚合，
+主进程只负责合并各文件的结果，并报告每个文件的耗时和失败原因
+"""
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from .stream_aggregate import StreamingAggregator, parse_aggregations
+
+
+logger = logging.getLogger(__name__)
+
+# 工作进程中的主表（进程初始化时传入一次，不随每个任务序列化）
+_worker_master: Optional[pd.DataFrame] = None
+
+
+def find_workbooks(pattern: str) -> List[str]:
+    """按通配符查找工作簿（支持 **，跳过Excel临时文件 ~$*.xlsx）"""
+    return sorted(p for p in glob.glob(pattern, recursive=True)
+                  if os.path.isfile(p) and not os.path.basename(p).startswith("~$"))
+
+
+def normalize_frame(df: pd.DataFrame, column_map: Optional[Dict[str, str]] = None,
+                    columns: Optional[List[str]] = None, dtype: Optional[Dict[str, Any]] = None,
+                    source: Optional[str] = None, source_column: Optional[str] = None) -> pd.DataFrame:
+    """
+    统一单个文件的表结构
+
+    Args:
+        column_map: 列名映射（各地区表头写法不同时统一，如 {"金额(元)": "金额"}）
+        columns: 保留的列（缺少的列补空值，顺序与此一致）
+        dtype: 列类型，如 {"金额": "float64", "日期": "datetime64[ns]"}（无法转换的值为空）
+        source: 来源文件名
+        source_column: 记录来源文件的列名（None=不记录）
+    """
+    df = df.rename(columns=lambda c: str(c).strip())
+    if column_map:
+        df = df.rename(columns=column_map)
+    if columns is not None:
+        df = df.reindex(columns=columns)
+    for col, hint in (dtype or {}).items():
+        if col not in df.columns:
+            continue
+        if str(hint).startswith("datetime"):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif str(hint).startswith("float"):
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(hint)
+        else:
+            df[col] = df[col].astype(hint)
+    if source_column:
+        df[source_column] = source
+    return df
+
+
+def _init_worker(master: Optional[pd.DataFrame]):
+    global _worker_master
+    _worker_master = master
+    # 每个文件只读一次，工作进程中不缓存解析结果
+    from .memo_cache import get_memo_cache
+    get_memo_cache().enabled = False
+
+
+def _ingest_file(path: str, read_args: Dict[str, Any], normalize_args: Dict[str, Any],
+                 merge_args: Optional[Dict[str, Any]], agg_args: Optional[Dict[str, Any]],
+                 master: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """读取、规范化、合并、部分聚合单个文件（在工作进程中执行）"""
+    from .excel_tools import ExcelTool
+
+    start = time.perf_counter()
+    try:
+        loaded = ExcelTool().read_excel(path, **read_args)
+        if loaded["status"] != "success":
+            raise RuntimeError(loaded["message"])
+        df = normalize_frame(loaded["data"], source=os.path.basename(path), **normalize_args)
+        rows = len(df)
+        if merge_args is not None:
+            master = _worker_master if master is None else master
+            df = df.merge(master, **merge_args)
+        data = StreamingAggregator(**agg_args).update(df) if agg_args is not None else df
+        return {"path": path, "status": "success", "rows": rows, "data": data,
+                "seconds": time.perf_counter() - start}
+    except Exception as e:
+        return {"path": path, "status": "error", "rows": 0, "error": f"{type(e).__name__}: {e}",
+                "seconds": time.perf_counter() - start}
+
+
+class ExcelPipeline:
+    """
+    多工作簿并行汇总
+
+    每个文件在工作进程中完成 读取 → 统一表结构 → 与主表合并 → 部分聚合（StreamingAggregator），
+    只把部分聚合状态（或明细）传回主进程合并；单个文件失败不影响其他文件。
+    """
+
+    def __init__(self, pattern: str, max_workers: Optional[int] = None, sheet_name: Any = 0,
+                 header: Optional[int] = 0, usecols: Optional[List] = None,
+                 column_map: Optional[Dict[str, str]] = None, columns: Optional[List[str]] = None,
+                 dtype: Optional[Dict[str, Any]] = None, source_column: Optional[str] = "来源文件",
+                 sidecar: bool = False):
+        """
+        Args:
+            pattern: 工作簿通配符，如 'data/regions/**/*.xlsx'
+            max_workers: 进程数（默认CPU核数；1=在当前进程中顺序执行）
+            sheet_name: 工作表名称或序号
+            header: 表头行号（0开始）
+            usecols: 读取的列
+            column_map: 列名映射
+            columns: 统一后保留的列
+            dtype: 列类型
+            source_column: 记录来源文件的列名（None=不记录）
+            sidecar: 使用列式旁路缓存读取
+        """
+        self.pattern = pattern
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.read_args = {"sheet_name": sheet_name, "header": header, "usecols": usecols,
+                          "sidecar": sidecar}
+        self.normalize_args = {"column_map": column_map, "columns": columns, "dtype": dtype,
+                               "source_column": source_column}
+
+    def run(self, master: Optional[pd.DataFrame] = None, merge_on: Optional[str] = None,
+            how: str = "left", group_by: Optional[Any] = None, agg_column: Optional[str] = None,
+            agg_func: str = "sum", aggregations: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        执行汇总
+
+        Args:
+            master: 主表（与每个文件按merge_on合并）
+            merge_on: 合并键
+            how: 合并方式
+            group_by: 分组列（设置后每个文件先部分聚合，结果为聚合表）
+            agg_column: 聚合列
+            agg_func: 'sum' | 'mean' | 'count' | 'min' | 'max' | 'approx_distinct'
+            aggregations: 一次计算多个聚合，如 {"金额": ["sum", "mean"]}（设置后忽略agg_column/agg_func）
+
+        Returns:
+            data(合并后的明细或聚合结果), files(每个文件的行数/耗时/状态), failed({文件: 错误}),
+            wall_time, file_time(各文件耗时之和，与wall_time之比近似并行度)
+        """
+        start = time.perf_counter()
+        try:
+            files = find_workbooks(self.pattern)
+            if not files:
+                return {"status": "error", "message": f"没有匹配的工作簿: {self.pattern}"}
+            merge_args = None
+            if master is not None:
+                if not merge_on:
+                    return {"status": "error", "message": "提供主表时需要merge_on"}
+                merge_args = {"on": merge_on, "how": how}
+            agg_args = None
+            if group_by is not None:
+                if aggregations is None:
+                    aggregations = [(agg_column, agg_func, agg_column)]
+                agg_args = {"group_by": group_by, "aggregations": parse_aggregations(aggregations)}
+
+            results = self._execute(files, master, merge_args, agg_args)
+            ok = [r for r in results if r["status"] == "success"]
+            failed = {r["path"]: r["error"] for r in results if r["status"] != "success"}
+            if agg_args is not None:
+                aggregator = StreamingAggregator(**agg_args)
+                for r in ok:
+                    aggregator.merge(r["data"])
+                data = aggregator.result()
+            else:
+                data = pd.concat([r["data"] for r in ok], ignore_index=True) if ok else pd.DataFrame()
+
+            wall_time = time.perf_counter() - start
+            file_time = sum(r["seconds"] for r in results)
+            return {
+                "status": "success" if ok else "error",
+                "data": data,
+                "shape": data.shape,
+                "rows_read": sum(r["rows"] for r in ok),
+                "files": [{k: v for k, v in r.items() if k != "data"} for r in results],
+                "failed": failed,
+                "wall_time": round(wall_time, 3),
+                "file_time": round(file_time, 3),
+                "message": (f"汇总 {len(ok)}/{len(files)} 个文件, 结果 {data.shape}, "
+                            f"耗时 {wall_time:.1f}s（{self.max_workers} 进程）"
+                            + (f", 失败 {len(failed)} 个" if failed else ""))
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    def _execute(self, files: List[str], master, merge_args, agg_args) -> List[Dict[str, Any]]:
+        """按文件顺序返回各文件结果"""
+        workers = min(self.max_workers, len(files))
+        if workers <= 1:
+            return [_ingest_file(path, self.read_args, self.normalize_args, merge_args, agg_args, master)
+                    for path in files]
+
+        results: Dict[str, Dict[str, Any]] = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(master,)) as pool:
+            futures = {pool.submit(_ingest_file, path, self.read_args, self.normalize_args,
+                                   merge_args, agg_args): path for path in files}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:  # 工作进程异常退出等
+                    results[path] = {"path": path, "status": "error", "rows": 0, "seconds": 0.0,
+                                     "error": f"{type(e).__name__}: {e}"}
+                logger.debug(f"{path}: {results[path]['status']} {results[path]['seconds']:.2f}s")
+        return [results[path] for path in files]
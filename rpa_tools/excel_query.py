@@ -0,0 +1,196 @@
+"""
+组合条件查询
+把 and / or / not 组成的条件树一次性向量化计算为布尔掩码，再按掩码和所需列一次取出结果，
+代替多次调用 filter_data（每次都复制一份DataFrame）
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Union
+
+import numpy as np
+import pandas as pd
+
+
+# 叶子条件支持的运算符
+COMPARISONS = ("==", "!=", ">", "<", ">=", "<=")
+OPERATORS = COMPARISONS + ("in", "not_in", "between", "isnull", "notnull",
+                           "contains", "regex", "startswith", "endswith")
+# 不需要value的运算符
+UNARY_OPERATORS = ("isnull", "notnull")
+
+Expression = Union[Dict[str, Any], Sequence[Any]]
+
+
+def _leaf(expr: Expression) -> Dict[str, Any]:
+    """把 [列, 运算符, 值] 简写统一为字典形式"""
+    if isinstance(expr, dict):
+        return expr
+    if isinstance(expr, (list, tuple)) and len(expr) in (2, 3):
+        leaf = {"column": expr[0], "op": expr[1]}
+        if len(expr) == 3:
+            leaf["value"] = expr[2]
+        return leaf
+    raise ValueError(f"无法识别的条件: {expr!r}")
+
+
+def validate(expr: Expression):
+    """检查条件树结构，不合法时抛出ValueError"""
+    if isinstance(expr, dict) and len(expr) == 1 and next(iter(expr)) in ("and", "or"):
+        children = next(iter(expr.values()))
+        if not isinstance(children, (list, tuple)) or not children:
+            raise ValueError("and/or 需要非空的条件列表")
+        for child in children:
+            validate(child)
+        return
+    if isinstance(expr, dict) and len(expr) == 1 and "not" in expr:
+        validate(expr["not"])
+        return
+    leaf = _leaf(expr)
+    if "column" not in leaf or "op" not in leaf:
+        raise ValueError(f"条件缺少column或op: {expr!r}")
+    op = leaf["op"]
+    if op not in OPERATORS:
+        raise ValueError(f"不支持的运算符: {op}")
+    if op not in UNARY_OPERATORS and "value" not in leaf:
+        raise ValueError(f"运算符 {op} 需要value")
+    if op == "between" and (not isinstance(leaf["value"], (list, tuple)) or len(leaf["value"]) != 2):
+        raise ValueError("between 的value应为 [下限, 上限]")
+
+
+def referenced_columns(expr: Optional[Expression]) -> Set[Any]:
+    """条件树用到的列"""
+    if expr is None:
+        return set()
+    if isinstance(expr, dict) and len(expr) == 1 and next(iter(expr)) in ("and", "or"):
+        return set().union(*(referenced_columns(c) for c in next(iter(expr.values()))))
+    if isinstance(expr, dict) and len(expr) == 1 and "not" in expr:
+        return referenced_columns(expr["not"])
+    return {_leaf(expr)["column"]}
+
+
+def _to_mask(result: Any) -> np.ndarray:
+    """布尔Series（含可空布尔）转为numpy布尔数组，缺失值视为False"""
+    return result.to_numpy(dtype=bool, na_value=False)
+
+
+def _leaf_mask(df: pd.DataFrame, leaf: Dict[str, Any]) -> np.ndarray:
+    column, op, value = leaf["column"], leaf["op"], leaf.get("value")
+    if column not in df.columns:
+        raise KeyError(f"列不存在: {column}")
+    series = df[column]
+
+    if op == "==":
+        return _to_mask(series == value)
+    if op == "!=":
+        return _to_mask(series != value) & series.notna().to_numpy()
+    if op == ">":
+        return _to_mask(series > value)
+    if op == "<":
+        return _to_mask(series < value)
+    if op == ">=":
+        return _to_mask(series >= value)
+    if op == "<=":
+        return _to_mask(series <= value)
+    if op in ("in", "not_in"):
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        mask = _to_mask(series.isin(values))
+        return mask if op == "in" else ~mask & series.notna().to_numpy()
+    if op == "between":
+        return _to_mask(series.between(value[0], value[1], inclusive=leaf.get("inclusive", "both")))
+    if op == "isnull":
+        return series.isna().to_numpy()
+    if op == "notnull":
+        return series.notna().to_numpy()
+
+    # 文本运算符：数字等非字符串值按字符串形式匹配，缺失值不匹配
+    text = series.astype("string").str
+    case = leaf.get("case", True)
+    if op == "contains":
+        return _to_mask(text.contains(str(value), case=case, regex=False))
+    if op == "regex":
+        return _to_mask(text.contains(str(value), case=case, regex=True))
+    if op == "startswith":
+        return _to_mask(text.startswith(str(value)) if case else text.lower().str.startswith(str(value).lower()))
+    return _to_mask(text.endswith(str(value)) if case else text.lower().str.endswith(str(value).lower()))
+
+
+def build_mask(df: pd.DataFrame, expr: Expression) -> np.ndarray:
+    """
+    计算条件树的布尔掩码（每个叶子条件一次向量化比较，不复制DataFrame）
+
+    条件树格式:
+        叶子: {"column": "金额", "op": ">=", "value": 100} 或简写 ["金额", ">=", 100]
+        组合: {"and": [条件, ...]}、{"or": [条件, ...]}、{"not": 条件}
+
+    != 和 not_in 不匹配缺失值（与SQL一致）；需要缺失值时组合 isnull。
+    """
+    if isinstance(expr, dict) and len(expr) == 1 and next(iter(expr)) in ("and", "or"):
+        key, children = next(iter(expr.items()))
+        masks = [build_mask(df, child) for child in children]
+        return np.logical_and.reduce(masks) if key == "and" else np.logical_or.reduce(masks)
+    if isinstance(expr, dict) and len(expr) == 1 and "not" in expr:
+        return ~build_mask(df, expr["not"])
+    return _leaf_mask(df, _leaf(expr))
+
+
+def required_columns(where: Optional[Expression], columns: Optional[Sequence[Any]]) -> Optional[List[Any]]:
+    """
+    查询需要读取的列（用于读取文件时只加载这些列）
+
+    Returns:
+        列名列表（保持输出列在前）；columns为None（输出全部列）时返回None
+    """
+    if columns is None:
+        return None
+    needed = list(dict.fromkeys(columns))
+    needed += sorted((c for c in referenced_columns(where) if c not in needed), key=str)
+    return needed
+
+
+def query_frame(df: pd.DataFrame, where: Optional[Expression] = None,
+                columns: Optional[Sequence[Any]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    按条件和输出列查询（掩码和列选择合并为一次取数，只产生一份结果）
+
+    Args:
+        df: 数据
+        where: 条件树（None=全部行）
+        columns: 输出列（None=全部列）
+        limit: 最多返回的行数
+    """
+    if columns is None:
+        positions = slice(None)
+    else:
+        positions = df.columns.get_indexer(list(columns))
+        if (positions < 0).any():
+            missing = [c for c, p in zip(columns, positions) if p < 0]
+            raise KeyError(f"列不存在: {missing}")
+
+    rows = slice(None)
+    if where is not None:
+        rows = np.flatnonzero(build_mask(df, where))
+    if limit is not None:
+        rows = rows[:limit] if isinstance(rows, np.ndarray) else slice(0, limit)
+    return df.iloc[rows, positions]
+
+
+def query_chunks(chunks: Iterable[pd.DataFrame], where: Optional[Expression] = None,
+                 columns: Optional[Sequence[Any]] = None,
+                 limit: Optional[int] = None) -> tuple:
+    """
+    逐块查询并合并结果
+
+    Returns:
+        (结果DataFrame, 扫描的总行数)；达到limit后停止读取后续块
+    """
+    parts, total, found = [], 0, 0
+    for chunk in chunks:
+        total += len(chunk)
+        part = query_frame(chunk, where, columns, None if limit is None else limit - found)
+        parts.append(part)
+        found += len(part)
+        if limit is not None and found >= limit:
+            if hasattr(chunks, "close"):
+                chunks.close()  # 提前结束时释放分块读取打开的工作簿
+            break
+    if not parts:
+        return pd.DataFrame(columns=list(columns) if columns is not None else None), total
+    return pd.concat(parts), total
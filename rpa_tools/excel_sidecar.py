@@ -0,0 +1,339 @@
+"""
+Excel列式旁路缓存
+把解析后的工作表按列保存为Parquet/Feather或逐列.npy文件（按源文件内容哈希命名），
+源文件不变时后续读取直接加载列文件（数值列内存映射、只加载用到的列），跳过xlsx XML解析
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .memo_cache import file_fingerprint
+
+
+logger = logging.getLogger(__name__)
+
+# 旁路文件格式变化时递增（旧文件不再命中）
+SIDECAR_VERSION = "1"
+
+BACKENDS = ("auto", "npy", "parquet", "feather")
+
+DEFAULT_CACHE_DIR = os.path.join(".rpa_cache", "sidecar")
+
+
+def _pyarrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class SidecarCache:
+    """
+    列式旁路缓存
+
+    - 键 = 源文件内容SHA1 + 工作表 + 表头行 + 类型提示；源文件内容变化后自动不再命中
+    - npy后端：每列一个.npy文件，数值/日期列以内存映射加载，对象列（字符串、混合类型）
+      按原样保存，读取结果与 pd.read_excel 一致
+    - parquet / feather 后端需要pyarrow；'auto' 时有pyarrow用parquet，否则用npy
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, backend: str = "auto"):
+        """
+        Args:
+            cache_dir: 旁路文件目录
+            backend: 'auto' | 'npy' | 'parquet' | 'feather'
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的旁路缓存格式: {backend}")
+        if backend == "auto":
+            backend = "parquet" if _pyarrow_available() else "npy"
+        self.cache_dir = Path(cache_dir)
+        self.backend = backend
+        self._hashes: Dict[tuple, str] = {}  # (路径, 大小, mtime) -> 内容SHA1
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+    # ========== 键 ==========
+
+    def content_hash(self, file_path: str) -> str:
+        """源文件内容SHA1（同一 (路径, 大小, mtime) 只计算一次）"""
+        fingerprint = file_fingerprint(file_path)
+        with self._lock:
+            digest = self._hashes.get(fingerprint)
+        if digest is None:
+            digest = file_fingerprint(file_path, hash_contents=True)[2]
+            with self._lock:
+                self._hashes[fingerprint] = digest
+        return digest
+
+    def key(self, file_path: str, sheet_name: Any = None, header: Optional[int] = 0,
+            dtype: Optional[Dict[str, Any]] = None) -> str:
+        sheet = 0 if sheet_name is None else sheet_name
+        dtype = sorted((str(k), str(v)) for k, v in (dtype or {}).items())
+        parts = (SIDECAR_VERSION, self.content_hash(file_path), sheet, header, dtype)
+        return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    # ========== 读写 ==========
+
+    def _read_meta(self, entry: Path) -> Optional[Dict[str, Any]]:
+        meta_path = entry / "meta.json"
+        if not meta_path.exists():
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def columns(self, file_path: str, sheet_name: Any = None, header: Optional[int] = 0,
+                dtype: Optional[Dict[str, Any]] = None) -> Optional[List[Any]]:
+        """已缓存工作表的列名（未缓存时返回None，不加载数据）"""
+        try:
+            meta = self._read_meta(self._entry_dir(self.key(file_path, sheet_name, header, dtype)))
+        except Exception:
+            return None
+        return None if meta is None else meta["columns"]
+
+    def load(self, file_path: str, sheet_name: Any = None, header: Optional[int] = 0,
+             dtype: Optional[Dict[str, Any]] = None,
+             columns: Optional[Sequence[Any]] = None) -> Optional[pd.DataFrame]:
+        """
+        加载旁路文件
+
+        Args:
+            columns: 只加载这些列（None=全部）
+
+        Returns:
+            DataFrame；未命中或读取失败时返回None
+        """
+        entry = self._entry_dir(self.key(file_path, sheet_name, header, dtype))
+        try:
+            meta = self._read_meta(entry)
+            if meta is None:
+                self.stats["misses"] += 1
+                return None
+            df = self._load_frame(entry, meta, columns)
+            self.stats["hits"] += 1
+            return df
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"读取旁路缓存失败 {entry}: {e}")
+            return None
+
+    def store(self, df: pd.DataFrame, file_path: str, sheet_name: Any = None,
+              header: Optional[int] = 0, dtype: Optional[Dict[str, Any]] = None) -> Optional[Path]:
+        """
+        保存旁路文件（先写临时目录再整体改名，并发写入时不会读到半成品）
+
+        Returns:
+            旁路目录；无法保存时返回None
+        """
+        entry = self._entry_dir(self.key(file_path, sheet_name, header, dtype))
+        if (entry / "meta.json").exists():
+            return entry
+        tmp = entry.parent / f".{entry.name}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            tmp.mkdir(parents=True)
+            meta = self._write_frame(tmp, df)
+            meta.update(version=SIDECAR_VERSION, source=os.path.abspath(file_path),
+                        sheet_name=sheet_name, header=header, created=time.time())
+            with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, default=str)
+            try:
+                os.replace(tmp, entry)
+            except OSError:
+                if not (entry / "meta.json").exists():
+                    raise
+            self.stats["writes"] += 1
+            return entry
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"写入旁路缓存失败 {file_path}: {e}")
+            return None
+        finally:
+            if tmp.exists():
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    def _write_frame(self, entry: Path, df: pd.DataFrame) -> Dict[str, Any]:
+        names = list(df.columns)
+        json.dumps(names)  # 列名必须可JSON序列化（多级表头不支持）
+        if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+            raise ValueError("只支持默认行索引")
+        meta = {"backend": self.backend, "columns": names, "rows": len(df)}
+
+        if self.backend in ("parquet", "feather"):
+            frame = df.copy(deep=False)
+            frame.columns = [str(c) for c in names]
+            if self.backend == "parquet":
+                frame.to_parquet(entry / "data.parquet", index=False)
+            else:
+                frame.to_feather(entry / "data.feather")
+            return meta
+
+        files, dtypes = [], []
+        for i, name in enumerate(names):
+            series = df.iloc[:, i]
+            if isinstance(series.dtype, np.dtype) and series.dtype.kind != "O":
+                values, restore = series.to_numpy(), None
+            else:
+                values = series.to_numpy(dtype=object)
+                restore = None if series.dtype == object else str(series.dtype)
+            np.save(entry / f"{i}.npy", values, allow_pickle=values.dtype == object)
+            files.append(f"{i}.npy")
+            dtypes.append(restore)
+        meta.update(files=files, dtypes=dtypes)
+        return meta
+
+    def _load_frame(self, entry: Path, meta: Dict[str, Any],
+                    columns: Optional[Sequence[Any]]) -> pd.DataFrame:
+        names = meta["columns"]
+        positions = list(range(len(names)))
+        if columns is not None:
+            missing = [c for c in columns if c not in names]
+            if missing:
+                raise KeyError(f"列不存在: {missing}")
+            positions = [names.index(c) for c in columns]
+
+        if meta["backend"] in ("parquet", "feather"):
+            wanted = [str(names[p]) for p in positions]
+            if meta["backend"] == "parquet":
+                df = pd.read_parquet(entry / "data.parquet", columns=wanted)
+            else:
+                df = pd.read_feather(entry / "data.feather", columns=wanted, memory_map=True)
+            df.columns = [names[p] for p in positions]
+            return df
+
+        data = {}
+        for p in positions:
+            path = entry / meta["files"][p]
+            try:
+                values = np.asarray(np.load(path, mmap_mode="c"))  # 写时复制，不改动旁路文件
+            except ValueError:  # 对象列不能内存映射
+                values = np.load(path, allow_pickle=True)
+            column = pd.Series(values, copy=False)
+            if meta["dtypes"][p]:
+                column = column.astype(meta["dtypes"][p])
+            data[p] = column
+        df = pd.DataFrame(data, copy=False)
+        df.columns = [names[p] for p in positions]
+        return df
+
+    # ========== 维护 ==========
+
+    def clear(self) -> int:
+        """删除全部旁路文件，返回删除的条目数"""
+        count = 0
+        if self.cache_dir.exists():
+            for meta in self.cache_dir.glob("*/*/meta.json"):
+                shutil.rmtree(meta.parent, ignore_errors=True)
+                count += 1
+        with self._lock:
+            self._hashes.clear()
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(backend=self.backend, cache_dir=str(self.cache_dir),
+                     hit_rate=stats["hits"] / lookups if lookups else 0.0)
+        return stats
+
+    def prewarm(self, directory: str, pattern: str = "*.xlsx", all_sheets: bool = False,
+                header: Optional[int] = 0) -> Dict[str, Any]:
+        """
+        为目录下的工作簿生成旁路文件
+
+        Args:
+            directory: 目录
+            pattern: 文件匹配模式（如 '**/*.xlsx' 递归）
+            all_sheets: 是否处理全部工作表（默认只处理第一个）
+            header: 表头行号（0开始）
+
+        Returns:
+            created(新生成的工作表数), cached(已存在), failed({文件: 错误})
+        """
+        created, cached, failed = 0, 0, {}
+        for path in sorted(Path(directory).glob(pattern)):
+            if not path.is_file() or path.name.startswith("~$"):
+                continue
+            try:
+                sheets = pd.ExcelFile(path).sheet_names if all_sheets else [None]
+                for sheet in sheets:
+                    if self.columns(str(path), sheet, header) is not None:
+                        cached += 1
+                        continue
+                    df = pd.read_excel(path, sheet_name=0 if sheet is None else sheet, header=header)
+                    if self.store(df, str(path), sheet, header) is None:
+                        raise RuntimeError("写入旁路缓存失败")
+                    created += 1
+            except Exception as e:
+                failed[str(path)] = str(e)
+        return {
+            "status": "success" if not failed else "error",
+            "created": created,
+            "cached": cached,
+            "failed": failed,
+            "message": f"旁路缓存: 新生成 {created}, 已存在 {cached}, 失败 {len(failed)}"
+        }
+
+
+_sidecar_cache: Optional[SidecarCache] = None
+
+
+def get_sidecar_cache() -> SidecarCache:
+    """获取全局旁路缓存（目录可通过环境变量 RPA_SIDECAR_DIR 指定）"""
+    global _sidecar_cache
+    if _sidecar_cache is None:
+        _sidecar_cache = SidecarCache(os.environ.get("RPA_SIDECAR_DIR", DEFAULT_CACHE_DIR))
+    return _sidecar_cache
+
+
+def set_sidecar_cache(cache: SidecarCache):
+    """替换全局旁路缓存"""
+    global _sidecar_cache
+    _sidecar_cache = cache
+
+
+def main(argv=None):
+    """命令行: 预先为目录下的工作簿生成旁路文件"""
+    parser = argparse.ArgumentParser(description="Excel列式旁路缓存")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    prewarm = sub.add_parser("prewarm", help="为目录下的工作簿生成旁路文件")
+    prewarm.add_argument("directory", help="工作簿目录")
+    prewarm.add_argument("--pattern", default="*.xlsx", help="文件匹配模式（'**/*.xlsx' 递归）")
+    prewarm.add_argument("--all-sheets", action="store_true", help="处理全部工作表")
+    prewarm.add_argument("--header", type=int, default=0, help="表头行号（0开始）")
+
+    clear = sub.add_parser("clear", help="删除全部旁路文件")
+
+    for p in (prewarm, clear):
+        p.add_argument("--cache-dir", default=os.environ.get("RPA_SIDECAR_DIR", DEFAULT_CACHE_DIR))
+        p.add_argument("--backend", default="auto", choices=BACKENDS)
+
+    args = parser.parse_args(argv)
+    cache = SidecarCache(args.cache_dir, args.backend)
+    if args.command == "prewarm":
+        start = time.perf_counter()
+        result = cache.prewarm(args.directory, args.pattern, args.all_sheets, args.header)
+        print(f"{result['message']} ({time.perf_counter() - start:.1f}s, {cache.backend})")
+        for path, error in result["failed"].items():
+            print(f"  失败 {path}: {error}")
+    else:
+        print(f"已删除 {cache.clear()} 个旁路条目")
+
+
+if __name__ == "__main__":
+    main()
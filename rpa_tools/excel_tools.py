@@ -2,13 +2,54 @@
 Excel数据处理工具
 基于pandas和openpyxl实现Excel文件读写和数据处理
 """
+import functools
 import pandas as pd
 from openpyxl import load_workbook, Workbook
-from openpyxl.utils import get_column_letter
-from typing import Dict, Any, List, Optional
+from openpyxl.utils import get_column_letter, column_index_from_string, range_boundaries
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Union
 from pathlib import Path
 from datetime import datetime, date
 from .base_tool import RPAToolBase
+from .memo_cache import memoize, file_fingerprint
+from .workbook_cache import checkin_workbook, checkout_workbook, invalidate_workbook, workbook_dimensions
+from .excel_sidecar import get_sidecar_cache
+from .excel_query import query_chunks, query_frame, required_columns, validate
+from .stream_aggregate import StreamingAggregator
+from .excel_writer import ExcelStreamWriter, to_rows
+
+
+# 日期字符串格式（write_daily_data匹配日期单元格时使用）
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%Y年%m月%d日", "%Y%m%d",
+                "%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S")
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date_string(text: str) -> Optional[date]:
+    text = text.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_date(value: Any) -> Optional[date]:
+    """把datetime、date或日期字符串统一为date（无法识别时返回None，字符串解析结果有缓存）"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        return _parse_date_string(value)
+    return None
+
+
+# 工作簿打开模式
+#   read  - 只读（openpyxl read_only，按需解析，适合查看/读取少量单元格）
+#   write - 只写（流式追加行，内存占用与行数无关，适合大表导出）
+#   edit  - 完整加载，可随机读写单元格
+WORKBOOK_MODES = ("read", "write", "edit")
 
 
 class ExcelTool(RPAToolBase):
@@ -19,6 +60,12 @@ class ExcelTool(RPAToolBase):
         self.description = "Excel文件读写和数据处理工具"
         self.current_workbook = None
         self.current_sheet = None
+        self.workbook_mode = None
+        self.workbook_path = None
+        self.stream_writer = None
+        self._date_indexes: Dict[tuple, Dict[str, Any]] = {}
+        self._workbook_fingerprint = None  # 内存中的工作簿与磁盘文件一致时为文件指纹
+        self._workbook_dimensions = None   # 与磁盘文件一致时各工作表的尺寸
     
     def execute(self, **kwargs) -> Dict[str, Any]:
         """通用执行接口"""
@@ -26,8 +73,12 @@ class ExcelTool(RPAToolBase):
     
     # ========== 文件读写 ==========
     
+    @memoize(path_arg="file_path")
     def read_excel(self, file_path: str, sheet_name: Optional[str] = None,
-                   header: Optional[int] = 0, usecols: Optional[List] = None) -> Dict[str, Any]:
+                   header: Optional[int] = 0, usecols: Optional[List] = None,
+                   chunksize: Optional[int] = None, dtype: Optional[Dict[str, Any]] = None,
+                   header_keywords: Optional[List[str]] = None,
+                   max_search_rows: int = 10, sidecar: bool = False) -> Dict[str, Any]:
         """
         读取Excel文件
         
@@ -36,68 +87,320 @@ class ExcelTool(RPAToolBase):
             sheet_name: 工作表名称（None=第一个sheet）
             header: 表头行号（0开始）
             usecols: 要读取的列（列表或范围）
+            chunksize: 分块行数（设置后以openpyxl只读模式流式读取，data为DataFrame块的迭代器；
+                       全空的行会被跳过，与pd.read_excel不同）
+            dtype: 列类型提示，如 {"金额": "float64", "日期": "datetime64[ns]"}
+            header_keywords: 分块模式下按关键字自动查找表头行（优先于header）
+            max_search_rows: 查找表头的最大行数
+            sidecar: 使用列式旁路缓存（首次读取整张表后保存列文件，源文件内容不变时
+                     直接加载列文件并只加载usecols指定的列；sheet_name=None 视为第一个sheet）
         """
+        if chunksize:
+            return self._read_excel_chunks(file_path, sheet_name, header, usecols, chunksize,
+                                           dtype, header_keywords, max_search_rows)
         try:
-            df = pd.read_excel(
-                file_path,
-                sheet_name=sheet_name,
-                header=header,
-                usecols=usecols
-            )
+            if sidecar:
+                df, source = self._read_sidecar(file_path, sheet_name, header, usecols, dtype)
+            else:
+                df, source = pd.read_excel(
+                    file_path,
+                    sheet_name=sheet_name,
+                    header=header,
+                    usecols=usecols,
+                    dtype=dtype
+                ), "xlsx"
             
-            return {
+            result = {
                 "status": "success",
                 "data": df,
                 "shape": df.shape,
                 "columns": list(df.columns),
                 "message": f"成功读取Excel: {file_path}, 形状: {df.shape}"
             }
+            if sidecar:
+                result["source"] = source
+            return result
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+    
+    def _read_sidecar(self, file_path: str, sheet_name, header, usecols, dtype) -> tuple:
+        """
+        通过旁路缓存读取，返回 (DataFrame, 来源)
+        
+        来源为 'sidecar'（命中）或 'xlsx'（解析源文件并生成旁路文件）。
+        """
+        cache = get_sidecar_cache()
+        names = cache.columns(file_path, sheet_name, header, dtype)
+        if names is not None:
+            positions = self._resolve_usecols(usecols, [str(c) for c in names])
+            selected = None if positions is None else [names[p] for p in positions]
+            df = cache.load(file_path, sheet_name, header, dtype, columns=selected)
+            if df is not None:
+                return df, "sidecar"
+        
+        df = pd.read_excel(file_path, sheet_name=0 if sheet_name is None else sheet_name,
+                           header=header, dtype=dtype)
+        cache.store(df, file_path, sheet_name, header, dtype)
+        positions = self._resolve_usecols(usecols, [str(c) for c in df.columns])
+        if positions is not None:
+            df = df.iloc[:, positions]
+        return df, "xlsx"
+    
+    def _read_excel_chunks(self, file_path: str, sheet_name, header, usecols, chunksize: int,
+                           dtype, header_keywords, max_search_rows: int) -> Dict[str, Any]:
+        """
+        分块读取：只读模式逐行解析，每 chunksize 行生成一个DataFrame
+        
+        这里只打开工作簿确定表头后立即关闭；数据块迭代器在开始迭代时才重新打开，
+        读完、提前close()或迭代器被回收时释放，未迭代就丢弃结果不会占用文件。
+        与pd.read_excel不同，全空的行会被跳过（不产生全为NaN的行）。
+        """
+        wb = None
+        try:
+            wb = load_workbook(file_path, read_only=True, data_only=True)
+            ws = self._sheet(wb, sheet_name)
+            
+            header_row, header_values = None, None
+            if header_keywords:
+                rows = ws.iter_rows(min_row=1, max_row=max_search_rows, values_only=True)
+                for row_idx, values in enumerate(rows, start=1):
+                    present = {v for v in values if v is not None}
+                    if all(kw in present for kw in header_keywords):
+                        header_row, header_values = row_idx, values
+                        break
+                else:
+                    raise ValueError(f"前{max_search_rows}行未找到包含所有关键字的表头")
+            elif header is not None:
+                header_row = header + 1
+                header_values = next(ws.iter_rows(min_row=header_row, max_row=header_row,
+                                                  values_only=True), ())
+            
+            columns = None
+            if header_values is not None:
+                columns = [str(v) if v is not None else f"Unnamed: {i}"
+                           for i, v in enumerate(header_values)]
+            positions = self._resolve_usecols(usecols, columns)
+            if positions is not None and columns is not None:
+                columns = [columns[p] if p < len(columns) else f"Unnamed: {p}" for p in positions]
+            
+            wb.close()
+            chunks = self._iter_chunks(file_path, sheet_name, (header_row or 0) + 1, columns,
+                                       positions, chunksize, dtype)
+            return {
+                "status": "success",
+                "data": chunks,
+                "chunked": True,
+                "chunksize": chunksize,
+                "header_row": header_row,
+                "columns": columns,
+                "message": f"开始分块读取Excel: {file_path}, 每块 {chunksize} 行"
+            }
         except Exception as e:
+            if wb is not None:
+                wb.close()
             return {"status": "error", "message": str(e)}
     
-    def write_excel(self, data: pd.DataFrame, file_path: str,
-                   sheet_name: str = 'Sheet1', index: bool = False) -> Dict[str, Any]:
+    @staticmethod
+    def _resolve_usecols(usecols, columns: Optional[List[str]]) -> Optional[List[int]]:
+        """把usecols（列名、0开始的位置或 'A:C,E' 形式的列字母）解析为列位置"""
+        if usecols is None:
+            return None
+        if isinstance(usecols, str):
+            positions = []
+            for part in usecols.replace(" ", "").split(","):
+                start, _, end = part.partition(":")
+                first = column_index_from_string(start.upper()) - 1
+                last = column_index_from_string(end.upper()) - 1 if end else first
+                positions.extend(range(first, last + 1))
+            return positions
+        positions = []
+        for col in usecols:
+            if isinstance(col, int):
+                positions.append(col)
+            elif columns is not None and str(col) in columns:
+                positions.append(columns.index(str(col)))
+            else:
+                raise ValueError(f"列不存在: {col}")
+        return positions
+    
+    @staticmethod
+    def _sheet(wb, sheet_name):
+        """按名称或序号取工作表（None=第一个）"""
+        if sheet_name is None:
+            return wb.worksheets[0]
+        if isinstance(sheet_name, int):
+            return wb.worksheets[sheet_name]
+        return wb[sheet_name]
+    
+    @classmethod
+    def _iter_chunks(cls, file_path: str, sheet_name, start_row: int,
+                     columns: Optional[List[str]], positions: Optional[List[int]],
+                     chunksize: int, dtype: Optional[Dict[str, Any]]) -> Iterator[pd.DataFrame]:
+        """
+        逐行读取并按块生成DataFrame
+        
+        工作簿在首次迭代时打开，读完或提前关闭时释放；全空的行跳过（与pd.read_excel不同）。
+        """
+        
+        def make_chunk(rows: List[tuple], offset: int) -> pd.DataFrame:
+            width = len(columns)
+            rows = [r[:width] if len(r) >= width else tuple(r) + (None,) * (width - len(r))
+                    for r in rows]
+            df = pd.DataFrame.from_records(rows, columns=columns,
+                                           index=pd.RangeIndex(offset, offset + len(rows)))
+            for col, hint in (dtype or {}).items():
+                if col not in df.columns:
+                    continue
+                if str(hint).startswith("datetime"):
+                    df[col] = pd.to_datetime(df[col], errors="coerce")
+                else:
+                    df[col] = df[col].astype(hint)
+            return df
+        
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            ws = cls._sheet(wb, sheet_name)
+            buffer: List[tuple] = []
+            offset = 0
+            for values in ws.iter_rows(min_row=start_row, values_only=True):
+                if positions is not None:
+                    values = tuple(values[p] if p < len(values) else None for p in positions)
+                if all(v is None for v in values):
+                    continue
+                if columns is None:
+                    columns = list(range(len(values)))
+                buffer.append(values)
+                if len(buffer) >= chunksize:
+                    yield make_chunk(buffer, offset)
+                    offset += len(buffer)
+                    buffer = []
+            if buffer:
+                yield make_chunk(buffer, offset)
+        finally:
+            wb.close()
+    
+    def write_excel(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]], file_path: str,
+                   sheet_name: str = 'Sheet1', index: bool = False,
+                   streaming: bool = False, backend: str = "auto") -> Dict[str, Any]:
         """
         写入Excel文件
         
         Args:
-            data: pandas DataFrame
+            data: pandas DataFrame，或DataFrame块迭代器（自动使用流式写入）
             file_path: 输出文件路径
             sheet_name: 工作表名称
             index: 是否写入索引
+            streaming: 是否使用流式写入（大表导出，内存占用与行数无关）
+            backend: 流式写入后端 'auto' | 'openpyxl' | 'xlsxwriter'
         """
         try:
-            data.to_excel(file_path, sheet_name=sheet_name, index=index)
+            streaming = streaming or self._is_chunk_stream(data)
+            if streaming:
+                with ExcelStreamWriter(file_path, backend) as writer:
+                    rows = writer.write_dataframe(data, sheet_name=sheet_name, index=index)
+                    backend = writer.backend
+                shape = (rows, len(data.columns)) if isinstance(data, pd.DataFrame) else (rows, None)
+            else:
+                data.to_excel(file_path, sheet_name=sheet_name, index=index)
+                shape = data.shape
+            invalidate_workbook(file_path)
             
             return {
                 "status": "success",
                 "path": file_path,
-                "shape": data.shape,
-                "message": f"成功写入Excel: {file_path}"
+                "shape": shape,
+                "message": f"成功写入Excel: {file_path}" + (f" (流式, {backend})" if streaming else "")
             }
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     # ========== 工作簿操作（openpyxl） ==========
     
-    def open_workbook(self, file_path: str) -> Dict[str, Any]:
-        """打开Excel工作簿"""
+    def open_workbook(self, file_path: str, mode: str = "edit", backend: str = "auto") -> Dict[str, Any]:
+        """
+        打开Excel工作簿
+        
+        Args:
+            file_path: 文件路径
+            mode: 'read' 只读 | 'write' 只写（新建文件，流式追加行）| 'edit' 完整编辑
+            backend: 只写模式的写入后端 'auto' | 'openpyxl' | 'xlsxwriter'
+        """
         try:
-            self.current_workbook = load_workbook(file_path)
-            sheet_names = self.current_workbook.sheetnames
+            if mode not in WORKBOOK_MODES:
+                return {"status": "error", "message": f"不支持的打开模式: {mode}"}
+            self.close_workbook()
+            
+            if mode == "write":
+                self.stream_writer = ExcelStreamWriter(file_path, backend)
+                sheet_names = []
+            elif mode == "read":
+                self.current_workbook = load_workbook(file_path, read_only=True, data_only=True)
+                sheet_names = self.current_workbook.sheetnames
+            else:
+                cached = checkout_workbook(file_path)
+                if cached is not None:
+                    self.current_workbook, self._workbook_fingerprint = cached
+                else:
+                    self._workbook_fingerprint = file_fingerprint(file_path)
+                    self.current_workbook = load_workbook(file_path)
+                self._workbook_dimensions = workbook_dimensions(self.current_workbook)
+                sheet_names = self.current_workbook.sheetnames
+            self.workbook_mode = mode
+            self.workbook_path = file_path
             
             return {
                 "status": "success",
                 "path": file_path,
+                "mode": mode,
                 "sheets": sheet_names,
-                "message": f"打开工作簿: {file_path}, 包含 {len(sheet_names)} 个工作表"
+                "message": f"打开工作簿({mode}): {file_path}, 包含 {len(sheet_names)} 个工作表"
             }
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
+    def close_workbook(self) -> Dict[str, Any]:
+        """
+        关闭当前工作簿（不保存）
+        
+        只读模式释放文件句柄；编辑模式下未修改（或已保存）的工作簿放回工作簿缓存，
+        再次打开同一文件时无需重新解析。
+        """
+        try:
+            if self.workbook_mode == "read" and self.current_workbook is not None:
+                self.current_workbook.close()
+            elif (self.workbook_mode == "edit" and self.current_workbook is not None
+                  and self._workbook_fingerprint is not None):
+                checkin_workbook(self.workbook_path, self.current_workbook, self._workbook_fingerprint,
+                                 self._workbook_dimensions)
+            self.current_workbook = None
+            self.current_sheet = None
+            self.stream_writer = None
+            self._workbook_fingerprint = None
+            self._workbook_dimensions = None
+            self._date_indexes.clear()
+            self.workbook_mode = None
+            self.workbook_path = None
+            return {"status": "success", "message": "工作簿已关闭"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+    
+    def _require_mode(self, *modes: str) -> Optional[Dict[str, Any]]:
+        """当前模式不允许该操作时返回错误结果"""
+        if self.workbook_mode is None:
+            return {"status": "error", "message": "请先打开工作簿"}
+        if self.workbook_mode not in modes:
+            return {"status": "error",
+                    "message": f"{self.workbook_mode}模式不支持该操作（需要: {'/'.join(modes)}）"}
+        return None
+    
     def select_sheet(self, sheet_name: str) -> Dict[str, Any]:
-        """选择工作表"""
+        """选择工作表（只写模式下新建工作表）"""
         try:
+            if self.workbook_mode == "write":
+                self.stream_writer.add_sheet(sheet_name)
+                self.current_sheet = None
+                return {"status": "success", "sheet": sheet_name, "message": f"新建工作表: {sheet_name}"}
+            
             if self.current_workbook is None:
                 return {"status": "error", "message": "请先打开工作簿"}
             
@@ -123,10 +426,14 @@ class ExcelTool(RPAToolBase):
             value: 要写入的值
         """
         try:
+            error = self._require_mode("edit")
+            if error:
+                return error
             if self.current_sheet is None:
                 return {"status": "error", "message": "请先选择工作表"}
             
             self.current_sheet.cell(row=row, column=column, value=value)
+            self._mark_modified()
             
             return {
                 "status": "success",
@@ -141,10 +448,13 @@ class ExcelTool(RPAToolBase):
     def read_cell(self, row: int, column: int) -> Dict[str, Any]:
         """读取单元格"""
         try:
+            error = self._require_mode("read", "edit")
+            if error:
+                return error
             if self.current_sheet is None:
                 return {"status": "error", "message": "请先选择工作表"}
             
-            value = self.current_sheet.cell(row=row, column=column).value
+            value = self._peek_cell(row, column)
             
             return {
                 "status": "success",
@@ -156,20 +466,162 @@ class ExcelTool(RPAToolBase):
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
-    def save_workbook(self, file_path: Optional[str] = None) -> Dict[str, Any]:
-        """保存工作簿"""
+    # ========== 区域批量读写 ==========
+    
+    def read_range(self, cell_range: Optional[str] = None, min_row: int = 1, min_col: int = 1,
+                   max_row: Optional[int] = None, max_col: Optional[int] = None,
+                   as_dataframe: bool = False, header: bool = True) -> Dict[str, Any]:
+        """
+        批量读取区域
+        
+        Args:
+            cell_range: A1形式的区域，如 'A1:D100'（优先于行列参数）
+            min_row, min_col, max_row, max_col: 区域边界（1开始，max为None表示到表尾）
+            as_dataframe: 是否返回DataFrame
+            header: as_dataframe时是否以首行作为列名
+        """
         try:
-            if self.current_workbook is None:
-                return {"status": "error", "message": "没有打开的工作簿"}
+            error = self._require_mode("read", "edit")
+            if error:
+                return error
+            if self.current_sheet is None:
+                return {"status": "error", "message": "请先选择工作表"}
+            
+            if cell_range:
+                min_col, min_row, max_col, max_row = range_boundaries(cell_range.upper())
+            values = [list(row) for row in self.current_sheet.iter_rows(
+                min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True)]
+            
+            data: Any = values
+            if as_dataframe:
+                if header and values:
+                    data = pd.DataFrame(values[1:], columns=[str(v) for v in values[0]])
+                else:
+                    data = pd.DataFrame(values)
             
-            if file_path:
-                self.current_workbook.save(file_path)
+            return {
+                "status": "success",
+                "data": data,
+                "rows": len(values),
+                "columns": len(values[0]) if values else 0,
+                "message": f"读取区域: {len(values)} 行"
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+    
+    def write_range(self, data: Any, start_row: int = 1, start_col: int = 1,
+                    header: bool = False, index: bool = False) -> Dict[str, Any]:
+        """
+        批量写入区域（编辑模式）
+        
+        Args:
+            data: 二维列表、NumPy数组或DataFrame
+            start_row, start_col: 左上角单元格（1开始，start_col也可为列字母）
+            header: DataFrame是否写入列名
+            index: DataFrame是否写入索引
+        """
+        try:
+            error = self._require_mode("edit")
+            if error:
+                return error
+            if self.current_sheet is None:
+                return {"status": "error", "message": "请先选择工作表"}
+            
+            if isinstance(start_col, str):
+                start_col = column_index_from_string(start_col.upper())
+            rows = to_rows(data, header=header, index=index)
+            cell = self.current_sheet.cell
+            self._mark_modified()
+            for r, row in enumerate(rows, start=start_row):
+                for c, value in enumerate(row, start=start_col):
+                    cell(row=r, column=c, value=value)
+            
+            width = max((len(row) for row in rows), default=0)
+            end = f"{get_column_letter(start_col + width - 1)}{start_row + len(rows) - 1}" if rows else None
+            return {
+                "status": "success",
+                "rows": len(rows),
+                "columns": width,
+                "range": f"{get_column_letter(start_col)}{start_row}:{end}" if end else None,
+                "message": f"写入区域: {len(rows)} 行 x {width} 列"
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+    
+    def append_rows(self, data: Any, header: bool = False, index: bool = False) -> Dict[str, Any]:
+        """
+        在当前工作表末尾批量追加行（只写/编辑模式）
+        
+        Args:
+            data: 二维列表、NumPy数组或DataFrame
+            header: DataFrame是否写入列名
+            index: DataFrame是否写入索引
+        """
+        try:
+            error = self._require_mode("write", "edit")
+            if error:
+                return error
+            rows = to_rows(data, header=header, index=index)
+            if self.workbook_mode == "write":
+                self.stream_writer.append_rows(rows)
+            elif self.current_sheet is None:
+                return {"status": "error", "message": "请先选择工作表"}
             else:
-                self.current_workbook.save(self.current_workbook.path)
+                append = self.current_sheet.append
+                self._mark_modified()
+                for row in rows:
+                    append(row)
+            return {"status": "success", "rows": len(rows), "message": f"追加 {len(rows)} 行"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+    
+    def append_row(self, values: List[Any]) -> Dict[str, Any]:
+        """在当前工作表末尾追加一行（只写/编辑模式）"""
+        try:
+            error = self._require_mode("write", "edit")
+            if error:
+                return error
+            if self.workbook_mode == "write":
+                self.stream_writer.append(values)
+            elif self.current_sheet is None:
+                return {"status": "error", "message": "请先选择工作表"}
+            else:
+                self.current_sheet.append(values)
+                self._mark_modified()
+            return {"status": "success", "values": values, "message": f"追加一行: {len(values)} 列"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+    
+    def save_workbook(self, file_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        保存工作簿
+        
+        只写模式下完成写入并关闭（文件路径为打开时指定的路径）；只读模式不能保存。
+        """
+        try:
+            error = self._require_mode("write", "edit")
+            if error:
+                return error
+            
+            if self.workbook_mode == "write":
+                path = self.workbook_path
+                rows = self.stream_writer.rows_written
+                self.stream_writer.close()
+                self.close_workbook()
+                invalidate_workbook(path)
+                return {"status": "success", "path": path, "rows": rows,
+                        "message": f"工作簿已保存: {rows} 行"}
+            
+            path = file_path or self.workbook_path
+            self.current_workbook.save(path)
+            invalidate_workbook(path)
+            if path == self.workbook_path:
+                self._workbook_fingerprint = file_fingerprint(path)
+                self._workbook_dimensions = workbook_dimensions(self.current_workbook)
             
             return {
                 "status": "success",
-                "path": file_path or self.current_workbook.path,
+                "path": path,
                 "message": "工作簿已保存"
             }
         except Exception as e:
@@ -177,41 +629,107 @@ class ExcelTool(RPAToolBase):
     
     # ========== 数据处理 ==========
     
-    def filter_data(self, data: pd.DataFrame, column: str, 
+    @staticmethod
+    def _is_chunk_stream(data: Any) -> bool:
+        return not isinstance(data, (pd.DataFrame, pd.Series, dict, str)) and isinstance(data, Iterable)
+    
+    @staticmethod
+    def _filter_frame(data: pd.DataFrame, column: str, condition: str, value: Any) -> pd.DataFrame:
+        if condition == '==':
+            return data[data[column] == value]
+        elif condition == '!=':
+            return data[data[column] != value]
+        elif condition == '>':
+            return data[data[column] > value]
+        elif condition == '<':
+            return data[data[column] < value]
+        elif condition == '>=':
+            return data[data[column] >= value]
+        elif condition == '<=':
+            return data[data[column] <= value]
+        elif condition == 'contains':
+            return data[data[column].astype(str).str.contains(str(value))]
+        raise ValueError(f"不支持的条件: {condition}")
+    
+    def filter_data(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]], column: str,
                    condition: str, value: Any) -> Dict[str, Any]:
         """
         过滤数据
         
         Args:
-            data: DataFrame
+            data: DataFrame，或 read_excel(chunksize=...) 返回的DataFrame块迭代器
             column: 列名
             condition: 条件 ('==', '!=', '>', '<', '>=', '<=', 'contains')
             value: 比较值
         """
         try:
-            if condition == '==':
-                filtered = data[data[column] == value]
-            elif condition == '!=':
-                filtered = data[data[column] != value]
-            elif condition == '>':
-                filtered = data[data[column] > value]
-            elif condition == '<':
-                filtered = data[data[column] < value]
-            elif condition == '>=':
-                filtered = data[data[column] >= value]
-            elif condition == '<=':
-                filtered = data[data[column] <= value]
-            elif condition == 'contains':
-                filtered = data[data[column].astype(str).str.contains(str(value))]
+            if self._is_chunk_stream(data):
+                parts, total = [], 0
+                for chunk in data:
+                    total += len(chunk)
+                    parts.append(self._filter_frame(chunk, column, condition, value))
+                filtered = pd.concat(parts) if parts else pd.DataFrame()
             else:
-                return {"status": "error", "message": f"不支持的条件: {condition}"}
+                total = len(data)
+                filtered = self._filter_frame(data, column, condition, value)
             
             return {
                 "status": "success",
                 "data": filtered,
-                "original_count": len(data),
+                "original_count": total,
                 "filtered_count": len(filtered),
-                "message": f"过滤完成: {len(data)} -> {len(filtered)} 行"
+                "message": f"过滤完成: {total} -> {len(filtered)} 行"
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+    
+    def query_data(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame], None] = None,
+                   where: Optional[Union[Dict[str, Any], List[Any]]] = None,
+                   columns: Optional[List[str]] = None, limit: Optional[int] = None,
+                   file_path: Optional[str] = None, sheet_name: Optional[str] = None,
+                   header: Optional[int] = 0, sidecar: bool = False) -> Dict[str, Any]:
+        """
+        组合条件查询（一次向量化计算整个条件树，只复制一次结果）
+        
+        Args:
+            data: DataFrame或DataFrame块迭代器（与file_path二选一）
+            where: 条件树，如
+                   {"and": [["金额", ">=", 100], {"or": [["城市", "in", ["北京", "上海"]],
+                                                        {"not": ["备注", "isnull"]}]}]}
+                   运算符: == != > < >= <= in not_in between isnull notnull
+                           contains regex startswith endswith
+            columns: 输出列（None=全部列）
+            limit: 最多返回的行数
+            file_path: 直接查询Excel文件（只读取输出列和条件用到的列）
+            sheet_name: 工作表名称（None=第一个sheet）
+            header: 表头行号（0开始）
+            sidecar: 读取文件时使用列式旁路缓存
+        """
+        try:
+            if where is not None:
+                validate(where)
+            if file_path is not None:
+                loaded = self.read_excel(file_path, sheet_name=0 if sheet_name is None else sheet_name,
+                                         header=header, usecols=required_columns(where, columns),
+                                         sidecar=sidecar)
+                if loaded["status"] != "success":
+                    return loaded
+                data = loaded["data"]
+            if data is None:
+                return {"status": "error", "message": "请提供data或file_path"}
+            
+            if self._is_chunk_stream(data):
+                result, total = query_chunks(data, where, columns, limit)
+            else:
+                result, total = query_frame(data, where, columns, limit), len(data)
+            
+            return {
+                "status": "success",
+                "data": result,
+                "original_count": total,
+                "filtered_count": len(result),
+                "columns": list(result.columns),
+                "message": f"查询完成: {total} -> {len(result)} 行, {result.shape[1]} 列"
             }
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -239,29 +757,87 @@ class ExcelTool(RPAToolBase):
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
-    def group_aggregate(self, data: pd.DataFrame, group_by: str,
-                       agg_column: str, agg_func: str) -> Dict[str, Any]:
+    def group_aggregate(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                       group_by: Union[str, List[str]], agg_column: Optional[str] = None,
+                       agg_func: str = 'sum', aggregations: Optional[Union[Dict[str, Any], List[tuple]]] = None,
+                       max_bytes: Optional[int] = None) -> Dict[str, Any]:
         """
         分组聚合
         
         Args:
-            data: DataFrame
-            group_by: 分组列
+            data: DataFrame，或DataFrame块迭代器（流式聚合，内存只与分组数有关）
+            group_by: 分组列（可以是多列）
             agg_column: 聚合列
             agg_func: 聚合函数 ('sum', 'mean', 'count', 'min', 'max')
+            aggregations: 一次计算多个聚合，如 {"金额": ["sum", "mean"], "客户": "approx_distinct"}
+                          （输出列为 列_函数；设置后忽略agg_column/agg_func）
+            max_bytes: 流式聚合的分组状态内存上限（超出时返回错误）
         """
         try:
-            result = data.groupby(group_by)[agg_column].agg(agg_func).reset_index()
+            stats = None
+            if aggregations is None and not self._is_chunk_stream(data):
+                result = data.groupby(group_by)[agg_column].agg(agg_func).reset_index()
+            else:
+                if aggregations is None:
+                    aggregations = [(agg_column, agg_func, agg_column)]
+                aggregator = StreamingAggregator(group_by, aggregations, max_bytes=max_bytes)
+                if self._is_chunk_stream(data):
+                    aggregator.consume(data)
+                else:
+                    aggregator.update(data)
+                result = aggregator.result()
+                stats = aggregator.get_stats()
             
-            return {
+            output = {
                 "status": "success",
                 "data": result,
                 "groups": len(result),
                 "message": f"分组聚合完成: {len(result)} 个分组"
             }
+            if stats is not None:
+                output.update(rows=stats["rows"], state_bytes=stats["state_bytes"])
+            return output
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
+    def ingest_workbooks(self, pattern: str, master: Optional[pd.DataFrame] = None,
+                         merge_on: Optional[str] = None, how: str = 'left',
+                         group_by: Optional[Union[str, List[str]]] = None,
+                         agg_column: Optional[str] = None, agg_func: str = 'sum',
+                         aggregations: Optional[Union[Dict[str, Any], List[tuple]]] = None,
+                         sheet_name: Any = 0, header: Optional[int] = 0,
+                         usecols: Optional[List] = None, column_map: Optional[Dict[str, str]] = None,
+                         columns: Optional[List[str]] = None, dtype: Optional[Dict[str, Any]] = None,
+                         sidecar: bool = False, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        并行读取并汇总多个工作簿（每个文件在工作进程中读取、统一表结构、合并主表、部分聚合）
+        
+        Args:
+            pattern: 工作簿通配符，如 'data/regions/**/*.xlsx'
+            master: 主表（按merge_on与每个文件合并）
+            merge_on: 合并键
+            how: 合并方式
+            group_by: 分组列（不设置时返回合并后的明细）
+            agg_column: 聚合列
+            agg_func: 聚合函数 ('sum', 'mean', 'count', 'min', 'max')
+            aggregations: 一次计算多个聚合（见 group_aggregate）
+            sheet_name: 工作表名称或序号
+            header: 表头行号（0开始）
+            usecols: 读取的列
+            column_map: 列名映射（统一各文件的表头写法）
+            columns: 统一后保留的列
+            dtype: 列类型
+            sidecar: 使用列式旁路缓存读取
+            max_workers: 进程数（默认CPU核数）
+        """
+        from .excel_pipeline import ExcelPipeline
+        
+        pipeline = ExcelPipeline(pattern, max_workers=max_workers, sheet_name=sheet_name,
+                                 header=header, usecols=usecols, column_map=column_map,
+                                 columns=columns, dtype=dtype, sidecar=sidecar)
+        return pipeline.run(master=master, merge_on=merge_on, how=how, group_by=group_by,
+                            agg_column=agg_column, agg_func=agg_func, aggregations=aggregations)
+    
     # ========== 高级功能（基于现有项目） ==========
     
     def find_header_row(self, keywords: List[str], max_search_rows: int = 10) -> Dict[str, Any]:
@@ -276,11 +852,15 @@ class ExcelTool(RPAToolBase):
             if self.current_sheet is None:
                 return {"status": "error", "message": "请先选择工作表"}
             
-            for row in range(1, max_search_rows + 1):
+            # 限定在表格范围内读取（编辑模式下访问范围外的行会新建单元格、扩大表格）
+            ws = self.current_sheet
+            last_row = min(max_search_rows, ws.max_row)
+            rows = ws.iter_rows(min_row=1, max_row=last_row, max_col=ws.max_column, values_only=True)
+            for row, values in enumerate(rows, start=1):
                 headers = {}
-                for col_idx, cell in enumerate(self.current_sheet[row], start=1):
-                    if cell.value:
-                        headers[cell.value] = col_idx
+                for col_idx, value in enumerate(values, start=1):
+                    if value:
+                        headers[value] = col_idx
                 
                 # 检查是否包含所有关键字
                 if all(kw in headers for kw in keywords):
@@ -298,57 +878,140 @@ class ExcelTool(RPAToolBase):
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
+    def _date_row_index(self, date_column_name: str, value_column_name: str) -> Dict[str, Any]:
+        """
+        当前工作表的 日期 -> 行号 索引（首次使用时扫描一次，之后追加行时增量维护）
+        
+        单元格修改（write_cell / write_range / append_rows）或切换工作簿时失效。
+        """
+        key = (id(self.current_sheet), date_column_name, value_column_name)
+        index = self._date_indexes.get(key)
+        if index is not None:
+            return index
+        
+        header_result = self.find_header_row([date_column_name, value_column_name])
+        if header_result["status"] != "success":
+            raise ValueError(header_result["message"])
+        header_row = header_result["header_row"]
+        headers = header_result["headers"]
+        date_col = headers[date_column_name]
+        
+        rows: Dict[date, int] = {}
+        column = self.current_sheet.iter_cols(min_col=date_col, max_col=date_col,
+                                              min_row=header_row + 1, values_only=True)
+        for row_idx, cell_value in enumerate(next(column, ()), start=header_row + 1):
+            cmp_date = normalize_date(cell_value)
+            if cmp_date is not None:
+                rows.setdefault(cmp_date, row_idx)
+        
+        index = {
+            "rows": rows,
+            "date_col": date_col,
+            "value_col": headers[value_column_name],
+            "next_row": self.current_sheet.max_row + 1,
+        }
+        self._date_indexes[key] = index
+        return index
+    
+    def _peek_cell(self, row: int, column: int) -> Any:
+        """读取单元格值（不在表格范围外新建单元格）"""
+        ws = self.current_sheet
+        if row < 1 or column < 1:
+            raise ValueError(f"行号和列号从1开始: ({row},{column})")
+        if self.workbook_mode == "edit" and (row > ws.max_row or column > ws.max_column):
+            return None
+        values = next(ws.iter_rows(min_row=row, max_row=row, min_col=column, max_col=column,
+                                   values_only=True), (None,))
+        return values[0]
+    
+    def _mark_modified(self):
+        """单元格被修改：日期索引失效，工作簿不再与磁盘文件一致"""
+        self._date_indexes.clear()
+        self._workbook_fingerprint = None
+    
+    def _upsert_daily(self, index: Dict[str, Any], target_date: date, value: Any) -> bool:
+        """按索引更新或追加一行，返回是否更新了已有行"""
+        self._workbook_fingerprint = None
+        row_idx = index["rows"].get(target_date)
+        if row_idx is not None:
+            self.current_sheet.cell(row=row_idx, column=index["value_col"], value=value)
+            return True
+        row_idx = index["next_row"]
+        self.current_sheet.cell(row=row_idx, column=index["date_col"], value=target_date)
+        self.current_sheet.cell(row=row_idx, column=index["value_col"], value=value)
+        index["rows"][target_date] = row_idx
+        index["next_row"] = row_idx + 1
+        return False
+    
     def write_daily_data(self, target_date: date, value: Any,
                         date_column_name: str, value_column_name: str) -> Dict[str, Any]:
         """
         写入日期数据（基于现有daily_report项目）
         
-        自动查找日期匹配行，如果不存在则追加
+        自动查找日期匹配行，如果不存在则追加。日期单元格可以是datetime、date或常见格式的日期字符串，
+        按工作表缓存 日期 -> 行号 索引，多次调用不会重复扫描。
         """
         try:
+            error = self._require_mode("edit")
+            if error:
+                return error
             if self.current_sheet is None:
                 return {"status": "error", "message": "请先选择工作表"}
             
-            # 查找表头
-            header_result = self.find_header_row([date_column_name, value_column_name])
-            if header_result["status"] != "success":
-                return header_result
-            
-            header_row = header_result["header_row"]
-            headers = header_result["headers"]
-            date_col = headers[date_column_name]
-            value_col = headers[value_column_name]
+            target = normalize_date(target_date)
+            if target is None:
+                return {"status": "error", "message": f"无法解析日期: {target_date}"}
             
-            # 查找匹配日期的行
-            written = False
-            for row_idx in range(header_row + 1, self.current_sheet.max_row + 1):
-                cell_date = self.current_sheet.cell(row=row_idx, column=date_col).value
-                
-                # 尝试转换为date进行比较
-                cmp_date = None
-                if isinstance(cell_date, datetime):
-                    cmp_date = cell_date.date()
-                elif isinstance(cell_date, date):
-                    cmp_date = cell_date
-                
-                if cmp_date == target_date:
-                    # 找到匹配行，更新值
-                    self.current_sheet.cell(row=row_idx, column=value_col, value=value)
-                    written = True
-                    break
-            
-            # 如果未找到，追加新行
-            if not written:
-                new_row_idx = self.current_sheet.max_row + 1
-                self.current_sheet.cell(row=new_row_idx, column=date_col, value=target_date)
-                self.current_sheet.cell(row=new_row_idx, column=value_col, value=value)
+            index = self._date_row_index(date_column_name, value_column_name)
+            written = self._upsert_daily(index, target, value)
             
             return {
                 "status": "success",
-                "date": target_date,
+                "date": target,
                 "value": value,
                 "written": written,
-                "message": f"{'更新' if written else '新增'}日期数据: {target_date} = {value}"
+                "message": f"{'更新' if written else '新增'}日期数据: {target} = {value}"
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+    
+    def write_daily_data_bulk(self, records: Union[Dict[Any, Any], Iterable[tuple]],
+                              date_column_name: str, value_column_name: str) -> Dict[str, Any]:
+        """
+        批量写入日期数据（一次扫描，逐条更新或追加）
+        
+        Args:
+            records: {日期: 值} 或 [(日期, 值), ...]
+            date_column_name: 日期列表头
+            value_column_name: 数值列表头
+        """
+        try:
+            error = self._require_mode("edit")
+            if error:
+                return error
+            if self.current_sheet is None:
+                return {"status": "error", "message": "请先选择工作表"}
+            
+            pairs = records.items() if isinstance(records, dict) else records
+            index = self._date_row_index(date_column_name, value_column_name)
+            updated, appended, invalid = 0, 0, []
+            for raw_date, value in pairs:
+                target = normalize_date(raw_date)
+                if target is None:
+                    invalid.append(raw_date)
+                    continue
+                if self._upsert_daily(index, target, value):
+                    updated += 1
+                else:
+                    appended += 1
+            
+            return {
+                "status": "success",
+                "updated": updated,
+                "appended": appended,
+                "invalid": invalid,
+                "message": f"批量写入日期数据: 更新 {updated} 行, 新增 {appended} 行"
+                           + (f", {len(invalid)} 个日期无法解析" if invalid else "")
             }
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -0,0 +1,178 @@
+"""
+Excel流式写入
+逐行追加写出大表，内存占用与行数无关（openpyxl write-only 或 xlsxwriter constant_memory）
+"""
+import logging
+from typing import Any, Iterable, List, Optional, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("auto", "openpyxl", "xlsxwriter")
+
+
+def _xlsxwriter_available() -> bool:
+    try:
+        import xlsxwriter  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def clean_value(value: Any) -> Any:
+    """NaN/NaT转为空单元格，numpy标量转为Python类型"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if type(value).__name__ == "NaTType":
+        return None
+    if hasattr(value, "item") and hasattr(value, "dtype"):
+        value = value.item()
+        if isinstance(value, float) and value != value:
+            return None
+    return value
+
+
+def to_rows(data: Any, header: bool = False, index: bool = False) -> List[list]:
+    """
+    把二维数据批量转换为单元格值的行列表
+
+    支持DataFrame、NumPy数组（一维视为一行）和嵌套序列；NaN/NaT转为None，
+    numpy标量转为Python类型（按整块转换，不逐值判断类型）。
+    """
+    type_name = type(data).__name__
+    if type_name == "DataFrame":
+        if index:
+            data = data.reset_index()
+        values = data.astype(object).where(data.notna(), None).to_numpy().tolist()
+        if header:
+            values.insert(0, [str(c) for c in data.columns])
+        return values
+    if type_name == "ndarray":
+        import numpy as np
+        array = data.reshape(1, -1) if data.ndim == 1 else data
+        if array.dtype.kind == "f":
+            objects = array.astype(object)
+            objects[np.isnan(array)] = None
+            return objects.tolist()
+        if array.dtype.kind == "M":
+            objects = array.astype("datetime64[us]").astype(object)
+            objects[np.isnat(array)] = None
+            return objects.tolist()
+        return array.tolist()
+    return [[clean_value(v) for v in row] for row in data]
+
+
+class ExcelStreamWriter:
+    """
+    Excel流式写入器
+
+    只能按行追加，已写出的行不能再修改；close() 后文件才完整。
+    backend='auto' 时优先使用xlsxwriter（更快），未安装则使用openpyxl write-only模式。
+    """
+
+    def __init__(self, file_path: str, backend: str = "auto"):
+        """
+        Args:
+            file_path: 输出文件路径
+            backend: 'auto' | 'openpyxl' | 'xlsxwriter'
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的写入后端: {backend}")
+        if backend == "auto":
+            backend = "xlsxwriter" if _xlsxwriter_available() else "openpyxl"
+        self.file_path = str(file_path)
+        self.backend = backend
+        self.rows_written = 0
+        self._sheet = None
+        self._row_idx = 0
+        self._closed = False
+
+        if backend == "xlsxwriter":
+            import xlsxwriter
+            self._workbook = xlsxwriter.Workbook(self.file_path, {
+                "constant_memory": True,
+                "default_date_format": "yyyy-mm-dd",
+                "nan_inf_to_errors": True,
+            })
+        else:
+            from openpyxl import Workbook
+            self._workbook = Workbook(write_only=True)
+
+    @property
+    def sheet_name(self) -> Optional[str]:
+        if self._sheet is None:
+            return None
+        return self._sheet.name if self.backend == "xlsxwriter" else self._sheet.title
+
+    def add_sheet(self, name: str, header: Optional[Sequence[Any]] = None):
+        """新建工作表并设为当前表（可选写入表头）"""
+        if self.backend == "xlsxwriter":
+            self._sheet = self._workbook.add_worksheet(name)
+        else:
+            self._sheet = self._workbook.create_sheet(name)
+        self._row_idx = 0
+        if header is not None:
+            self.append(header)
+        return self
+
+    def append(self, row: Sequence[Any]):
+        """追加一行"""
+        if self._sheet is None:
+            self.add_sheet("Sheet1")
+        values = [clean_value(v) for v in row]
+        if self.backend == "xlsxwriter":
+            self._sheet.write_row(self._row_idx, 0, values)
+        else:
+            self._sheet.append(values)
+        self._row_idx += 1
+        self.rows_written += 1
+
+    def append_rows(self, rows: Iterable[Sequence[Any]]) -> int:
+        """追加多行，返回行数"""
+        count = 0
+        for row in rows:
+            self.append(row)
+            count += 1
+        return count
+
+    def write_dataframe(self, data, sheet_name: Optional[str] = None, index: bool = False,
+                        header: bool = True) -> int:
+        """
+        写入DataFrame或DataFrame块迭代器（逐块转换，块之间不驻留内存）
+
+        Returns:
+            写入的数据行数
+        """
+        import pandas as pd
+
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        if sheet_name is not None and self.sheet_name != sheet_name:
+            self.add_sheet(sheet_name)
+        count = 0
+        first = True
+        for chunk in chunks:
+            rows = to_rows(chunk, header=first and header, index=index)
+            count += self.append_rows(rows) - int(first and header)
+            first = False
+        return count
+
+    def close(self):
+        """完成写入并保存文件"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._sheet is None:
+            self.add_sheet("Sheet1")
+        if self.backend == "xlsxwriter":
+            self._workbook.close()
+        else:
+            self._workbook.save(self.file_path)
+        logger.debug(f"流式写入完成: {self.file_path}, {self.rows_written} 行 ({self.backend})")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,456 @@
+"""
+共享帧监视器
+单一后台截屏循环，多个视觉等待共享同一帧及其匹配计算
+"""
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import pyautogui
+
+
+logger = logging.getLogger(__name__)
+
+
+def _default_capture() -> np.ndarray:
+    """默认截屏函数（返回RGB数组）"""
+    return np.asarray(pyautogui.screenshot())
+
+
+class Frame:
+    """
+    单帧截图及其派生数据
+
+    灰度图、各缩放比例的屏幕图和模板匹配结果都按需计算并在
+    本帧内缓存，所有订阅者共享同一份计算结果。
+    """
+
+    def __init__(self, rgb: np.ndarray, seq: int, watcher: "FrameWatcher"):
+        self.rgb = rgb
+        self.seq = seq
+        self.timestamp = time.time()
+        self._watcher = watcher
+        self._gray = None
+        self._scaled: Dict[Tuple[bool, float], np.ndarray] = {}
+        # (template_name, region, grayscale) -> [(scale, max_val, max_loc), ...]
+        self._matches: Dict[tuple, List[tuple]] = {}
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY)
+        return self._gray
+
+    def image(self, grayscale: bool = True) -> np.ndarray:
+        """获取匹配用图像（灰度或BGR）"""
+        if grayscale:
+            return self.gray
+        key = (False, 1.0)
+        if key not in self._scaled:
+            self._scaled[key] = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2BGR)
+        return self._scaled[key]
+
+    def scaled(self, scale: float, grayscale: bool = True) -> np.ndarray:
+        """获取缩放后的屏幕图（同一帧内共享）"""
+        base = self.image(grayscale)
+        if scale == 1.0:
+            return base
+        key = (grayscale, scale)
+        if key not in self._scaled:
+            self._scaled[key] = cv2.resize(base, None, fx=scale, fy=scale,
+                                           interpolation=cv2.INTER_AREA)
+        return self._scaled[key]
+
+    def match(self, template_name: str, confidence: Optional[float] = None,
+              region: Optional[Tuple[int, int, int, int]] = None,
+              scales: Optional[List[float]] = None,
+              grayscale: bool = True) -> Dict[str, Any]:
+        """
+        在本帧中匹配模板（多尺度，按最佳缩放比例优先）
+
+        同一帧内对同一模板的各尺度匹配结果只计算一次，置信度不同的
+        订阅者复用已有结果。
+
+        Returns:
+            与VisionTool.find_image_multiscale一致的结果字典
+        """
+        watcher = self._watcher
+        conf = confidence if confidence is not None else watcher.confidence
+        template = watcher.load_template(template_name, grayscale)
+        h, w = template.shape[:2]
+
+        memo_key = (template_name, region, grayscale)
+        computed = self._matches.setdefault(memo_key, [])
+        done = {entry[0]: entry for entry in computed}
+
+        for scale in watcher.scale_order(template_name, scales):
+            entry = done.get(scale)
+            if entry is None:
+                entry = self._match_at_scale(template, scale, region, grayscale)
+                if entry is None:
+                    continue
+                computed.append(entry)
+                done[scale] = entry
+                watcher.stats["matches"] += 1
+            else:
+                watcher.stats["shared_matches"] += 1
+
+            _, max_val, max_loc = entry
+            if max_val >= conf:
+                x = int((max_loc[0] + w / 2) / scale)
+                y = int((max_loc[1] + h / 2) / scale)
+                if region:
+                    x += region[0]
+                    y += region[1]
+                watcher.scale_cache[template_name] = scale
+                return {
+                    "status": "success",
+                    "found": True,
+                    "position": (x, y),
+                    "confidence": float(max_val),
+                    "scale": scale,
+                    "frame_seq": self.seq,
+                    "message": f"找到图像 {template_name} at ({x}, {y}), 置信度: {max_val:.2f}"
+                }
+
+        return {
+            "status": "success",
+            "found": False,
+            "frame_seq": self.seq,
+            "message": f"未找到图像: {template_name}"
+        }
+
+    def _match_at_scale(self, template: np.ndarray, scale: float,
+                        region: Optional[Tuple[int, int, int, int]],
+                        grayscale: bool) -> Optional[tuple]:
+        screen = self.image(grayscale)
+        if region:
+            x, y, rw, rh = region
+            screen = screen[y:y + rh, x:x + rw]
+            if scale != 1.0:
+                screen = cv2.resize(screen, None, fx=scale, fy=scale,
+                                    interpolation=cv2.INTER_AREA)
+        else:
+            screen = self.scaled(scale, grayscale)
+
+        h, w = template.shape[:2]
+        if screen.shape[0] < h or screen.shape[1] < w:
+            return None
+
+        result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return (scale, max_val, max_loc)
+
+
+class _Subscription:
+    """单个订阅（模板或判定函数）"""
+
+    def __init__(self, sub_id: int, check: Callable[[Frame], Optional[Dict[str, Any]]],
+                 description: str, callback: Optional[Callable[[Dict[str, Any]], None]],
+                 timeout: Optional[float]):
+        self.id = sub_id
+        self.check = check
+        self.description = description
+        self.callback = callback
+        self.timeout = timeout
+        self.deadline = time.time() + timeout if timeout is not None else None
+        self.future: Future = Future()
+
+
+class FrameWatcher:
+    """
+    共享帧监视器
+
+    后台线程按固定FPS截屏，每帧依次评估所有订阅条件；截屏、灰度转换、
+    屏幕缩放和模板匹配按帧共享，订阅数增加不会增加截屏开销。
+    没有订阅时线程空闲等待，不截屏。
+
+    使用示例:
+        watcher = FrameWatcher(fps=5)
+        future = watcher.watch_template("submit.png", timeout=10)
+        result = future.result()
+    """
+
+    def __init__(self, fps: float = 5.0, image_dir: str = "picture",
+                 confidence: float = 0.8, grayscale: bool = True,
+                 scales: Optional[List[float]] = None,
+                 capture: Optional[Callable[[], np.ndarray]] = None,
+                 max_capture_failures: int = 20):
+        """
+        Args:
+            fps: 截屏帧率
+            image_dir: 模板图片目录
+            confidence: 默认匹配置信度
+            grayscale: 是否使用灰度匹配
+            scales: 多尺度搜索的缩放比例
+            capture: 截屏函数，返回RGB数组（默认使用PyAutoGUI）
+            max_capture_failures: 连续截屏失败达到该次数时，未完成的订阅以错误结果结束
+        """
+        self.fps = fps
+        self.image_dir = Path(image_dir)
+        self.confidence = confidence
+        self.grayscale = grayscale
+        self.scales = scales or [1.0, 0.95, 0.9, 0.85, 0.8, 0.75, 0.7]
+        self.scale_cache: Dict[str, float] = {}
+        self.capture = capture or _default_capture
+        self.max_capture_failures = max_capture_failures
+
+        self.stats = {"frames": 0, "matches": 0, "shared_matches": 0,
+                      "matched": 0, "timeouts": 0, "capture_errors": 0}
+        self.last_frame: Optional[Frame] = None
+
+        self._templates: Dict[Tuple[str, bool], np.ndarray] = {}
+        self._subscriptions: Dict[int, _Subscription] = {}
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    # ========== 生命周期 ==========
+
+    def start(self):
+        """启动后台截屏线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="FrameWatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 2.0):
+        """停止后台线程，未完成的订阅以超时结果结束"""
+        with self._cond:
+            self._running = False
+            pending = list(self._subscriptions.values())
+            self._subscriptions.clear()
+            self._cond.notify_all()
+        for sub in pending:
+            self._finish(sub, self._timeout_result(sub, "监视器已停止"))
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ========== 订阅 ==========
+
+    def watch_template(self, template_name: str, confidence: Optional[float] = None,
+                       region: Optional[Tuple[int, int, int, int]] = None,
+                       scales: Optional[List[float]] = None,
+                       callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       timeout: Optional[float] = None) -> Future:
+        """
+        订阅模板出现事件
+
+        Args:
+            template_name: 模板图片文件名
+            confidence: 匹配置信度
+            region: 搜索区域 (x, y, width, height)
+            scales: 缩放比例（None=使用默认多尺度，[1.0]=单尺度）
+            callback: 匹配或超时时回调，参数为结果字典
+            timeout: 超时时间（秒，None=不超时）
+
+        Returns:
+            Future，结果为与find_image_multiscale一致的结果字典
+        """
+        template_path = self.image_dir / template_name
+        if not template_path.exists():
+            future: Future = Future()
+            result = {"status": "error", "found": False,
+                      "message": f"模板图片不存在: {template_path}"}
+            future.set_result(result)
+            if callback:
+                callback(result)
+            return future
+
+        grayscale = self.grayscale
+
+        def check(frame: Frame) -> Optional[Dict[str, Any]]:
+            result = frame.match(template_name, confidence, region, scales, grayscale)
+            return result if result["found"] else None
+
+        return self._subscribe(check, template_name, callback, timeout)
+
+    def watch_predicate(self, predicate: Callable[[Frame], Any],
+                        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                        timeout: Optional[float] = None,
+                        description: str = "predicate") -> Future:
+        """
+        订阅自定义判定条件
+
+        Args:
+            predicate: 接收Frame的函数，返回真值即视为满足；可调用
+                frame.match() 与其他订阅者共享模板匹配结果
+            callback: 满足或超时时回调
+            timeout: 超时时间（秒）
+            description: 描述（用于日志和消息）
+        """
+        def check(frame: Frame) -> Optional[Dict[str, Any]]:
+            value = predicate(frame)
+            if not value:
+                return None
+            return {
+                "status": "success",
+                "found": True,
+                "value": value,
+                "frame_seq": frame.seq,
+                "message": f"条件满足: {description}"
+            }
+
+        return self._subscribe(check, description, callback, timeout)
+
+    def cancel(self, future: Future) -> bool:
+        """取消订阅"""
+        with self._cond:
+            for sub_id, sub in list(self._subscriptions.items()):
+                if sub.future is future:
+                    del self._subscriptions[sub_id]
+                    return future.cancel()
+        return False
+
+    def wait_for_template(self, template_name: str, timeout: float = 10.0,
+                          **kwargs) -> Dict[str, Any]:
+        """阻塞等待模板出现（wait_for_element的共享帧版本）"""
+        return self.watch_template(template_name, timeout=timeout, **kwargs).result()
+
+    @property
+    def subscription_count(self) -> int:
+        with self._cond:
+            return len(self._subscriptions)
+
+    # ========== 模板与缩放 ==========
+
+    def load_template(self, template_name: str, grayscale: bool = True) -> np.ndarray:
+        """读取模板（缓存）"""
+        key = (template_name, grayscale)
+        template = self._templates.get(key)
+        if template is None:
+            template = cv2.imread(str(self.image_dir / template_name),
+                                  cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
+            if template is None:
+                raise ValueError(f"无法读取模板图片: {template_name}")
+            self._templates[key] = template
+        return template
+
+    def scale_order(self, template_name: str, scales: Optional[List[float]] = None) -> List[float]:
+        """缩放尝试顺序（缓存的最佳比例优先）"""
+        scales = list(scales) if scales is not None else list(self.scales)
+        best = self.scale_cache.get(template_name)
+        if best in scales:
+            scales = [best] + [s for s in scales if s != best]
+        return scales
+
+    # ========== 内部实现 ==========
+
+    def _subscribe(self, check, description, callback, timeout) -> Future:
+        with self._cond:
+            sub = _Subscription(next(self._ids), check, description, callback, timeout)
+            self._subscriptions[sub.id] = sub
+            self._cond.notify_all()
+        self.start()
+        return sub.future
+
+    def _loop(self):
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        seq = 0
+        failures = 0
+        while True:
+            with self._cond:
+                while self._running and not self._subscriptions:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                subscriptions = list(self._subscriptions.values())
+
+            started = time.time()
+            try:
+                seq += 1
+                frame = Frame(self.capture(), seq, self)
+                self.last_frame = frame
+                self.stats["frames"] += 1
+            except Exception as e:
+                logger.error(f"截屏失败: {e}")
+                self.stats["capture_errors"] += 1
+                failures += 1
+                if failures >= self.max_capture_failures:
+                    # 截屏持续失败：结束全部订阅，避免等待方永久阻塞
+                    failures = 0
+                    for sub in subscriptions:
+                        self._remove(sub)
+                        self._finish(sub, self._timeout_result(sub, f"截屏失败({e})"))
+                else:
+                    self._expire(subscriptions, time.time())
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running, interval or 0.1)
+                continue
+            failures = 0
+
+            now = time.time()
+            for sub in subscriptions:
+                if sub.future.done():
+                    self._remove(sub)
+                    continue
+                try:
+                    result = sub.check(frame)
+                except Exception as e:
+                    result = {"status": "error", "found": False,
+                              "message": f"条件评估失败: {e}"}
+                if result is not None:
+                    self.stats["matched"] += 1
+                    self._remove(sub)
+                    self._finish(sub, result)
+                elif sub.deadline is not None and now >= sub.deadline:
+                    self.stats["timeouts"] += 1
+                    self._remove(sub)
+                    self._finish(sub, self._timeout_result(sub))
+
+            elapsed = time.time() - started
+            if interval > elapsed:
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running, interval - elapsed)
+
+    def _expire(self, subscriptions: List[_Subscription], now: float):
+        """结束已到期的订阅（截屏失败时也要执行，否则等待方不会超时）"""
+        for sub in subscriptions:
+            if sub.deadline is not None and now >= sub.deadline:
+                self.stats["timeouts"] += 1
+                self._remove(sub)
+                self._finish(sub, self._timeout_result(sub))
+
+    def _remove(self, sub: _Subscription):
+        with self._cond:
+            self._subscriptions.pop(sub.id, None)
+
+    def _finish(self, sub: _Subscription, result: Dict[str, Any]):
+        with self._cond:
+            if sub.future.running() or sub.future.done():
+                return
+            if not sub.future.set_running_or_notify_cancel():
+                return
+        sub.future.set_result(result)
+        if sub.callback:
+            try:
+                sub.callback(result)
+            except Exception as e:
+                logger.error(f"订阅回调异常({sub.description}): {e}", exc_info=True)
+
+    @staticmethod
+    def _timeout_result(sub: _Subscription, reason: Optional[str] = None) -> Dict[str, Any]:
+        if reason is None:
+            reason = f"等待超时({sub.timeout}s)"
+        return {
+            "status": "error",
+            "found": False,
+            "message": f"{reason}: {sub.description}"
+        }
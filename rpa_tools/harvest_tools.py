@@ -0,0 +1,287 @@
+"""
+剪贴板批量采集工具
+全选/框选复制GUI表格，一次性把剪贴板内容解析为DataFrame
+"""
+import csv
+import io
+import time
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyperclip
+
+from .base_tool import RPAToolBase, SafetyMixin
+
+
+_CLIPBOARD_SENTINEL = "__rpa_harvest_pending__"
+
+
+class _HTMLTableParser(HTMLParser):
+    """提取HTML中第一个<table>的单元格文本"""
+
+    def __init__(self):
+        super().__init__()
+        self.rows: List[List[str]] = []
+        self._depth = 0
+        self._done = False
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        if tag == "table":
+            self._depth += 1
+        elif self._depth == 1 and tag == "tr":
+            self._row = []
+        elif self._depth == 1 and tag in ("td", "th") and self._row is not None:
+            self._cell = []
+        elif self._cell is not None and tag == "br":
+            self._cell.append("\n")
+
+    def handle_endtag(self, tag):
+        if self._done:
+            return
+        if tag == "table":
+            self._depth -= 1
+            if self._depth == 0:
+                self._done = True
+        elif self._depth == 1 and tag in ("td", "th") and self._cell is not None:
+            self._row.append("".join(self._cell).strip())
+            self._cell = None
+        elif self._depth == 1 and tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def detect_table_format(text: str) -> str:
+    """检测剪贴板文本格式: 'html' | 'tsv' | 'csv'"""
+    head = text[:4096]
+    if "<table" in head.lower():
+        return "html"
+    first_line = head.splitlines()[0] if head else ""
+    if "\t" in first_line:
+        return "tsv"
+    return "csv"
+
+
+def infer_column_types(df: pd.DataFrame, min_ratio: float = 1.0) -> pd.DataFrame:
+    """
+    整列向量化类型推断（字符串 -> 数值/日期）
+
+    有值以0开头（如 "001"、"0755"）的列视为编号/代码，不转为数值，避免丢失前导零；
+    这类列只有全部带日期分隔符时才按日期解析（如 "01/02/2024"）。
+
+    Args:
+        df: 全部为字符串的DataFrame
+        min_ratio: 非空值中可解析比例达到该值才转换类型
+    """
+    result = {}
+    for column in df.columns:
+        series = df[column].astype(str).str.strip()
+        blank = series.eq("")
+        non_blank = int((~blank).sum())
+        if non_blank == 0:
+            result[column] = series.where(~blank)
+            continue
+
+        # 工号、编号、邮编、区号等带前导零的列保留文本
+        leading_zero = series[~blank].str.match(r"[+-]?0\d").any()
+        if leading_zero and not series[~blank].str.contains(r"[-/.:年月\s]", regex=True).all():
+            result[column] = series.where(~blank)
+            continue
+
+        # 数值：去掉千分位逗号，支持百分号
+        cleaned = series.str.replace(",", "", regex=False)
+        percent = cleaned.str.endswith("%")
+        numeric = pd.to_numeric(cleaned.str.rstrip("%"), errors="coerce")
+        if not leading_zero and numeric[~blank].notna().sum() >= min_ratio * non_blank:
+            result[column] = numeric.where(~percent, numeric / 100)
+            continue
+
+        # 日期
+        if series[~blank].str.contains(r"\d", regex=True).all():
+            parsed = pd.to_datetime(series.where(~blank), errors="coerce", format="mixed")
+            if parsed[~blank].notna().sum() >= min_ratio * non_blank:
+                result[column] = parsed
+                continue
+
+        result[column] = series.where(~blank)
+    return pd.DataFrame(result, index=df.index)
+
+
+def parse_table_text(text: str, fmt: str = "auto", header: bool = True,
+                     infer_types: bool = True) -> pd.DataFrame:
+    """
+    解析剪贴板表格文本为DataFrame
+
+    Args:
+        text: 剪贴板文本
+        fmt: 'auto' | 'tsv' | 'csv' | 'html'
+        header: 第一行是否为表头
+        infer_types: 是否进行类型推断
+    """
+    fmt = detect_table_format(text) if fmt == "auto" else fmt
+
+    if fmt == "html":
+        parser = _HTMLTableParser()
+        parser.feed(text)
+        rows = parser.rows
+        if not rows:
+            raise ValueError("未找到HTML表格")
+        width = max(len(r) for r in rows)
+        rows = [r + [""] * (width - len(r)) for r in rows]
+        if header:
+            df = pd.DataFrame(rows[1:], columns=rows[0])
+        else:
+            df = pd.DataFrame(rows)
+    else:
+        if fmt == "tsv":
+            sep = "\t"
+        else:
+            try:
+                sep = csv.Sniffer().sniff(text[:4096], delimiters=",;|").delimiter
+            except csv.Error:
+                sep = ","
+        df = pd.read_csv(io.StringIO(text), sep=sep, dtype=str, keep_default_na=False,
+                         header=0 if header else None, skip_blank_lines=True)
+
+    if infer_types:
+        df = infer_column_types(df)
+    return df
+
+
+class HarvestTool(RPAToolBase, SafetyMixin):
+    """剪贴板批量采集工具"""
+
+    def __init__(self, screen_tool=None):
+        RPAToolBase.__init__(self)
+        SafetyMixin.__init__(self)
+        self.description = "通过剪贴板一次性采集GUI表格数据"
+        self.screen_tool = screen_tool
+
+    def execute(self, **kwargs) -> Dict[str, Any]:
+        """通用执行接口"""
+        return {"status": "success", "message": "请使用具体方法"}
+
+    def _screen(self):
+        if self.screen_tool is None:
+            from .screen_tools import ScreenTool
+            self.screen_tool = ScreenTool()
+        return self.screen_tool
+
+    def copy_selection(self, mode: str = "all", x: Optional[int] = None, y: Optional[int] = None,
+                       x2: Optional[int] = None, y2: Optional[int] = None,
+                       timeout: float = 5.0) -> Dict[str, Any]:
+        """
+        选中目标区域并复制到剪贴板
+
+        Args:
+            mode: 'all'（点击x,y聚焦后Ctrl+A）| 'region'（从x,y拖拽到x2,y2）| 'none'（已选中）
+            x, y: 聚焦点或框选起点
+            x2, y2: 框选终点
+            timeout: 等待剪贴板更新的超时时间（秒）
+        """
+        try:
+            screen = self._screen()
+            if mode == "all":
+                if x is not None and y is not None:
+                    screen.click_at(x, y)
+                screen.hotkey('ctrl', 'a')
+            elif mode == "region":
+                if None in (x, y, x2, y2):
+                    return {"status": "error", "message": "框选模式需要 x, y, x2, y2"}
+                screen.drag_to(x, y, x2, y2, duration=0.5)
+            elif mode != "none":
+                return {"status": "error", "message": f"不支持的选择模式: {mode}"}
+
+            # 先写入哨兵值，确认复制真正完成后再读取
+            pyperclip.copy(_CLIPBOARD_SENTINEL)
+            screen.hotkey('ctrl', 'c')
+
+            deadline = time.time() + timeout
+            text = pyperclip.paste()
+            while text == _CLIPBOARD_SENTINEL:
+                if time.time() >= deadline:
+                    return {"status": "error", "message": f"剪贴板在{timeout}s内未更新"}
+                self.safe_delay(0.05)
+                text = pyperclip.paste()
+
+            return {
+                "status": "success",
+                "text": text,
+                "length": len(text),
+                "message": f"已复制 {len(text)} 字符"
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    def harvest_table(self, mode: str = "all", x: Optional[int] = None, y: Optional[int] = None,
+                      x2: Optional[int] = None, y2: Optional[int] = None,
+                      fmt: str = "auto", header: bool = True, infer_types: bool = True,
+                      restore_clipboard: bool = True, timeout: float = 5.0) -> Dict[str, Any]:
+        """
+        采集GUI表格/列表为DataFrame（选中+复制+解析，一次往返）
+
+        Args:
+            mode: 选择方式，见copy_selection
+            x, y, x2, y2: 聚焦点或框选坐标
+            fmt: 'auto' | 'tsv' | 'csv' | 'html'
+            header: 第一行是否为表头
+            infer_types: 是否整列推断数值/日期类型
+            restore_clipboard: 完成后是否恢复原剪贴板内容
+            timeout: 等待剪贴板更新的超时时间（秒）
+        """
+        previous = None
+        try:
+            if restore_clipboard:
+                previous = pyperclip.paste()
+
+            copied = self.copy_selection(mode, x, y, x2, y2, timeout)
+            if copied["status"] != "success":
+                return copied
+
+            return self.parse_table(copied["text"], fmt, header, infer_types)
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+        finally:
+            if previous is not None:
+                try:
+                    pyperclip.copy(previous)
+                except Exception:
+                    pass
+
+    def parse_table(self, text: str, fmt: str = "auto", header: bool = True,
+                    infer_types: bool = True) -> Dict[str, Any]:
+        """
+        解析表格文本（TSV/CSV/HTML）为DataFrame
+
+        Args:
+            text: 表格文本
+            fmt: 'auto' | 'tsv' | 'csv' | 'html'
+            header: 第一行是否为表头
+            infer_types: 是否整列推断数值/日期类型
+        """
+        try:
+            if not text or not text.strip():
+                return {"status": "error", "message": "剪贴板为空"}
+
+            detected = detect_table_format(text) if fmt == "auto" else fmt
+            df = parse_table_text(text, detected, header, infer_types)
+
+            return {
+                "status": "success",
+                "data": df,
+                "shape": df.shape,
+                "columns": list(df.columns),
+                "dtypes": {str(k): str(v) for k, v in df.dtypes.items()},
+                "format": detected,
+                "message": f"采集表格完成({detected}): 形状 {df.shape}"
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
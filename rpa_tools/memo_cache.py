@@ -0,0 +1,278 @@
+"""
+文件解析结果缓存
+读取文件的解析工具（Word文本提取、Excel读取）按 (文件指纹, 参数) 缓存结果，
+内存LRU按估算字节数淘汰（字符串列按抽样深度大小估算），可选磁盘二级缓存
+"""
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from .artifact_store import estimate_bytes
+
+
+logger = logging.getLogger(__name__)
+
+
+def file_fingerprint(path: str, hash_contents: bool = False) -> tuple:
+    """
+    文件指纹
+
+    默认 (绝对路径, 大小, mtime_ns)；hash_contents=True 时用内容SHA1代替mtime，
+    适用于复制、解压等会改变mtime但内容不变的场景。
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    if hash_contents:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return (path, stat.st_size, digest.hexdigest())
+    return (path, stat.st_size, stat.st_mtime_ns)
+
+
+def weigh(value: Any, depth: int = 0) -> int:
+    """估算结果占用的字节数（递归处理结果字典）"""
+    if depth < 3 and isinstance(value, dict):
+        return 64 + sum(weigh(v, depth + 1) for v in value.values())
+    if depth < 3 and isinstance(value, (list, tuple)):
+        return 64 + sum(weigh(v, depth + 1) for v in value[:1000]) * max(1, len(value) // 1000)
+    return estimate_bytes(value)
+
+
+def copy_result(value: Any) -> Any:
+    """复制缓存结果，避免调用方修改缓存中的DataFrame/字典"""
+    if isinstance(value, dict):
+        return {k: copy_result(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_result(v) for v in value]
+    if type(value).__name__ in ("DataFrame", "Series", "ndarray"):
+        return value.copy()
+    return value
+
+
+class MemoCache:
+    """
+    解析结果缓存
+
+    - 内存层：LRU，按估算字节数淘汰
+    - 磁盘层（可选）：pickle文件，进程重启后仍可命中
+    - invalidate_path() 使某个文件的全部缓存失效（写文件后调用）
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 enabled: bool = True):
+        """
+        Args:
+            max_bytes: 内存层容量（字节）
+            disk_dir: 磁盘层目录（None=不启用）
+            enabled: 是否启用缓存
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._paths: Dict[str, set] = {}  # 文件绝对路径 -> 缓存键
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "errors": 0}
+
+    def enable_disk(self, disk_dir: str):
+        """启用磁盘层"""
+        self.disk_dir = Path(disk_dir)
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return hashlib.sha1(repr(parts).encode("utf-8", "surrogatepass")).hexdigest()
+
+    # ========== 存取 ==========
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+        value = self._read_disk(key)
+        if value is not None:
+            self.stats["disk_hits"] += 1
+            self._store(key, value)
+            return value
+        self.stats["misses"] += 1
+        return default
+
+    def put(self, key: str, value: Any, path: Optional[str] = None, size: Optional[int] = None,
+            disk: bool = True):
+        """
+        写入缓存
+        
+        Args:
+            path: 关联的文件（用于按文件失效）
+            size: 估算字节数（默认按结果结构估算）
+            disk: 是否同时写入磁盘层
+        """
+        if path is not None:
+            with self._lock:
+                self._paths.setdefault(os.path.abspath(path), set()).add(key)
+        self._store(key, value, size)
+        if disk:
+            self._write_disk(key, value)
+    
+    def pop(self, key: str, default: Any = None) -> Any:
+        """取出并移除内存层中的条目"""
+        with self._lock:
+            if key in self._entries:
+                value = self._entries[key]
+                self._drop(key)
+                self.stats["hits"] += 1
+                return value
+        self.stats["misses"] += 1
+        return default
+
+    def invalidate_path(self, path: str) -> int:
+        """使指定文件的全部缓存失效，返回失效条目数"""
+        with self._lock:
+            keys = self._paths.pop(os.path.abspath(path), set())
+            for key in keys:
+                self._drop(key)
+        for key in keys:
+            disk_path = self._disk_path(key)
+            if disk_path is not None and disk_path.exists():
+                disk_path.unlink()
+        return len(keys)
+
+    def clear(self):
+        """清空内存层"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._paths.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats.update(entries=len(self._entries), bytes=self._bytes,
+                     hit_rate=(stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0)
+        return stats
+
+    # ========== 内部实现 ==========
+
+    def _store(self, key: str, value: Any, size: Optional[int] = None):
+        size = weigh(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._sizes[key]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats["evictions"] += 1
+
+    def _drop(self, key: str):
+        if key in self._entries:
+            del self._entries[key]
+            self._bytes -= self._sizes.pop(key)
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        if self.disk_dir is None:
+            return None
+        return self.disk_dir / key[:2] / f"{key}.pkl"
+
+    def _read_disk(self, key: str) -> Any:
+        path = self._disk_path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"读取磁盘缓存失败 {path}: {e}")
+            return None
+
+    def _write_disk(self, key: str, value: Any):
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"写入磁盘缓存失败 {path}: {e}")
+
+
+memo_cache = MemoCache()
+
+
+def get_memo_cache() -> MemoCache:
+    """获取全局解析结果缓存"""
+    return memo_cache
+
+
+def memoize(path_arg: Optional[str] = None, hash_contents: bool = False,
+            cache: Optional[MemoCache] = None) -> Callable:
+    """
+    缓存工具方法的成功结果
+
+    Args:
+        path_arg: 文件路径参数名（键包含该文件的指纹；参数为空时不缓存）
+        hash_contents: 文件指纹使用内容哈希而非mtime
+        cache: 使用的缓存（默认全局缓存）
+
+    只缓存 status == "success" 的结果（包含迭代器的流式结果不缓存），命中时返回副本。
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            target = cache or memo_cache
+            if not target.enabled:
+                return func(self, *args, **kwargs)
+            try:
+                bound = signature.bind(self, *args, **kwargs)
+            except TypeError:
+                return func(self, *args, **kwargs)
+            bound.apply_defaults()
+            call_args = dict(list(bound.arguments.items())[1:])
+
+            path = None
+            if path_arg is not None:
+                path = call_args.get(path_arg)
+                if not path or not os.path.isfile(path):
+                    return func(self, *args, **kwargs)
+                key = target.make_key(name, file_fingerprint(path, hash_contents), call_args)
+            else:
+                key = target.make_key(name, call_args)
+
+            cached = target.get(key)
+            if cached is not None:
+                return copy_result(cached)
+            result = func(self, *args, **kwargs)
+            if (isinstance(result, dict) and result.get("status") == "success"
+                    and not any(isinstance(v, Iterator) for v in result.values())):
+                target.put(key, copy_result(result), path=path)
+            return result
+        return wrapper
+    return decorator
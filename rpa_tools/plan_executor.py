@@ -0,0 +1,302 @@
+"""
+工具计划执行器
+按数据依赖并发执行一组工具调用，只在访问同一独占资源（屏幕、键盘、同一工作簿）时串行，
+并报告关键路径
+"""
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set
+
+
+logger = logging.getLogger(__name__)
+
+# 工具实例 -> 默认独占资源
+TOOL_RESOURCES = {
+    "screen_tool": ("screen", "keyboard"),
+    "vision_tool": ("screen",),
+    "harvest_tool": ("screen", "keyboard", "clipboard"),
+}
+
+# 取值为文件路径的参数，按路径加独占锁（另外以 _path 结尾的参数都按路径处理）
+PATH_ARGS = ("file_path", "output_path", "template_path", "save_path", "image_path",
+             "template", "template_name", "anchor_template", "output_dir")
+
+_REF = re.compile(r"\$\{([A-Za-z0-9_\-]+)((?:\.[^.}]+)*)\}")
+
+
+class PlanStep:
+    """计划中的一步"""
+
+    def __init__(self, step_id: str, tool: str, args: Optional[Dict[str, Any]] = None,
+                 depends_on: Optional[List[str]] = None, resources: Optional[List[str]] = None):
+        self.id = step_id
+        self.tool = tool
+        self.args = args or {}
+        self.depends_on: Set[str] = set(depends_on or ()) | _references(self.args)
+        self.resources = resources
+        self.status = "pending"
+        self.result: Any = None
+        self.start = 0.0
+        self.end = 0.0
+        self.lock_wait = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PlanStep":
+        return cls(data["id"], data["tool"], data.get("args"),
+                   data.get("depends_on"), data.get("resources"))
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.end - self.start)
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "tool": self.tool,
+            "status": self.status,
+            "depends_on": sorted(self.depends_on),
+            "resources": list(self.resources or ()),
+            "start": round(self.start - origin, 4) if self.start else None,
+            "duration": round(self.duration, 4),
+            "lock_wait": round(self.lock_wait, 4),
+            "message": self.result.get("message") if isinstance(self.result, dict) else None,
+        }
+
+
+def _references(value: Any) -> Set[str]:
+    """收集参数中 ${step} / ${step.key} 引用的步骤"""
+    if isinstance(value, str):
+        return {m.group(1) for m in _REF.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*(_references(v) for v in value.values())) if value else set()
+    if isinstance(value, (list, tuple)):
+        return set().union(*(_references(v) for v in value)) if value else set()
+    return set()
+
+
+def _lookup(result: Any, path: str) -> Any:
+    for key in filter(None, path.split(".")):
+        if isinstance(result, dict):
+            result = result[key]
+        elif isinstance(result, (list, tuple)):
+            result = result[int(key)]
+        else:
+            result = getattr(result, key)
+    return result
+
+
+def _substitute(value: Any, results: Dict[str, Any]) -> Any:
+    """把参数中的引用替换为前序步骤的结果"""
+    if isinstance(value, str):
+        whole = _REF.fullmatch(value)
+        if whole:
+            return _lookup(results[whole.group(1)], whole.group(2))
+        return _REF.sub(lambda m: str(_lookup(results[m.group(1)], m.group(2))), value)
+    if isinstance(value, dict):
+        return {k: _substitute(v, results) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, results) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_substitute(v, results) for v in value)
+    return value
+
+
+class PlanExecutor:
+    """
+    依赖感知的并发计划执行器
+
+    计划是步骤字典的列表：
+        {"id": "a", "tool": "read_excel", "args": {"file_path": "a.xlsx"}}
+        {"id": "r", "tool": "render_word_template",
+         "args": {"template_path": "t.docx", "data": "${a.columns}", "output_path": "r.docx"}}
+
+    - 参数中的 ${步骤id} / ${步骤id.键.键} 引用前序结果，并自动成为依赖；也可用 depends_on 显式声明
+    - 依赖全部成功的步骤立即并发执行；依赖失败的步骤标记为 skipped
+    - 资源默认按工具推断（GUI工具占用 screen/keyboard，路径参数占用 path:<绝对路径>），
+      也可用 resources 显式指定；持有相同资源的步骤互斥，锁按名称排序获取以避免死锁
+    """
+
+    def __init__(self, registry=None, max_workers: int = 8):
+        """
+        Args:
+            registry: RPAToolRegistry（默认全局注册表）
+            max_workers: 最大并发步骤数
+        """
+        if registry is None:
+            from .tool_registry import get_registry
+            registry = get_registry()
+        self.registry = registry
+        self.max_workers = max_workers
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def resources_for(self, step: PlanStep) -> List[str]:
+        """步骤需要独占的资源"""
+        if step.resources is not None:
+            return sorted(set(step.resources))
+        entry = self.registry.get_tool(step.tool) or {}
+        resources = set(TOOL_RESOURCES.get(entry.get("tool"), ()))
+        for name, path in step.args.items():
+            if name not in PATH_ARGS and not name.endswith("_path"):
+                continue
+            if isinstance(path, str) and path and not _REF.search(path):
+                resources.add(f"path:{os.path.abspath(path)}")
+        return sorted(resources)
+
+    def _lock(self, resource: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(resource, threading.Lock())
+
+    # ========== 执行 ==========
+
+    def run(self, plan: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        执行计划
+
+        Returns:
+            status, results(步骤id->结果), steps(每步耗时/锁等待), critical_path,
+            wall_time, serial_time(各步耗时之和)
+        """
+        try:
+            steps = {}
+            for data in plan:
+                step = data if isinstance(data, PlanStep) else PlanStep.from_dict(data)
+                if step.id in steps:
+                    return {"status": "error", "message": f"步骤ID重复: {step.id}"}
+                if self.registry.get_tool(step.tool) is None:
+                    return {"status": "error", "message": f"工具不存在: {step.tool} (步骤 {step.id})"}
+                steps[step.id] = step
+            for step in steps.values():
+                missing = step.depends_on - steps.keys()
+                if missing:
+                    return {"status": "error", "message": f"步骤 {step.id} 依赖不存在: {sorted(missing)}"}
+                step.resources = self.resources_for(step)
+            cycle = self._find_cycle(steps)
+            if cycle:
+                return {"status": "error", "message": f"计划存在循环依赖: {' -> '.join(cycle)}"}
+
+            origin = time.perf_counter()
+            self._execute(steps)
+            wall_time = time.perf_counter() - origin
+
+            critical_path, critical_time = self._critical_path(steps)
+            failed = [s.id for s in steps.values() if s.status != "success"]
+            return {
+                "status": "success" if not failed else "error",
+                "results": {s.id: s.result for s in steps.values()},
+                "steps": [s.to_dict(origin) for s in steps.values()],
+                "critical_path": critical_path,
+                "critical_time": round(critical_time, 4),
+                "wall_time": round(wall_time, 4),
+                "serial_time": round(sum(s.duration for s in steps.values()), 4),
+                "failed": failed,
+                "message": (f"计划完成: {len(steps)} 步, 耗时 {wall_time:.2f}s"
+                            if not failed else f"计划部分失败: {failed}")
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    def _execute(self, steps: Dict[str, PlanStep]):
+        pending = dict(steps)
+        running = {}
+        with ThreadPoolExecutor(self.max_workers, thread_name_prefix="rpa-plan") as pool:
+            while pending or running:
+                for step in list(pending.values()):
+                    deps = [steps[d] for d in step.depends_on]
+                    if any(d.status in ("error", "skipped") for d in deps):
+                        step.status = "skipped"
+                        step.result = {"status": "error", "message": "前序步骤失败，已跳过"}
+                        del pending[step.id]
+                    elif all(d.status == "success" for d in deps):
+                        step.status = "running"
+                        # 复制上下文，使会话级设置（如大对象存储）在执行线程中生效
+                        ctx = contextvars.copy_context()
+                        running[pool.submit(ctx.run, self._run_step, step, steps)] = step
+                        del pending[step.id]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+
+    def _run_step(self, step: PlanStep, steps: Dict[str, PlanStep]):
+        locks = [self._lock(r) for r in step.resources]
+        t0 = time.perf_counter()
+        for lock in locks:
+            lock.acquire()
+        try:
+            step.start = time.perf_counter()
+            step.lock_wait = step.start - t0
+            try:
+                args = _substitute(step.args, {d: steps[d].result for d in step.depends_on})
+                step.result = self.registry.get_tool(step.tool)["func"](**args)
+            except Exception as e:
+                step.result = {"status": "error", "message": str(e)}
+            step.end = time.perf_counter()
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        ok = not isinstance(step.result, dict) or step.result.get("status", "success") == "success"
+        step.status = "success" if ok else "error"
+        logger.debug(f"步骤 {step.id} ({step.tool}) {step.status}, 耗时 {step.duration:.3f}s")
+
+    # ========== 分析 ==========
+
+    @staticmethod
+    def _find_cycle(steps: Dict[str, PlanStep]) -> Optional[List[str]]:
+        state: Dict[str, int] = {}
+        stack: List[str] = []
+
+        def visit(step_id: str) -> Optional[List[str]]:
+            state[step_id] = 1
+            stack.append(step_id)
+            for dep in sorted(steps[step_id].depends_on):
+                if state.get(dep) == 1:
+                    return stack[stack.index(dep):] + [dep]
+                if dep not in state:
+                    found = visit(dep)
+                    if found:
+                        return found
+            stack.pop()
+            state[step_id] = 2
+            return None
+
+        for step_id in steps:
+            if step_id not in state:
+                found = visit(step_id)
+                if found:
+                    return found
+        return None
+
+    @staticmethod
+    def _critical_path(steps: Dict[str, PlanStep]):
+        """按实际耗时计算依赖图上的最长路径"""
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+
+        def longest(step_id: str) -> float:
+            if step_id not in finish:
+                step = steps[step_id]
+                best, best_dep = 0.0, None
+                for dep in step.depends_on:
+                    length = longest(dep)
+                    if length > best:
+                        best, best_dep = length, dep
+                finish[step_id] = best + step.duration
+                previous[step_id] = best_dep
+            return finish[step_id]
+
+        if not steps:
+            return [], 0.0
+        end = max(steps, key=longest)
+        path = []
+        node: Optional[str] = end
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return path[::-1], finish[end]
@@ -0,0 +1,377 @@
+"""
+工具调用性能剖析
+每次工具调用记录一个span（墙钟时间、CPU时间、各阶段耗时），输出到可插拔的sink
+"""
+import bisect
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Span:
+    """
+    单次工具调用的耗时记录
+
+    wall_time: 墙钟时间
+    cpu_time: 调用线程的CPU时间（time.thread_time）；工具交给线程池、进程池的工作不计入，
+              这类调用的cpu_time远小于wall_time并不代表在等待IO
+    phases: 各阶段墙钟耗时（注册表调用为 resolve / execute / log / compact）
+    """
+
+    __slots__ = ("name", "attributes", "status", "start", "wall_time", "cpu_time",
+                 "phases", "phase_events", "thread_id", "_t0", "_c0")
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.attributes = attributes or {}
+        self.status = "success"
+        self.start = time.time()
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.phases: Dict[str, float] = {}
+        self.phase_events: List[tuple] = []  # (阶段名, 相对span开始的偏移, 耗时)
+        self.thread_id = threading.get_ident()
+        self._t0 = time.perf_counter()
+        self._c0 = time.thread_time()
+
+    def finish(self):
+        self.wall_time = time.perf_counter() - self._t0
+        self.cpu_time = time.thread_time() - self._c0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "start": self.start,
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "phases": dict(self.phases),
+            "attributes": dict(self.attributes),
+        }
+
+
+class Profiler:
+    """
+    剖析器
+
+    span() 包裹一次调用，phase() 在当前span内记录阶段耗时（无当前span时为空操作）。
+    span结束后依次交给所有sink。enabled=False 时 wrap() 包装的函数直接调用原函数。
+    """
+
+    def __init__(self, sinks: Optional[List[Any]] = None, enabled: bool = True):
+        self.sinks = list(sinks) if sinks is not None else []
+        self.enabled = enabled
+        self._local = threading.local()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+
+    def current_span(self) -> Optional[Span]:
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """记录一个span"""
+        if not self.enabled:
+            yield None
+            return
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        span = Span(name, attributes)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException:
+            span.status = "exception"
+            raise
+        finally:
+            span.finish()
+            stack.pop()
+            self._emit(span)
+
+    @contextmanager
+    def phase(self, name: str):
+        """在当前span内记录阶段耗时（同名阶段累加）"""
+        span = self.current_span()
+        if span is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            span.phases[name] = span.phases.get(name, 0.0) + elapsed
+            span.phase_events.append((name, started - span._t0, elapsed))
+
+    def wrap(self, func: Callable, name: str, **attributes) -> Callable:
+        """包装函数：每次调用记录一个span，状态取自结果字典的status"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            with self.span(name, **attributes) as span:
+                result = func(*args, **kwargs)
+                if isinstance(result, dict) and "status" in result:
+                    span.status = result["status"]
+                return result
+        wrapper.__wrapped_span__ = name
+        return wrapper
+
+    def _emit(self, span: Span):
+        for sink in self.sinks:
+            try:
+                sink.record(span)
+            except Exception as e:
+                logger.error(f"性能记录输出失败({type(sink).__name__}): {e}")
+
+
+class HistogramSink:
+    """
+    内存直方图
+
+    按span名称统计调用次数、状态、墙钟/CPU时间直方图以及各阶段耗时，
+    内存占用与调用次数无关。
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _new_histogram(self) -> Dict[str, Any]:
+        return {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0, "max": 0.0}
+
+    def _observe(self, hist: Dict[str, Any], value: float):
+        hist["counts"][bisect.bisect_left(self.buckets, value)] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+        hist["max"] = max(hist["max"], value)
+
+    def record(self, span: Span):
+        with self._lock:
+            stats = self._stats.get(span.name)
+            if stats is None:
+                stats = self._stats[span.name] = {
+                    "wall": self._new_histogram(),
+                    "cpu_sum": 0.0,
+                    "status": {},
+                    "phases": {},
+                }
+            self._observe(stats["wall"], span.wall_time)
+            stats["cpu_sum"] += span.cpu_time
+            stats["status"][span.status] = stats["status"].get(span.status, 0) + 1
+            for phase, seconds in span.phases.items():
+                hist = stats["phases"].get(phase)
+                if hist is None:
+                    hist = stats["phases"][phase] = self._new_histogram()
+                self._observe(hist, seconds)
+
+    def _quantile(self, hist: Dict[str, Any], q: float) -> float:
+        """按桶估算分位数（返回所在桶上界）"""
+        if hist["count"] == 0:
+            return 0.0
+        target = q * hist["count"]
+        running = 0
+        for i, count in enumerate(hist["counts"]):
+            running += count
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else hist["max"]
+        return hist["max"]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """原始直方图数据的拷贝"""
+        with self._lock:
+            return json.loads(json.dumps(self._stats))
+
+    def summary(self, sort_by: str = "total") -> List[Dict[str, Any]]:
+        """
+        各工具耗时汇总（默认按总耗时降序，找出主导任务延迟的工具）
+        """
+        rows = []
+        for name, stats in self.snapshot().items():
+            wall = stats["wall"]
+            rows.append({
+                "name": name,
+                "count": wall["count"],
+                "total": wall["sum"],
+                "mean": wall["sum"] / wall["count"] if wall["count"] else 0.0,
+                "p50": self._quantile(wall, 0.5),
+                "p95": self._quantile(wall, 0.95),
+                "max": wall["max"],
+                "cpu_total": stats["cpu_sum"],
+                "status": stats["status"],
+                "phases": {p: h["sum"] for p, h in stats["phases"].items()},
+            })
+        rows.sort(key=lambda r: r[sort_by], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class PrometheusSink(HistogramSink):
+    """
+    Prometheus文本格式输出
+
+    render() 生成 text exposition 格式；serve() 在后台线程启动 /metrics 端点。
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix: str = "rpa_tool"):
+        super().__init__(buckets)
+        self.prefix = prefix
+        self._server = None
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def _histogram_lines(self, metric: str, labels: str, hist: Dict[str, Any]) -> List[str]:
+        lines = []
+        running = 0
+        for bound, count in zip(self.buckets, hist["counts"]):
+            running += count
+            lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {running}')
+        lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {hist["count"]}')
+        lines.append(f"{metric}_sum{{{labels}}} {hist['sum']}")
+        lines.append(f"{metric}_count{{{labels}}} {hist['count']}")
+        return lines
+
+    def render(self) -> str:
+        """生成Prometheus text exposition格式文本"""
+        p = self.prefix
+        stats = self.snapshot()
+        lines = [
+            f"# HELP {p}_duration_seconds Wall time of tool calls.",
+            f"# TYPE {p}_duration_seconds histogram",
+        ]
+        for name, s in sorted(stats.items()):
+            lines += self._histogram_lines(f"{p}_duration_seconds", f'tool="{self._escape(name)}"', s["wall"])
+
+        lines += [f"# HELP {p}_cpu_seconds_total CPU time of tool calls.",
+                  f"# TYPE {p}_cpu_seconds_total counter"]
+        for name, s in sorted(stats.items()):
+            lines.append(f'{p}_cpu_seconds_total{{tool="{self._escape(name)}"}} {s["cpu_sum"]}')
+
+        lines += [f"# HELP {p}_calls_total Tool calls by result status.",
+                  f"# TYPE {p}_calls_total counter"]
+        for name, s in sorted(stats.items()):
+            for status, count in sorted(s["status"].items()):
+                lines.append(f'{p}_calls_total{{tool="{self._escape(name)}",status="{self._escape(status)}"}} {count}')
+
+        lines += [f"# HELP {p}_phase_duration_seconds Wall time of tool call phases.",
+                  f"# TYPE {p}_phase_duration_seconds histogram"]
+        for name, s in sorted(stats.items()):
+            for phase, hist in sorted(s["phases"].items()):
+                labels = f'tool="{self._escape(name)}",phase="{self._escape(phase)}"'
+                lines += self._histogram_lines(f"{p}_phase_duration_seconds", labels, hist)
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9108, host: str = "127.0.0.1"):
+        """在后台线程启动 http://host:port/metrics"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="PrometheusSink", daemon=True).start()
+        logger.info(f"性能指标端点: http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class JsonTraceSink:
+    """
+    JSON追踪文件（Chrome Trace Event格式）
+
+    每个span及其阶段写为complete事件，可在 chrome://tracing 或 Perfetto 中查看。
+    """
+
+    def __init__(self, path: str = "traces/rpa_trace.json"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._first = True
+        self._pid = 1
+
+    def record(self, span: Span):
+        start_us = span.start * 1e6
+        events = [{
+            "name": span.name, "cat": "tool", "ph": "X",
+            "ts": start_us, "dur": span.wall_time * 1e6,
+            "pid": self._pid, "tid": span.thread_id,
+            "args": {"status": span.status, "cpu_time": span.cpu_time, **span.attributes},
+        }]
+        for phase, offset, seconds in span.phase_events:
+            events.append({
+                "name": phase, "cat": "phase", "ph": "X",
+                "ts": start_us + offset * 1e6, "dur": seconds * 1e6,
+                "pid": self._pid, "tid": span.thread_id,
+            })
+
+        with self._lock:
+            if self._file.closed:
+                return
+            for event in events:
+                if not self._first:
+                    self._file.write(",\n")
+                self._file.write(json.dumps(event, ensure_ascii=False, default=str))
+                self._first = False
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.write("\n]\n")
+                self._file.close()
+
+
+# 全局剖析器（默认带内存直方图）
+histogram_sink = HistogramSink()
+profiler = Profiler(sinks=[histogram_sink])
+
+
+def get_profiler() -> Profiler:
+    """获取全局剖析器"""
+    return profiler
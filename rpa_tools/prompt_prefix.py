@@ -0,0 +1,179 @@
+"""
+规范化提示词前缀
+系统说明+按名称排序的工具说明组成固定前缀，只有任务相关的后缀变化，
+使Ollama / vLLM 的KV前缀缓存在多次规划调用之间可以复用
+"""
+import hashlib
+import json
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+from .tool_selector import estimate_tokens
+
+
+# 前缀格式变化时递增（使旧的缓存/统计失效）
+PROMPT_VERSION = "1"
+
+DEFAULT_SYSTEM_TEXT = (
+    "你是一个桌面自动化助手，通过调用下列RPA工具完成用户任务。"
+    "每次只调用一个工具，根据工具返回的status和message决定下一步。"
+)
+
+
+def normalize_text(text: str) -> str:
+    """统一Unicode形式并折叠空白"""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+def canonical_tool_schema(entry: Dict[str, Any]) -> Dict[str, str]:
+    """工具的规范化描述（与注册顺序、进程无关）"""
+    return {"name": entry["name"], "description": normalize_text(entry["description"])}
+
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    data = json.dumps(schema, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def render_tools(schemas: Sequence[Dict[str, str]]) -> str:
+    return "\n".join(f"- {s['name']}: {s['description']}" for s in schemas)
+
+
+class PromptPrefix:
+    """
+    版本化的规范提示词前缀
+
+    前缀 = 版本行 + 系统说明 + 按名称排序的工具说明；同样的工具集在任何进程中生成
+    逐字节相同的前缀和相同的hash。build() 只在前缀之后追加任务后缀。
+
+    缓存命中统计：与上一次请求前缀hash相同记为命中（单槽KV缓存，如Ollama）；
+    调用 record_response() 传入服务端返回的实际计算token数时，同时统计复用的token数。
+    """
+
+    def __init__(self, registry=None, system_text: str = DEFAULT_SYSTEM_TEXT,
+                 version: str = PROMPT_VERSION, include_tools: bool = True):
+        """
+        Args:
+            registry: RPAToolRegistry（默认全局注册表）
+            system_text: 系统说明
+            version: 前缀版本
+            include_tools: 前缀是否包含全部工具说明（使用ToolSelector按步选择工具时设为False，
+                           所选工具放在后缀中）
+        """
+        if registry is None:
+            from .tool_registry import get_registry
+            registry = get_registry()
+        self.registry = registry
+        self.system_text = normalize_text(system_text)
+        self.version = version
+        self.include_tools = include_tools
+        self._text: Optional[str] = None
+        self._hash: Optional[str] = None
+        self._lock = threading.Lock()
+        self._last_hash: Optional[str] = None
+        self.stats = {"requests": 0, "prefix_hits": 0, "prefix_changes": 0,
+                      "prompt_tokens": 0, "evaluated_tokens": 0, "cached_tokens": 0}
+
+    # ========== 前缀 ==========
+
+    def tool_schemas(self, names: Optional[Sequence[str]] = None) -> List[Dict[str, str]]:
+        """按名称排序的规范化工具描述"""
+        tools = self.registry.tools
+        selected = sorted(names) if names is not None else sorted(tools)
+        return [canonical_tool_schema(tools[n]) for n in selected if n in tools]
+
+    def tool_hashes(self) -> Dict[str, str]:
+        """每个工具描述的hash（用于定位前缀变化的来源）"""
+        return {s["name"]: schema_hash(s) for s in self.tool_schemas()}
+
+    def _build_prefix(self) -> str:
+        parts = [f"[prompt v{self.version}]", self.system_text]
+        if self.include_tools:
+            parts.append("可用工具:\n" + render_tools(self.tool_schemas()))
+        return "\n\n".join(parts) + "\n\n"
+
+    def refresh(self):
+        """重新生成前缀（注册表工具变化后调用）"""
+        with self._lock:
+            self._text = self._build_prefix()
+            self._hash = hashlib.sha256(self._text.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self.refresh()
+        return self._text
+
+    @property
+    def hash(self) -> str:
+        if self._hash is None:
+            self.refresh()
+        return self._hash
+
+    @property
+    def token_count(self) -> int:
+        return estimate_tokens(self.text)
+
+    def build(self, task: str, tools: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        组装完整提示词
+
+        Args:
+            task: 任务相关的后缀（用户指令、历史步骤等）
+            tools: 本步选择的工具（include_tools=False 时放入后缀，按名称排序）
+
+        Returns:
+            prompt, prefix_hash, prefix_hit(前缀是否与上一次相同), prompt_tokens
+        """
+        suffix = ""
+        if tools is not None:
+            suffix = "本步可用工具:\n" + render_tools(self.tool_schemas(tools)) + "\n\n"
+        suffix += task
+        prompt = self.text + suffix
+
+        prefix_hash = self.hash
+        prompt_tokens = estimate_tokens(prompt)
+        with self._lock:
+            hit = prefix_hash == self._last_hash
+            self.stats["requests"] += 1
+            self.stats["prefix_hits"] += int(hit)
+            self.stats["prefix_changes"] += int(not hit and self._last_hash is not None)
+            self.stats["prompt_tokens"] += prompt_tokens
+            self._last_hash = prefix_hash
+        return {"prompt": prompt, "prefix_hash": prefix_hash, "prefix_hit": hit,
+                "prompt_tokens": prompt_tokens, "version": self.version}
+
+    def record_response(self, prompt_tokens: int, evaluated_tokens: int):
+        """
+        记录服务端实际计算的token数
+
+        Args:
+            prompt_tokens: 提示词总token数
+            evaluated_tokens: 服务端实际预填充的token数（Ollama的prompt_eval_count）
+        """
+        with self._lock:
+            self.stats["evaluated_tokens"] += evaluated_tokens
+            self.stats["cached_tokens"] += max(0, prompt_tokens - evaluated_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats.update(
+            version=self.version,
+            prefix_hash=self.hash,
+            prefix_tokens=self.token_count,
+            prefix_hit_rate=stats["prefix_hits"] / stats["requests"] if stats["requests"] else 0.0,
+        )
+        return stats
+
+    def render_metrics(self) -> str:
+        """Prometheus文本格式的前缀缓存指标"""
+        stats = self.get_stats()
+        label = f'version="{self.version}",prefix_hash="{stats["prefix_hash"]}"'
+        lines = []
+        for key in ("requests", "prefix_hits", "prefix_changes", "cached_tokens", "evaluated_tokens"):
+            lines.append(f"# TYPE rpa_prompt_{key}_total counter")
+            lines.append(f"rpa_prompt_{key}_total{{{label}}} {stats[key]}")
+        lines.append("# TYPE rpa_prompt_prefix_tokens gauge")
+        lines.append(f"rpa_prompt_prefix_tokens{{{label}}} {stats['prefix_tokens']}")
+        return "\n".join(lines) + "\n"
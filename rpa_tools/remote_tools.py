@@ -0,0 +1,611 @@
+"""
+远程工具调用
+Agent机器（LLM、知识库）通过TCP调用RPA执行机上的 RPAToolRegistry
+
+协议:
+    帧   = 长度(uint32, 大端) + 标志(uint8, bit0=zlib压缩) + 负载
+    负载 = 紧凑二进制编码（msgpack风格的类型标记+长度），原生支持 ndarray、DataFrame、
+           PIL图像、datetime，不使用pickle（不在网络上反序列化任意对象）
+
+持久连接，请求带id，可流水线发送多个请求（响应按完成顺序返回），也可批量调用。
+"""
+import argparse
+import hmac
+import ipaddress
+import logging
+import socket
+import socketserver
+import struct
+import threading
+import zlib
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+COMPRESS_THRESHOLD = 4096
+MAX_FRAME = 1 << 30
+MAX_AUTH_FRAME = 64 << 10   # 认证完成前允许的最大帧（含解压后大小）
+
+_HEADER = struct.Struct(">IB")
+_U32 = struct.Struct(">I")
+_I64 = struct.Struct(">q")
+_F64 = struct.Struct(">d")
+FLAG_ZLIB = 0x01
+
+
+class RemoteToolError(Exception):
+    """远程调用失败（连接中断、服务端异常、认证失败）"""
+
+
+# ========== 编解码 ==========
+
+def encode(value: Any) -> bytes:
+    """把值编码为字节串"""
+    out: List[bytes] = []
+    _encode(value, out)
+    return b"".join(out)
+
+
+def decode(data: bytes) -> Any:
+    """从字节串解码"""
+    value, _ = _decode(memoryview(data), 0)
+    return value
+
+
+def _put_bytes(tag: bytes, data: bytes, out: List[bytes]):
+    out.append(tag + _U32.pack(len(data)))
+    out.append(data)
+
+
+def _encode(value: Any, out: List[bytes]):
+    if value is None:
+        out.append(b"N")
+    elif value is True:
+        out.append(b"T")
+    elif value is False:
+        out.append(b"F")
+    elif isinstance(value, int):
+        if -(1 << 63) <= value < (1 << 63):
+            out.append(b"i" + _I64.pack(value))
+        else:
+            _put_bytes(b"I", str(value).encode(), out)
+    elif isinstance(value, float):
+        out.append(b"d" + _F64.pack(value))
+    elif isinstance(value, str):
+        _put_bytes(b"s", value.encode("utf-8", "surrogatepass"), out)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        _put_bytes(b"b", bytes(value), out)
+    elif isinstance(value, (list, tuple, set)):
+        out.append(b"l" + _U32.pack(len(value)))
+        for item in value:
+            _encode(item, out)
+    elif isinstance(value, dict):
+        out.append(b"m" + _U32.pack(len(value)))
+        for key, item in value.items():
+            _encode(key, out)
+            _encode(item, out)
+    elif isinstance(value, datetime):
+        _put_bytes(b"t", value.isoformat().encode(), out)
+    elif isinstance(value, date):
+        _put_bytes(b"D", value.isoformat().encode(), out)
+    else:
+        _encode_extension(value, out)
+
+
+def _encode_extension(value: Any, out: List[bytes]):
+    type_name = type(value).__name__
+    if type_name == "ndarray":
+        if value.dtype.hasobject:
+            out.append(b"O")
+            _encode(value.tolist(), out)
+            return
+        out.append(b"A")
+        _encode(value.dtype.str, out)
+        _encode(list(value.shape), out)
+        _put_bytes(b"b", value.tobytes(), out)
+    elif type_name == "DataFrame":
+        out.append(b"P")
+        _encode(list(value.columns), out)
+        _encode(_column_values(value.index), out)
+        out.append(_U32.pack(value.shape[1]))
+        for i in range(value.shape[1]):
+            _encode(_column_values(value.iloc[:, i]), out)
+    elif type_name == "Series":
+        out.append(b"R")
+        _encode(value.name, out)
+        _encode(_column_values(value.index), out)
+        _encode(_column_values(value), out)
+    elif hasattr(value, "getbands") and hasattr(value, "tobytes"):
+        out.append(b"G")
+        _encode(value.mode, out)
+        _encode(list(value.size), out)
+        _put_bytes(b"b", value.tobytes(), out)
+    elif hasattr(value, "item") and hasattr(value, "dtype"):
+        _encode(value.item(), out)  # numpy标量
+    elif hasattr(value, "isoformat"):
+        _put_bytes(b"s", value.isoformat().encode(), out)
+    else:
+        _put_bytes(b"s", str(value).encode("utf-8", "surrogatepass"), out)
+
+
+def _column_values(column) -> Any:
+    """数值列按原始数组传输，其余列转为Python列表（缺失值统一为None）"""
+    import pandas as pd
+    values = column.to_numpy() if hasattr(column, "to_numpy") else column
+    if getattr(values, "dtype", None) is not None and values.dtype.kind in "biufcmM":
+        return values
+    # 只对标量判断缺失（单元格可能是数组等容器）
+    return [None if pd.api.types.is_scalar(v) and pd.isna(v) else v for v in values.tolist()]
+
+
+def _label(value: Any) -> Any:
+    """解码后的行列标签：多级标签还原为元组"""
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _read_len(buf: memoryview, pos: int) -> Tuple[int, int]:
+    return _U32.unpack_from(buf, pos)[0], pos + 4
+
+
+def _decode(buf: memoryview, pos: int) -> Tuple[Any, int]:
+    tag = buf[pos:pos + 1].tobytes()
+    pos += 1
+    if tag == b"N":
+        return None, pos
+    if tag == b"T":
+        return True, pos
+    if tag == b"F":
+        return False, pos
+    if tag == b"i":
+        return _I64.unpack_from(buf, pos)[0], pos + 8
+    if tag == b"d":
+        return _F64.unpack_from(buf, pos)[0], pos + 8
+    if tag in (b"s", b"b", b"I", b"t", b"D"):
+        size, pos = _read_len(buf, pos)
+        raw = buf[pos:pos + size].tobytes()
+        pos += size
+        if tag == b"b":
+            return raw, pos
+        text = raw.decode("utf-8", "surrogatepass")
+        if tag == b"I":
+            return int(text), pos
+        if tag == b"t":
+            return datetime.fromisoformat(text), pos
+        if tag == b"D":
+            return date.fromisoformat(text), pos
+        return text, pos
+    if tag == b"l":
+        count, pos = _read_len(buf, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _decode(buf, pos)
+            items.append(item)
+        return items, pos
+    if tag == b"m":
+        count, pos = _read_len(buf, pos)
+        mapping = {}
+        for _ in range(count):
+            key, pos = _decode(buf, pos)
+            mapping[key if not isinstance(key, list) else tuple(key)], pos = _decode(buf, pos)
+        return mapping, pos
+    return _decode_extension(tag, buf, pos)
+
+
+def _decode_extension(tag: bytes, buf: memoryview, pos: int) -> Tuple[Any, int]:
+    if tag == b"A":
+        import numpy as np
+        dtype, pos = _decode(buf, pos)
+        shape, pos = _decode(buf, pos)
+        raw, pos = _decode(buf, pos)
+        return np.frombuffer(raw, dtype=np.dtype(dtype)).reshape(shape).copy(), pos
+    if tag == b"O":
+        import numpy as np
+        items, pos = _decode(buf, pos)
+        return np.array(items, dtype=object), pos
+    if tag == b"P":
+        import pandas as pd
+        columns, pos = _decode(buf, pos)
+        index, pos = _decode(buf, pos)
+        count, pos = _read_len(buf, pos)
+        data = {}
+        for i in range(count):
+            data[i], pos = _decode(buf, pos)
+        df = pd.DataFrame(data, index=pd.Index(index))
+        labels = [_label(c) for c in columns]
+        if labels and all(isinstance(c, tuple) for c in labels):
+            labels = pd.MultiIndex.from_tuples(labels)
+        df.columns = labels
+        return df, pos
+    if tag == b"R":
+        import pandas as pd
+        name, pos = _decode(buf, pos)
+        index, pos = _decode(buf, pos)
+        values, pos = _decode(buf, pos)
+        return pd.Series(values, index=pd.Index(index), name=_label(name)), pos
+    if tag == b"G":
+        from PIL import Image
+        mode, pos = _decode(buf, pos)
+        size, pos = _decode(buf, pos)
+        raw, pos = _decode(buf, pos)
+        return Image.frombytes(mode, tuple(size), raw), pos
+    raise RemoteToolError(f"未知的类型标记: {tag!r}")
+
+
+# ========== 帧 ==========
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("连接已关闭")
+        received += n
+    return bytes(buf)
+
+
+def send_frame(sock: socket.socket, message: Any, compress_threshold: int = COMPRESS_THRESHOLD):
+    payload = encode(message)
+    flags = 0
+    if len(payload) >= compress_threshold:
+        compressed = zlib.compress(payload, 1)
+        if len(compressed) < len(payload):
+            payload, flags = compressed, FLAG_ZLIB
+    sock.sendall(_HEADER.pack(len(payload), flags) + payload)
+
+
+def recv_frame(sock: socket.socket, max_size: int = MAX_FRAME) -> Any:
+    size, flags = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if size > max_size:
+        raise RemoteToolError(f"帧过大: {size} 字节")
+    payload = _recv_exact(sock, size)
+    if flags & FLAG_ZLIB:
+        inflater = zlib.decompressobj()
+        payload = inflater.decompress(payload, max_size)
+        if inflater.unconsumed_tail:
+            raise RemoteToolError(f"解压后帧超过 {max_size} 字节")
+    return decode(payload)
+
+
+def is_loopback(host: str) -> bool:
+    """监听地址是否只接受本机连接"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _token_matches(given: Any, expected: str) -> bool:
+    if not isinstance(given, str):
+        return False
+    return hmac.compare_digest(given.encode("utf-8"), expected.encode("utf-8"))
+
+
+# ========== 服务端 ==========
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        server: RemoteToolServer = self.server.owner
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        send_lock = threading.Lock()
+        authenticated = server.token is None
+
+        def reply(message: Dict[str, Any]):
+            with send_lock:
+                send_frame(sock, message, server.compress_threshold)
+
+        while True:
+            try:
+                request = recv_frame(sock, MAX_FRAME if authenticated else MAX_AUTH_FRAME)
+            except (ConnectionError, OSError):
+                return
+            except Exception as e:
+                logger.warning(f"远程连接 {self.client_address} 帧无效，断开: {e}")
+                return
+            if not isinstance(request, dict):
+                return
+            request_id = request.get("id")
+            op = request.get("op")
+
+            if op == "hello":
+                authenticated = server.token is None or _token_matches(request.get("token"), server.token)
+                reply({"id": request_id, "result": {"ok": authenticated}})
+                if not authenticated:
+                    return
+                continue
+            if not authenticated:
+                reply({"id": request_id, "error": "未认证"})
+                return
+
+            if op == "ping":
+                reply({"id": request_id, "result": "pong"})
+            elif op == "list":
+                reply({"id": request_id, "result": server.describe_tools()})
+            elif op == "call":
+                server.submit(request, reply)
+            elif op == "batch":
+                server.submit_batch(request, reply)
+            else:
+                reply({"id": request_id, "error": f"未知操作: {op}"})
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RemoteToolServer:
+    """
+    远程工具服务端（运行在RPA执行机上）
+
+    每个连接一个读线程；调用交给注册表的异步执行器（io/cpu并发，GUI按显示器串行），
+    响应按完成顺序写回，客户端按id匹配。
+    """
+
+    def __init__(self, registry=None, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 token: Optional[str] = None, compress_threshold: int = COMPRESS_THRESHOLD):
+        """
+        Args:
+            registry: RPAToolRegistry（默认全局注册表）
+            host, port: 监听地址（port=0 表示随机端口）
+            token: 共享令牌（设置后客户端必须先认证；监听非回环地址时必须设置）
+            compress_threshold: 超过该字节数的响应使用zlib压缩
+        """
+        if not token and not is_loopback(host):
+            raise ValueError(f"监听非回环地址 {host!r} 必须设置token，否则任何人都能调用输入、点击和写文件工具")
+        if registry is None:
+            from .tool_registry import get_registry
+            registry = get_registry()
+        self.registry = registry
+        self.token = token
+        self.compress_threshold = compress_threshold
+        self._server = _ThreadingServer((host, port), _ConnectionHandler)
+        self._server.owner = self
+        self._thread: Optional[threading.Thread] = None
+        self._serving = False
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def describe_tools(self) -> List[Dict[str, Any]]:
+        return [{"name": e["name"], "description": e["description"], "kind": e["kind"]}
+                for e in self.registry.tools.values()]
+
+    def _executor(self, entry: Dict[str, Any]):
+        return self.registry.get_async_executor().executor_for(entry.get("kind", "io"))
+
+    def _invoke(self, call: Dict[str, Any]) -> Dict[str, Any]:
+        entry = self.registry.get_tool(call.get("tool"))
+        if entry is None:
+            return {"error": f"工具不存在: {call.get('tool')}"}
+        try:
+            return {"result": entry["func"](*call.get("args", ()), **call.get("kwargs", {}))}
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    def submit(self, request: Dict[str, Any], reply):
+        entry = self.registry.get_tool(request.get("tool")) or {}
+
+        def run():
+            response = self._invoke(request)
+            response["id"] = request.get("id")
+            try:
+                reply(response)
+            except OSError as e:
+                logger.warning(f"响应发送失败: {e}")
+        self._executor(entry).submit(run)
+
+    def submit_batch(self, request: Dict[str, Any], reply):
+        calls = request.get("calls", [])
+        results: List[Any] = [None] * len(calls)
+        remaining = [len(calls)]
+        lock = threading.Lock()
+
+        def finish():
+            try:
+                reply({"id": request.get("id"), "result": results})
+            except OSError as e:
+                logger.warning(f"响应发送失败: {e}")
+
+        if not calls:
+            finish()
+            return
+        for i, call in enumerate(calls):
+            entry = self.registry.get_tool(call.get("tool")) or {}
+
+            def run(i=i, call=call):
+                results[i] = self._invoke(call)
+                with lock:
+                    remaining[0] -= 1
+                    done = remaining[0] == 0
+                if done:
+                    finish()
+            self._executor(entry).submit(run)
+
+    def serve_forever(self):
+        logger.info(f"远程工具服务监听 {self.address[0]}:{self.address[1]}")
+        self._serving = True
+        self._server.serve_forever()
+
+    def start(self) -> "RemoteToolServer":
+        """在后台线程中启动"""
+        self._thread = threading.Thread(target=self.serve_forever, name="RemoteToolServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        # 未运行过serve_forever时shutdown()会一直等待
+        if self._serving or self._thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+# ========== 客户端 ==========
+
+class RemoteToolClient:
+    """
+    远程工具客户端（运行在Agent机器上）
+
+    单个持久连接；call_async() 可流水线发送多个请求，batch() 一次往返执行多个调用。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 token: Optional[str] = None, timeout: Optional[float] = 60.0,
+                 compress_threshold: int = COMPRESS_THRESHOLD):
+        self.timeout = timeout
+        self.compress_threshold = compress_threshold
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock.settimeout(None)
+        self._pending: Dict[int, Future] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_loop, name="RemoteToolClient", daemon=True)
+        self._reader.start()
+        self._langchain_tools = None
+        if token is not None and not self._request({"op": "hello", "token": token})["ok"]:
+            self.close()
+            raise RemoteToolError("认证失败")
+
+    def _read_loop(self):
+        error: Exception = RemoteToolError("连接已关闭")
+        while True:
+            try:
+                response = recv_frame(self._sock)
+            except Exception as e:
+                if not self._closed:
+                    error = RemoteToolError(f"连接中断: {e}")
+                break
+            with self._lock:
+                future = self._pending.pop(response.get("id"), None)
+            if future is None:
+                continue
+            if "error" in response:
+                future.set_exception(RemoteToolError(response["error"]))
+            else:
+                future.set_result(response.get("result"))
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+
+    def _send(self, message: Dict[str, Any]) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RemoteToolError("客户端已关闭")
+            self._next_id += 1
+            message["id"] = self._next_id
+            self._pending[self._next_id] = future
+            future.request_id = self._next_id
+        with self._send_lock:
+            send_frame(self._sock, message, self.compress_threshold)
+        return future
+
+    def _wait(self, future: Future) -> Any:
+        """等待响应；超时后移除等待中的请求（迟到的响应直接丢弃）"""
+        try:
+            return future.result(self.timeout)
+        except FuturesTimeoutError:
+            with self._lock:
+                self._pending.pop(future.request_id, None)
+            raise
+
+    def _request(self, message: Dict[str, Any]) -> Any:
+        return self._wait(self._send(message))
+
+    # ========== 调用 ==========
+
+    def call_async(self, tool: str, *args, **kwargs) -> Future:
+        """发送调用请求，立即返回Future（可连续发送多个实现流水线）"""
+        return self._send({"op": "call", "tool": tool, "args": list(args), "kwargs": kwargs})
+
+    def call(self, tool: str, *args, **kwargs) -> Any:
+        """调用远程工具并等待结果"""
+        return self._wait(self.call_async(tool, *args, **kwargs))
+
+    def batch(self, calls: List[Dict[str, Any]]) -> List[Any]:
+        """
+        一次往返执行多个调用
+
+        Args:
+            calls: [{"tool": 名称, "args": [...], "kwargs": {...}}, ...]
+
+        Returns:
+            与calls对应的结果列表；单个调用失败时对应位置为 {"status": "error", ...}
+        """
+        responses = self._request({"op": "batch", "calls": calls})
+        return [r["result"] if "result" in r else {"status": "error", "message": r["error"]}
+                for r in responses]
+
+    def ping(self) -> bool:
+        return self._request({"op": "ping"}) == "pong"
+
+    def list_tools(self) -> List[Dict[str, Any]]:
+        return self._request({"op": "list"})
+
+    def get_all_tools(self) -> List[Any]:
+        """远程工具的LangChain Tool列表（Agent侧使用）"""
+        if self._langchain_tools is None:
+            from langchain.tools import Tool
+            self._langchain_tools = [
+                Tool(name=info["name"], description=info["description"],
+                     func=lambda *args, _name=info["name"], **kwargs: self.call(_name, *args, **kwargs))
+                for info in self.list_tools()
+            ]
+        return self._langchain_tools
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self._reader.join(timeout=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    """命令行: 在执行机上启动远程工具服务"""
+    parser = argparse.ArgumentParser(description="RPA远程工具服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（跨机器访问时使用0.0.0.0）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument("--token", default=None, help="共享令牌")
+    args = parser.parse_args(argv)
+    if not args.token and not is_loopback(args.host):
+        parser.error(f"监听 {args.host} 必须同时指定 --token")
+
+    logging.basicConfig(level=logging.INFO)
+    server = RemoteToolServer(host=args.host, port=args.port, token=args.token)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,48 @@
 屏幕操作工具集
 基于PyAutoGUI和pydirectinput实现鼠标、键盘操作
 """
+import functools
+import inspect
 import pyautogui
 import pydirectinput
 import pyperclip
 from time import sleep
 from typing import Optional, Tuple, Dict, Any
-from .base_tool import RPAToolBase, SafetyMixin
+from .base_tool import RPAToolBase, SafetyMixin, redact_text
+
+
+def _recorded(method=None, *, redact: Tuple[str, ...] = ()):
+    """
+    操作成功后立即截屏并提交会话录制器（差分、压缩在后台完成），附带本次操作的元数据
+    
+    Args:
+        redact: 敏感参数名（如可能包含密码的输入文本），录像、执行历史和审计中只记录长度
+    """
+    if method is None:
+        return functools.partial(_recorded, redact=redact)
+    signature = inspect.signature(method)
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        if self.recorder is not None and result.get("status") == "success":
+            try:
+                params = dict(signature.bind(self, *args, **kwargs).arguments)
+                params.pop("self", None)
+                for name in redact:
+                    if params.get(name) is not None:
+                        params[name] = redact_text(params[name])
+                self.recorder.submit(action={
+                    "tool": self.name,
+                    "action": method.__name__,
+                    "params": params,
+                    "message": result.get("message", "")
+                })
+            except Exception as e:
+                self.logger.error(f"会话录制失败: {e}")
+        return result
+    wrapper.redacted_params = tuple(redact)
+    return wrapper
 
 
 class ScreenTool(RPAToolBase, SafetyMixin):
@@ -21,13 +57,30 @@ class ScreenTool(RPAToolBase, SafetyMixin):
         # PyAutoGUI安全设置
         pyautogui.FAILSAFE = True  # 鼠标移到左上角可紧急停止
         pyautogui.PAUSE = 0.2  # 每次操作后自动暂停
+        
+        # 截图后台写入器（设置后save_path异步保存）
+        self.screenshot_writer = None
+        
+        # 会话录制器（设置后每次操作成功录制一帧）
+        self.recorder = None
     
     def execute(self, **kwargs) -> Dict[str, Any]:
         """通用执行接口（由具体方法调用）"""
         return {"status": "success", "message": "请使用具体方法"}
     
+    def attach_recorder(self, recorder):
+        """
+        挂载会话录制器
+        
+        Args:
+            recorder: SessionRecorder实例（None=停止录制）
+        """
+        self.recorder = recorder
+        return recorder
+    
     # ========== 鼠标操作 ==========
     
+    @_recorded
     def click_at(self, x: int, y: int, clicks: int = 1, button: str = 'left') -> Dict[str, Any]:
         """
         点击指定坐标
@@ -63,6 +116,7 @@ class ScreenTool(RPAToolBase, SafetyMixin):
         """右键点击"""
         return self.click_at(x, y, button='right')
     
+    @_recorded
     def drag_to(self, x1: int, y1: int, x2: int, y2: int, duration: float = 1.0) -> Dict[str, Any]:
         """
         拖拽操作
@@ -87,6 +141,7 @@ class ScreenTool(RPAToolBase, SafetyMixin):
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
+    @_recorded
     def scroll(self, clicks: int, x: Optional[int] = None, y: Optional[int] = None) -> Dict[str, Any]:
         """
         滚动鼠标滚轮
@@ -113,6 +168,7 @@ class ScreenTool(RPAToolBase, SafetyMixin):
     
     # ========== 键盘操作 ==========
     
+    @_recorded(redact=("text",))
     def type_text(self, text: str, interval: float = 0.1) -> Dict[str, Any]:
         """
         输入文本（使用剪贴板，支持中文）
@@ -128,15 +184,18 @@ class ScreenTool(RPAToolBase, SafetyMixin):
             pyautogui.hotkey('ctrl', 'v')
             self.safe_delay(0.2)
             
+            # 输入内容可能是密码，结果（及其执行历史、审计记录）中只保留长度
             return {
                 "status": "success",
                 "action": "type",
-                "text": text,
-                "message": f"输入文本: {text[:50]}..."
+                "text": redact_text(text),
+                "length": len(text),
+                "message": f"输入文本: {redact_text(text)}"
             }
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
+    @_recorded
     def press_key(self, key: str, presses: int = 1) -> Dict[str, Any]:
         """
         按键操作
@@ -159,6 +218,7 @@ class ScreenTool(RPAToolBase, SafetyMixin):
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
+    @_recorded
     def hotkey(self, *keys) -> Dict[str, Any]:
         """
         组合键操作
@@ -181,6 +241,27 @@ class ScreenTool(RPAToolBase, SafetyMixin):
     
     # ========== 截图操作 ==========
     
+    def enable_async_save(self, writer=None, **kwargs):
+        """
+        启用截图异步保存
+        
+        Args:
+            writer: ScreenshotWriter实例（None=按kwargs新建）
+            **kwargs: 传给ScreenshotWriter的参数（如png_compress_level, dedupe）
+        """
+        if writer is None:
+            from .screenshot_writer import ScreenshotWriter
+            writer = ScreenshotWriter(**kwargs)
+        self.screenshot_writer = writer
+        return writer
+    
+    def disable_async_save(self, flush: bool = True):
+        """停用截图异步保存（默认等待剩余截图写完）"""
+        writer = self.screenshot_writer
+        self.screenshot_writer = None
+        if writer is not None and flush:
+            writer.close()
+    
     def screenshot(self, region: Optional[Tuple[int, int, int, int]] = None, 
                    save_path: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -191,7 +272,8 @@ class ScreenTool(RPAToolBase, SafetyMixin):
             save_path: 可选，保存路径
         
         Returns:
-            包含PIL Image对象或文件路径
+            包含PIL Image对象或文件路径；启用异步保存时包含save_handle，
+            保存在后台完成
         """
         try:
             img = pyautogui.screenshot(region=region)
@@ -203,7 +285,12 @@ class ScreenTool(RPAToolBase, SafetyMixin):
                 "message": "截图成功"
             }
             
-            if save_path:
+            if save_path and self.screenshot_writer is not None:
+                result["path"] = save_path
+                # 提交副本：调用方之后修改result["image"]不影响后台保存
+                result["save_handle"] = self.screenshot_writer.submit(img.copy(), save_path)
+                result["message"] = f"截图已提交后台保存: {save_path}"
+            elif save_path:
                 img.save(save_path)
                 result["path"] = save_path
                 result["message"] = f"截图已保存: {save_path}"
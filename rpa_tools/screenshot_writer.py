@@ -0,0 +1,247 @@
+"""
+截图异步保存
+后台线程编码写盘，内存预算限流，跳过与上一帧相同的截图
+"""
+import hashlib
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class SaveHandle:
+    """
+    截图保存句柄
+
+    status: 'pending' | 'saved' | 'skipped'（与上一帧相同，未重新编码）| 'error'
+
+    skipped 时 path 处是上一帧文件（duplicate_of）的硬链接或拷贝，文件总是存在。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.duplicate_of: Optional[str] = None
+        self.bytes_written = 0
+        self.encode_time = 0.0
+        self._event = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待保存完成，返回是否已完成"""
+        return self._event.wait(timeout)
+
+    def _finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self._event.set()
+
+    def __repr__(self):
+        return f"SaveHandle(path={self.path!r}, status={self.status!r})"
+
+
+class ScreenshotWriter:
+    """
+    截图后台写入器
+
+    调用线程只负责入队，哈希、编码和写盘都在后台线程完成。
+    待写入图像按未压缩大小计入内存预算，超出预算时入队阻塞（背压），
+    避免截图速度超过磁盘速度时内存无限增长。
+
+    编码格式按文件后缀选择：
+        .png  - 低压缩级别（默认1，速度优先）
+        .webp - 有损/无损WebP（method=0，速度优先）
+        .jpg  - JPEG
+    """
+
+    def __init__(self, max_pending_bytes: int = 256 * 1024 * 1024,
+                 png_compress_level: int = 1, webp_quality: int = 80,
+                 webp_lossless: bool = False, jpeg_quality: int = 85,
+                 dedupe: bool = True, default_format: str = "png"):
+        """
+        Args:
+            max_pending_bytes: 待写入图像的内存预算（字节）
+            png_compress_level: PNG压缩级别（0-9，越小越快）
+            webp_quality: WebP质量（0-100）
+            webp_lossless: 是否使用无损WebP
+            jpeg_quality: JPEG质量（0-100）
+            dedupe: 是否跳过与上一帧像素完全相同的截图
+            default_format: 路径无后缀时使用的格式
+        """
+        self.max_pending_bytes = max_pending_bytes
+        self.png_compress_level = png_compress_level
+        self.webp_quality = webp_quality
+        self.webp_lossless = webp_lossless
+        self.jpeg_quality = jpeg_quality
+        self.dedupe = dedupe
+        self.default_format = default_format
+
+        self.stats = {"submitted": 0, "saved": 0, "skipped": 0, "errors": 0,
+                      "bytes_written": 0, "encode_time": 0.0}
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending_bytes = 0
+        self._budget = threading.Condition()
+        self._last_digest: Optional[bytes] = None
+        self._last_path: Optional[str] = None
+        self._thread = threading.Thread(target=self._loop, name="ScreenshotWriter", daemon=True)
+        self._closed = False
+        self._thread.start()
+
+    # ========== 提交 ==========
+
+    def submit(self, image, path: str, timeout: Optional[float] = None) -> SaveHandle:
+        """
+        提交截图保存任务（立即返回）
+
+        Args:
+            image: PIL Image
+            path: 保存路径
+            timeout: 内存预算不足时最长等待时间（None=一直等待）
+
+        Returns:
+            SaveHandle
+        """
+        if self._closed:
+            raise RuntimeError("ScreenshotWriter已关闭")
+
+        size = self._estimate_bytes(image)
+        with self._budget:
+            # 单张超过预算时，只要队列为空也允许写入
+            ok = self._budget.wait_for(
+                lambda: self._pending_bytes == 0 or self._pending_bytes + size <= self.max_pending_bytes,
+                timeout
+            )
+            if not ok:
+                raise TimeoutError(f"截图写入队列已满: {self._pending_bytes} 字节待写入")
+            self._pending_bytes += size
+
+        handle = SaveHandle(str(path))
+        self.stats["submitted"] += 1
+        self._queue.put((image, handle, size))
+        return handle
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._pending_bytes
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待所有已提交任务写完"""
+        with self._budget:
+            return self._budget.wait_for(lambda: self._pending_bytes == 0, timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """写完剩余任务后停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ========== 后台写入 ==========
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            image, handle, size = item
+            try:
+                self._write(image, handle)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"截图保存失败 {handle.path}: {e}")
+                handle._finish("error", str(e))
+            finally:
+                with self._budget:
+                    self._pending_bytes -= size
+                    self._budget.notify_all()
+
+    def _write(self, image, handle: SaveHandle):
+        if self.dedupe:
+            digest = hashlib.blake2b(image.tobytes(), digest_size=16).digest()
+            digest += repr((image.mode, image.size)).encode()
+            if digest == self._last_digest and self._reuse_last(handle):
+                self.stats["skipped"] += 1
+                handle._finish("skipped")
+                return
+
+        started = time.perf_counter()
+        path = Path(handle.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists() and path.stat().st_nlink > 1:
+            path.unlink()  # 旧文件是硬链接时先断开，避免覆盖被链接的文件
+        fmt, options = self._encoder_options(path, image)
+        if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(path, format=fmt, **options)
+
+        handle.encode_time = time.perf_counter() - started
+        handle.bytes_written = path.stat().st_size
+        if self.dedupe:
+            self._last_digest = digest
+        self._last_path = handle.path
+        self.stats["saved"] += 1
+        self.stats["bytes_written"] += handle.bytes_written
+        self.stats["encode_time"] += handle.encode_time
+        handle._finish("saved")
+
+    def _reuse_last(self, handle: SaveHandle) -> bool:
+        """相同截图不重新编码：硬链接（失败时拷贝）上一帧文件到新路径"""
+        last = self._last_path
+        if last is None or Path(last).suffix.lower() != Path(handle.path).suffix.lower():
+            return False  # 格式不同仍需编码
+        try:
+            if os.path.abspath(last) != os.path.abspath(handle.path):
+                Path(handle.path).parent.mkdir(parents=True, exist_ok=True)
+                if os.path.exists(handle.path):
+                    os.remove(handle.path)
+                try:
+                    os.link(last, handle.path)
+                except OSError:
+                    shutil.copyfile(last, handle.path)
+            elif not os.path.exists(last):
+                return False
+        except OSError as e:
+            logger.debug(f"复用上一帧失败，重新编码 {handle.path}: {e}")
+            return False
+        handle.duplicate_of = last
+        return True
+
+    def _encoder_options(self, path: Path, image) -> tuple:
+        suffix = path.suffix.lower().lstrip(".") or self.default_format
+        if suffix == "png":
+            return "PNG", {"compress_level": self.png_compress_level}
+        if suffix == "webp":
+            return "WEBP", {"quality": self.webp_quality, "lossless": self.webp_lossless, "method": 0}
+        if suffix in ("jpg", "jpeg"):
+            return "JPEG", {"quality": self.jpeg_quality}
+        return suffix.upper(), {}
+
+    @staticmethod
+    def _estimate_bytes(image) -> int:
+        width, height = image.size
+        return width * height * len(image.getbands())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入统计"""
+        stats = dict(self.stats)
+        stats["pending_bytes"] = self._pending_bytes
+        return stats
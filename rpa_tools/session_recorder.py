@@ -0,0 +1,384 @@
+"""
+会话录制
+关键帧 + 变化区域增量的紧凑录像格式，支持按帧号重建和导出片段
+
+录像目录结构:
+    session_dir/
+    ├── frames.bin     # 追加写入的zlib压缩像素块
+    └── index.jsonl    # 每帧一行：类型、像素块偏移、变化区域、操作元数据
+"""
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import pyautogui
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.jsonl"
+DATA_FILE = "frames.bin"
+
+
+def _to_array(frame) -> np.ndarray:
+    """PIL Image或数组 -> 连续的RGB uint8数组"""
+    if isinstance(frame, np.ndarray):
+        arr = frame
+    else:
+        arr = np.asarray(frame.convert("RGB"))
+    if arr.ndim == 2:
+        arr = np.stack([arr] * 3, axis=-1)
+    return np.ascontiguousarray(arr, dtype=np.uint8)
+
+
+def changed_rects(prev: np.ndarray, curr: np.ndarray, tile_size: int = 16) -> List[Tuple[int, int, int, int]]:
+    """
+    计算两帧之间的变化区域
+
+    按tile_size分块比较，相邻的变化块合并为矩形。
+
+    Returns:
+        [(x, y, width, height), ...]
+    """
+    h, w = curr.shape[:2]
+    diff = np.any(prev != curr, axis=-1) if curr.ndim == 3 else prev != curr
+    if not diff.any():
+        return []
+
+    rows = -(-h // tile_size)
+    cols = -(-w // tile_size)
+    padded = np.zeros((rows * tile_size, cols * tile_size), dtype=bool)
+    padded[:h, :w] = diff
+    tiles = padded.reshape(rows, tile_size, cols, tile_size).any(axis=(1, 3))
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(tiles.astype(np.uint8), connectivity=8)
+    rects = []
+    for label in range(1, count):
+        tx, ty, tw, th = stats[label, :4]
+        x, y = int(tx * tile_size), int(ty * tile_size)
+        rects.append((x, y,
+                      int(min((tx + tw) * tile_size, w) - x),
+                      int(min((ty + th) * tile_size, h) - y)))
+    return rects
+
+
+class SessionRecorder:
+    """
+    会话录制器
+
+    每隔keyframe_interval帧（或变化面积超过keyframe_ratio时）保存一帧完整关键帧，
+    其余帧只保存变化矩形区域；每帧附带触发它的工具操作元数据。
+
+    submit() 在调用线程截屏（保证帧与操作对应）后入队，差分、压缩和写盘在后台线程
+    按提交顺序完成；record() 在调用线程同步录制。
+
+    使用示例:
+        recorder = SessionRecorder("recordings/session_001")
+        screen.attach_recorder(recorder)
+        screen.click_at(100, 200)   # 提交一帧，后台录制
+        recorder.close()            # 录完待处理的帧后关闭
+    """
+
+    def __init__(self, path: str, keyframe_interval: int = 30, tile_size: int = 16,
+                 keyframe_ratio: float = 0.5, compress_level: int = 1,
+                 capture: Optional[Callable[[], Any]] = None, max_pending: int = 16):
+        """
+        Args:
+            path: 录像目录
+            keyframe_interval: 关键帧间隔（帧数）
+            tile_size: 变化检测的分块大小（像素）
+            keyframe_ratio: 变化面积超过该比例时直接保存关键帧
+            compress_level: zlib压缩级别（1最快）
+            capture: 截屏函数（默认PyAutoGUI全屏截图）
+            max_pending: 后台待处理帧数上限（每帧为一张完整截图，超出时submit阻塞）
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.keyframe_interval = keyframe_interval
+        self.tile_size = tile_size
+        self.keyframe_ratio = keyframe_ratio
+        self.compress_level = compress_level
+        self.capture = capture or pyautogui.screenshot
+
+        # 追加到已有录像时从下一帧号继续，第一帧写关键帧
+        index_path = self.path / INDEX_FILE
+        existing = 0
+        if index_path.exists():
+            with open(index_path, encoding="utf-8") as f:
+                existing = sum(1 for line in f if line.strip())
+
+        self._data = open(self.path / DATA_FILE, "ab")
+        self._index = open(index_path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._prev: Optional[np.ndarray] = None
+        self._count = existing
+        self._last_keyframe = -1
+        self.stats = {"frames": 0, "keyframes": 0, "raw_bytes": 0, "stored_bytes": 0, "errors": 0}
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="SessionRecorder", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame=None, action: Optional[Dict[str, Any]] = None):
+        """
+        提交一帧到后台录制（队列已满时等待）
+
+        Args:
+            frame: PIL Image或RGB数组（None=立即在调用线程截屏）
+            action: 操作元数据
+        """
+        if self._closed:
+            raise RuntimeError("SessionRecorder已关闭")
+        submitted = time.time()
+        if frame is None:
+            frame = self.capture()
+        self._queue.put((frame, action, submitted))
+
+    def flush(self):
+        """等待已提交的帧全部录制"""
+        self._queue.join()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                frame, action, submitted = item
+                self.record(frame, action, submitted)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"会话录制失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def record(self, frame=None, action: Optional[Dict[str, Any]] = None,
+               timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """
+        录制一帧（在调用线程同步完成）
+
+        Args:
+            frame: PIL Image或RGB数组（None=立即截屏）
+            action: 操作元数据（工具名、参数、结果消息等）
+            timestamp: 操作时间（默认当前时间）
+
+        Returns:
+            本帧的索引记录
+        """
+        if frame is None:
+            frame = self.capture()
+        curr = _to_array(frame)
+
+        with self._lock:
+            index = self._count
+            h, w = curr.shape[:2]
+            need_key = (
+                self._prev is None
+                or self._prev.shape != curr.shape
+                or index - self._last_keyframe >= self.keyframe_interval
+            )
+            rects = [] if need_key else changed_rects(self._prev, curr, self.tile_size)
+            if not need_key:
+                changed_area = sum(rw * rh for _, _, rw, rh in rects)
+                need_key = changed_area > self.keyframe_ratio * h * w
+
+            if need_key:
+                rects = [(0, 0, w, h)]
+                self._last_keyframe = index
+
+            blocks = [self._write_block(curr[y:y + rh, x:x + rw]) for x, y, rw, rh in rects]
+            entry = {
+                "index": index,
+                "type": "key" if need_key else "delta",
+                "keyframe": self._last_keyframe,
+                "timestamp": timestamp if timestamp is not None else time.time(),
+                "size": [w, h],
+                "rects": [list(r) for r in rects],
+                "blocks": blocks,
+                "action": action,
+            }
+            self._index.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            self._index.flush()
+
+            self._prev = curr
+            self._count += 1
+            self.stats["frames"] += 1
+            self.stats["raw_bytes"] += curr.nbytes
+            if need_key:
+                self.stats["keyframes"] += 1
+        return entry
+
+    def _write_block(self, pixels: np.ndarray) -> List[int]:
+        payload = zlib.compress(np.ascontiguousarray(pixels).tobytes(), self.compress_level)
+        offset = self._data.tell()
+        self._data.write(payload)
+        self._data.flush()
+        self.stats["stored_bytes"] += len(payload)
+        return [offset, len(payload)]
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        """录完已提交的帧后关闭录像文件"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        with self._lock:
+            if self._data.closed:
+                return
+            self._data.close()
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SessionReader:
+    """
+    录像读取器
+
+    重建第i帧时从其关键帧开始叠加增量；顺序读取时复用上一次重建结果，
+    只需叠加一个增量。
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        with open(self.path / INDEX_FILE, encoding="utf-8") as f:
+            self.entries = [json.loads(line) for line in f if line.strip()]
+        self._data = open(self.path / DATA_FILE, "rb")
+        self._cache_index = -1
+        self._cache_frame: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def metadata(self, index: int) -> Dict[str, Any]:
+        """获取第index帧的索引记录（含操作元数据）"""
+        return self.entries[index]
+
+    def frame(self, index: int) -> np.ndarray:
+        """重建第index帧（RGB数组）"""
+        if index < 0:
+            index += len(self.entries)
+        entry = self.entries[index]
+        keyframe = entry["keyframe"]
+
+        if keyframe <= self._cache_index <= index:
+            start, canvas = self._cache_index + 1, self._cache_frame.copy()
+        else:
+            start, canvas = keyframe, None
+
+        for i in range(start, index + 1):
+            canvas = self._apply(self.entries[i], canvas)
+
+        self._cache_index, self._cache_frame = index, canvas
+        return canvas.copy()
+
+    def _apply(self, entry: Dict[str, Any], canvas: Optional[np.ndarray]) -> np.ndarray:
+        w, h = entry["size"]
+        if entry["type"] == "key" or canvas is None:
+            canvas = np.zeros((h, w, 3), dtype=np.uint8)
+        for (x, y, rw, rh), (offset, length) in zip(entry["rects"], entry["blocks"]):
+            self._data.seek(offset)
+            raw = zlib.decompress(self._data.read(length))
+            canvas[y:y + rh, x:x + rw] = np.frombuffer(raw, dtype=np.uint8).reshape(rh, rw, 3)
+        return canvas
+
+    def export_clip(self, output_path: str, start: int = 0, end: Optional[int] = None,
+                    fps: float = 2.0) -> Dict[str, Any]:
+        """
+        导出片段
+
+        Args:
+            output_path: 输出路径（.gif 或 .mp4/.avi）
+            start: 起始帧（含）
+            end: 结束帧（不含，None=到末尾）
+            fps: 帧率
+        """
+        try:
+            end = len(self.entries) if end is None else min(end, len(self.entries))
+            if start >= end:
+                return {"status": "error", "message": f"帧范围为空: [{start}, {end})"}
+
+            output = Path(output_path)
+            output.parent.mkdir(parents=True, exist_ok=True)
+            if output.suffix.lower() == ".gif":
+                from PIL import Image
+                images = [Image.fromarray(self.frame(i)) for i in range(start, end)]
+                images[0].save(output, save_all=True, append_images=images[1:],
+                               duration=int(1000 / fps), loop=0)
+            else:
+                w, h = self.entries[start]["size"]
+                writer = cv2.VideoWriter(str(output), cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+                try:
+                    for i in range(start, end):
+                        frame = self.frame(i)
+                        if frame.shape[1::-1] != (w, h):
+                            frame = cv2.resize(frame, (w, h))
+                        writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+                finally:
+                    writer.release()
+
+            return {
+                "status": "success",
+                "path": str(output),
+                "frames": end - start,
+                "message": f"导出片段: {output} ({end - start} 帧)"
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    def close(self):
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    """命令行: 导出录像片段或查看摘要"""
+    parser = argparse.ArgumentParser(description="会话录像工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="导出片段")
+    export.add_argument("session", help="录像目录")
+    export.add_argument("output", help="输出文件（.gif/.mp4/.avi）")
+    export.add_argument("--start", type=int, default=0)
+    export.add_argument("--end", type=int, default=None)
+    export.add_argument("--fps", type=float, default=2.0)
+
+    info = sub.add_parser("info", help="查看录像摘要")
+    info.add_argument("session", help="录像目录")
+
+    args = parser.parse_args(argv)
+    with SessionReader(args.session) as reader:
+        if args.command == "export":
+            result = reader.export_clip(args.output, args.start, args.end, args.fps)
+            print(result["message"])
+        else:
+            keyframes = sum(1 for e in reader.entries if e["type"] == "key")
+            print(f"帧数: {len(reader)}, 关键帧: {keyframes}")
+            for e in reader.entries:
+                action = e.get("action") or {}
+                print(f"  #{e['index']:>5} {e['type']:<5} {len(e['rects'])} 区域  {action.get('message', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+跨进程共享帧环形缓冲区
+截屏守护进程把帧写入 multiprocessing.shared_memory，其他进程以NumPy视图零拷贝读取
+
+内存布局:
+    header    int64[8]        魔数、槽位数、高、宽、通道数、最新序号
+    slot_seq  int64[slots]    每个槽位当前帧的序号（写入中为-1）
+    slot_time float64[slots]  每个槽位的截屏时间戳
+    frames    uint8[slots, H, W, C]
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = 0x52504146  # "RPAF"
+HEADER_FIELDS = 8
+_H_MAGIC, _H_SLOTS, _H_HEIGHT, _H_WIDTH, _H_CHANNELS, _H_LATEST = range(6)
+DEFAULT_RING_NAME = "rpa_frames"
+
+# 本进程（及fork出的子进程）创建的缓冲区名称：这些缓冲区由创建方的resource_tracker登记
+_created_names = set()
+
+
+def _default_capture() -> np.ndarray:
+    import pyautogui
+    return np.asarray(pyautogui.screenshot())
+
+
+class SharedFrameRing:
+    """
+    共享内存帧环形缓冲区
+
+    写入方用 create() 创建，读取方用 attach() 按名称挂载。每帧分配递增序号，
+    写入第 seq % slots 个槽位；读取方通过 latest() 获得最新帧的只读视图，
+    不复制像素数据。视图在写入方绕回覆盖该槽位前有效，可用 is_current(seq)
+    检查（处理耗时超过 slots/fps 秒时应使用 copy=True）。
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf, offset=0)
+        if header[_H_MAGIC] != MAGIC:
+            raise ValueError(f"共享内存 {shm.name} 不是帧缓冲区")
+        self.slots = int(header[_H_SLOTS])
+        self.shape = (int(header[_H_HEIGHT]), int(header[_H_WIDTH]), int(header[_H_CHANNELS]))
+
+        offset = header.nbytes
+        self._header = header
+        self._slot_seq = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self._slot_seq.nbytes
+        self._slot_time = np.ndarray((self.slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += self._slot_time.nbytes
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8,
+                                  buffer=shm.buf, offset=offset)
+
+    # ========== 创建与挂载 ==========
+
+    @classmethod
+    def create(cls, width: int, height: int, channels: int = 3, slots: int = 4,
+               name: str = DEFAULT_RING_NAME) -> "SharedFrameRing":
+        """创建缓冲区（写入方）"""
+        size = (HEADER_FIELDS + slots) * 8 + slots * 8 + slots * height * width * channels
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_H_MAGIC] = MAGIC
+        header[_H_SLOTS] = slots
+        header[_H_HEIGHT] = height
+        header[_H_WIDTH] = width
+        header[_H_CHANNELS] = channels
+        ring = cls(shm, owner=True)
+        ring._slot_seq[:] = 0
+        _created_names.add(ring.name)
+        return ring
+
+    @classmethod
+    def attach(cls, name: str = DEFAULT_RING_NAME) -> "SharedFrameRing":
+        """按名称挂载已有缓冲区（读取方）"""
+        if sys.version_info >= (3, 13):
+            return cls(shared_memory.SharedMemory(name=name, track=False), owner=False)
+
+        # 3.13以前挂载也会登记到resource_tracker，读取方退出时共享内存会被回收，需注销；
+        # 创建方在本进程或父进程（fork共享同一tracker）时登记属于创建方，不能注销
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix" and shm.name not in _created_names:
+            from multiprocessing import resource_tracker
+            try:
+                resource_tracker.unregister(f"/{shm.name}", "shared_memory")
+            except Exception:
+                pass
+        return cls(shm, owner=False)
+
+    # ========== 写入 ==========
+
+    def write(self, frame, timestamp: Optional[float] = None) -> int:
+        """
+        写入一帧
+
+        Args:
+            frame: 与缓冲区形状一致的数组或PIL Image
+            timestamp: 截屏时间戳
+
+        Returns:
+            本帧序号
+        """
+        pixels = np.asarray(frame)
+        if pixels.shape != self.shape:
+            raise ValueError(f"帧尺寸不匹配: {pixels.shape} != {self.shape}")
+
+        seq = int(self._header[_H_LATEST]) + 1
+        slot = seq % self.slots
+        self._slot_seq[slot] = -1
+        self._frames[slot][...] = pixels
+        self._slot_time[slot] = timestamp if timestamp is not None else time.time()
+        self._slot_seq[slot] = seq
+        self._header[_H_LATEST] = seq
+        return seq
+
+    # ========== 读取 ==========
+
+    @property
+    def latest_seq(self) -> int:
+        return int(self._header[_H_LATEST])
+
+    def latest(self, copy: bool = False) -> Tuple[int, Optional[np.ndarray]]:
+        """
+        获取最新帧
+
+        Returns:
+            (序号, 帧数组)；尚无帧时返回 (0, None)
+        """
+        for _ in range(self.slots):
+            seq = self.latest_seq
+            if seq == 0:
+                return 0, None
+            frame = self.get(seq, copy)
+            if frame is not None:
+                return seq, frame
+        return 0, None
+
+    def get(self, seq: int, copy: bool = False) -> Optional[np.ndarray]:
+        """获取指定序号的帧（已被覆盖时返回None）"""
+        slot = seq % self.slots
+        if self._slot_seq[slot] != seq:
+            return None
+        view = self._frames[slot]
+        if copy:
+            frame = view.copy()
+            return frame if self._slot_seq[slot] == seq else None
+        view = view.view()
+        view.flags.writeable = False
+        return view
+
+    def timestamp(self, seq: int) -> Optional[float]:
+        """获取指定序号帧的截屏时间"""
+        slot = seq % self.slots
+        return float(self._slot_time[slot]) if self._slot_seq[slot] == seq else None
+
+    def is_current(self, seq: int) -> bool:
+        """指定序号的帧是否仍在缓冲区中（未被覆盖）"""
+        return self._slot_seq[seq % self.slots] == seq
+
+    def wait_for_frame(self, after_seq: int = 0, timeout: Optional[float] = None,
+                       poll_interval: float = 0.005, copy: bool = False) -> Tuple[int, Optional[np.ndarray]]:
+        """等待序号大于after_seq的新帧"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while self.latest_seq <= after_seq:
+            if deadline is not None and time.time() >= deadline:
+                return 0, None
+            time.sleep(poll_interval)
+        return self.latest(copy)
+
+    def capture(self) -> np.ndarray:
+        """截屏函数接口（返回最新帧的拷贝，可直接作为FrameWatcher的capture）"""
+        seq, frame = self.latest(copy=True)
+        if frame is None:
+            seq, frame = self.wait_for_frame(0, timeout=5.0, copy=True)
+        if frame is None:
+            raise TimeoutError(f"共享帧缓冲区 {self.name} 无可用帧")
+        return frame
+
+    # ========== 释放 ==========
+
+    def close(self):
+        """解除映射；创建方同时释放共享内存"""
+        self._header = self._slot_seq = self._slot_time = self._frames = None
+        self._shm.close()
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            _created_names.discard(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameCaptureDaemon:
+    """
+    截屏守护线程
+
+    按固定FPS截屏写入共享帧缓冲区，供同机其他进程的VisionTool、
+    OCR、录制器等读取。独立进程运行: python -m rpa_tools.shared_frames
+    """
+
+    def __init__(self, name: str = DEFAULT_RING_NAME, fps: float = 10.0, slots: int = 4,
+                 capture: Optional[Callable[[], np.ndarray]] = None):
+        self.name = name
+        self.fps = fps
+        self.slots = slots
+        self.capture = capture or _default_capture
+        self.ring: Optional[SharedFrameRing] = None
+        self.frames = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> SharedFrameRing:
+        """首帧确定尺寸并创建缓冲区，然后启动后台截屏线程"""
+        first = np.asarray(self.capture())
+        height, width = first.shape[:2]
+        channels = first.shape[2] if first.ndim == 3 else 1
+        self.ring = SharedFrameRing.create(width, height, channels, self.slots, self.name)
+        self.ring.write(first.reshape(self.ring.shape))
+        self.frames = 1
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="FrameCaptureDaemon", daemon=True)
+        self._thread.start()
+        logger.info(f"共享帧缓冲区已启动: {self.name} {width}x{height}x{channels}, {self.slots} 槽位")
+        return self.ring
+
+    def _loop(self):
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        while not self._stop.is_set():
+            started = time.time()
+            try:
+                frame = np.asarray(self.capture())
+                self.ring.write(frame.reshape(self.ring.shape), started)
+                self.frames += 1
+            except Exception as e:
+                logger.error(f"截屏写入失败: {e}")
+            self._stop.wait(max(0.0, interval - (time.time() - started)))
+
+    def stop(self):
+        """停止截屏并释放共享内存"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    """命令行: 运行截屏守护进程"""
+    parser = argparse.ArgumentParser(description="共享帧截屏守护进程")
+    parser.add_argument("--name", default=DEFAULT_RING_NAME, help="共享内存名称")
+    parser.add_argument("--fps", type=float, default=10.0, help="截屏帧率")
+    parser.add_argument("--slots", type=int, default=4, help="环形缓冲槽位数")
+    args = parser.parse_args(argv)
+
+    daemon = FrameCaptureDaemon(args.name, args.fps, args.slots)
+    daemon.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
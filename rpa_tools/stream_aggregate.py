@@ -0,0 +1,350 @@
+"""
+流式分组聚合
+逐块（或逐行）消费数据，每个分组只保留可合并的部分状态（计数、求和、最小/最大值、
+HyperLogLog近似去重），内存只与分组数有关；多个工作进程的部分状态可以直接合并
+"""
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+
+# 聚合函数 -> 需要的部分状态
+AGG_STATES = {
+    "count": ("count",),
+    "sum": ("sum",),
+    "mean": ("sum", "count"),
+    "min": ("min",),
+    "max": ("max",),
+    "approx_distinct": ("hll",),
+}
+AGG_ALIASES = {"avg": "mean", "nunique": "approx_distinct", "distinct": "approx_distinct"}
+
+_INT64_MIN = np.iinfo(np.int64).min
+_INT64_MAX = np.iinfo(np.int64).max
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """uint64数组每个元素的二进制位数（精确，不经过浮点）"""
+    x = values.copy()
+    bits = np.zeros(len(x), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = (x >> np.uint64(shift)) != 0
+        x = np.where(high, x >> np.uint64(shift), x)
+        bits += high.astype(np.uint8) * shift
+    return bits + (x != 0)
+
+
+def hash_values(series: pd.Series) -> np.ndarray:
+    """
+    去重用的64位哈希（与列类型无关）
+
+    同一个值在不同块中的类型可能不同（含空值的整数列读成float64、混入文本的列读成object），
+    数值统一按float64哈希（5 与 5.0 相同），其余值按字符串哈希。
+    """
+    values = series.to_numpy()
+    kind = values.dtype.kind
+    if kind in "iuf":
+        return pd.util.hash_array(values.astype(np.float64))
+    if kind != "O":
+        return pd.util.hash_array(values)
+    numeric = np.fromiter((isinstance(v, (int, float, np.number)) and not isinstance(v, (bool, np.bool_))
+                           for v in values), dtype=bool, count=len(values))
+    hashes = np.empty(len(values), dtype=np.uint64)
+    if numeric.any():
+        hashes[numeric] = pd.util.hash_array(values[numeric].astype(np.float64))
+    if not numeric.all():
+        hashes[~numeric] = pd.util.hash_array(values[~numeric].astype(str).astype(object))
+    return hashes
+
+
+def hll_estimate(registers: np.ndarray) -> np.ndarray:
+    """按HyperLogLog寄存器估算基数（每行一个分组，小基数时使用线性计数修正）"""
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=1)
+    zeros = np.count_nonzero(registers == 0, axis=1)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+def parse_aggregations(aggregations: Union[Dict[str, Any], Sequence[tuple]]) -> List[tuple]:
+    """
+    统一聚合定义为 [(列, 函数, 输出列名)]
+
+    支持 {"金额": ["sum", "mean"], "客户": "approx_distinct"} 或 [("金额", "sum", "总金额"), ...]
+    """
+    if isinstance(aggregations, dict):
+        items = []
+        for column, funcs in aggregations.items():
+            for func in ([funcs] if isinstance(funcs, str) else funcs):
+                items.append((column, func, None))
+    else:
+        items = [tuple(item) + (None,) * (3 - len(item)) for item in aggregations]
+    parsed = []
+    for column, func, name in items:
+        func = AGG_ALIASES.get(func, func)
+        if func not in AGG_STATES:
+            raise ValueError(f"不支持的聚合函数: {func}")
+        parsed.append((column, func, name or f"{column}_{func}"))
+    if not parsed:
+        raise ValueError("至少需要一个聚合")
+    return parsed
+
+
+class StreamingAggregator:
+    """
+    可合并的流式分组聚合器
+
+    - update(chunk) 每块一次向量化分组，把块内结果并入各分组的部分状态
+    - mean 由 sum/count 得到；approx_distinct 为每组 2^precision 个HyperLogLog寄存器
+      （precision=10 时每组1KB，标准误差约3.3%）
+    - merge(other) 合并另一个聚合器（如其他进程）的部分状态
+    - max_bytes 限制部分状态占用的内存，超出时抛出MemoryError
+    """
+
+    def __init__(self, group_by: Union[str, Sequence[str]],
+                 aggregations: Union[Dict[str, Any], Sequence[tuple]],
+                 precision: int = 10, max_bytes: Optional[int] = None):
+        """
+        Args:
+            group_by: 分组列
+            aggregations: 聚合定义（见 parse_aggregations）
+            precision: HyperLogLog精度（4-16）
+            max_bytes: 部分状态的内存上限（None=不限制）
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError("precision 应在 4-16 之间")
+        self.group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+        self.aggregations = parse_aggregations(aggregations)
+        self.precision = precision
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self._index: Optional[pd.Index] = None
+        self._size = 0
+        self._capacity = 0
+        # (列, 状态) -> 数组；hll为二维 (分组, 寄存器)
+        self._states: Dict[tuple, np.ndarray] = {}
+        self._kinds: Dict[str, str] = {}  # min/max列的类型: 'f' 数值 | 'M' 日期
+        self._needed = sorted({(column, state) for column, func, _ in self.aggregations
+                               for state in AGG_STATES[func]})
+
+    # ========== 分组与状态数组 ==========
+
+    @property
+    def groups(self) -> int:
+        return self._size
+
+    @property
+    def state_bytes(self) -> int:
+        """部分状态占用的字节数（按当前容量计算）"""
+        return sum(a.nbytes for a in self._states.values())
+
+    def _init_value(self, column: str, state: str):
+        if state in ("count", "sum"):
+            return 0
+        if self._kinds.get(column) == "M":
+            return _INT64_MAX if state == "min" else _INT64_MIN
+        return np.nan
+
+    def _new_array(self, column: str, state: str, length: int) -> np.ndarray:
+        if state == "hll":
+            return np.zeros((length, 1 << self.precision), dtype=np.uint8)
+        if state == "count":
+            return np.zeros(length, dtype=np.int64)
+        if state in ("min", "max") and self._kinds.get(column) == "M":
+            return np.full(length, self._init_value(column, state), dtype=np.int64)
+        return np.full(length, self._init_value(column, state), dtype=np.float64)
+
+    def _ensure_capacity(self, size: int):
+        if size <= self._capacity:
+            return
+        capacity = max(size, self._capacity * 2, 64)
+        for key, array in self._states.items():
+            grown = self._new_array(key[0], key[1], capacity)
+            grown[:len(array)] = array
+            self._states[key] = grown
+        self._capacity = capacity
+
+    def _check_budget(self):
+        if self.max_bytes is not None and self.state_bytes > self.max_bytes:
+            raise MemoryError(f"分组状态超出内存上限: {self.state_bytes} > {self.max_bytes} 字节"
+                              f"（{self._size} 个分组）")
+
+    def _state(self, column: str, state: str) -> np.ndarray:
+        key = (column, state)
+        if key not in self._states:
+            self._states[key] = self._new_array(column, state, self._capacity)
+        return self._states[key]
+
+    def _global_ids(self, keys: pd.Index) -> np.ndarray:
+        """块内分组键 -> 全局分组编号（新分组追加到末尾）"""
+        if self._index is None:
+            self._index = keys[:0]
+        ids = self._index.get_indexer(keys)
+        new = ids < 0
+        if new.any():
+            ids[new] = np.arange(self._size, self._size + int(new.sum()))
+            self._index = self._index.append(keys[new])
+            self._size += int(new.sum())
+            self._ensure_capacity(self._size)
+        return ids
+
+    def _column_kind(self, column: str, series: pd.Series) -> str:
+        if column not in self._kinds:
+            if pd.api.types.is_datetime64_any_dtype(series):
+                self._kinds[column] = "M"
+            elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+                self._kinds[column] = "f"
+            else:
+                raise TypeError(f"min/max只支持数值或日期列: {column}")
+        return self._kinds[column]
+
+    # ========== 消费数据 ==========
+
+    def update(self, chunk: pd.DataFrame) -> "StreamingAggregator":
+        """并入一个DataFrame块"""
+        if chunk.empty:
+            return self
+        missing = [c for c in self.group_by + [c for c, _ in self._needed] if c not in chunk.columns]
+        if missing:
+            raise KeyError(f"列不存在: {sorted(set(map(str, missing)))}")
+        self.rows += len(chunk)
+        grouper = chunk.groupby(self.group_by, sort=False)
+        sizes = grouper.size()
+        if sizes.empty:
+            return self
+        ids = self._global_ids(sizes.index)
+        codes = grouper.ngroup().fillna(-1).to_numpy(dtype=np.int64)  # 分组键为空的行为-1
+        in_group = codes >= 0
+
+        for column, state in self._needed:
+            series = chunk[column]
+            if state in ("count", "sum"):
+                if state == "sum" and not (pd.api.types.is_numeric_dtype(series)
+                                           or pd.api.types.is_bool_dtype(series)):
+                    series = pd.to_numeric(series)
+                valid = in_group & series.notna().to_numpy()
+                weights = series.to_numpy(dtype=np.float64, na_value=0)[valid] if state == "sum" else None
+                self._state(column, state)[ids] += np.bincount(codes[valid], weights=weights,
+                                                               minlength=len(ids)).astype(
+                    np.float64 if state == "sum" else np.int64)
+            elif state in ("min", "max"):
+                kind = self._column_kind(column, series)
+                local = getattr(grouper[column], state)()
+                target = self._state(column, state)
+                if kind == "M":
+                    values = local.to_numpy(dtype="datetime64[ns]").view(np.int64).copy()
+                    values[values == _INT64_MIN] = self._init_value(column, state)  # NaT
+                    combine = np.minimum if state == "min" else np.maximum
+                else:
+                    values = local.to_numpy(dtype=np.float64, na_value=np.nan)
+                    combine = np.fmin if state == "min" else np.fmax
+                target[ids] = combine(target[ids], values)
+            else:
+                self._update_hll(column, series, ids[codes], in_group)
+        self._check_budget()
+        return self
+
+    def _update_hll(self, column: str, series: pd.Series, row_ids: np.ndarray, in_group: np.ndarray):
+        valid = in_group & series.notna().to_numpy()
+        if not valid.any():
+            return
+        hashes = hash_values(series[valid])
+        p = self.precision
+        bucket = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        rank = (64 - p + 1 - _bit_length(rest).astype(np.int64)).astype(np.uint8)
+        np.maximum.at(self._state(column, "hll"), (row_ids[valid], bucket), rank)
+
+    def update_rows(self, rows: Iterable[Any], columns: Optional[Sequence[str]] = None,
+                    batch_size: int = 10000) -> "StreamingAggregator":
+        """
+        逐行消费（字典或元组），每 batch_size 行合成一个块并入
+
+        Args:
+            columns: 行为元组时的列名
+        """
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self.update(pd.DataFrame.from_records(batch, columns=columns))
+                batch = []
+        if batch:
+            self.update(pd.DataFrame.from_records(batch, columns=columns))
+        return self
+
+    def consume(self, chunks: Iterable[pd.DataFrame]) -> "StreamingAggregator":
+        """消费DataFrame块迭代器"""
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def merge(self, other: "StreamingAggregator") -> "StreamingAggregator":
+        """合并另一个聚合器的部分状态（分组列和聚合定义需一致）"""
+        if other.group_by != self.group_by or other._needed != self._needed:
+            raise ValueError("聚合定义不一致，无法合并")
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog精度不一致，无法合并")
+        self.rows += other.rows
+        if other._index is None or other._size == 0:
+            return self
+        for column, kind in other._kinds.items():
+            if self._kinds.setdefault(column, kind) != kind:
+                raise TypeError(f"列类型不一致，无法合并: {column}")
+        ids = self._global_ids(other._index)
+        for column, state in self._needed:
+            key = (column, state)
+            if key not in other._states:
+                continue
+            source = other._states[key][:other._size]
+            target = self._state(column, state)
+            if state in ("count", "sum"):
+                target[ids] += source
+            elif state == "hll":
+                target[ids] = np.maximum(target[ids], source)
+            elif self._kinds.get(column) == "M":
+                target[ids] = (np.minimum if state == "min" else np.maximum)(target[ids], source)
+            else:
+                target[ids] = (np.fmin if state == "min" else np.fmax)(target[ids], source)
+        self._check_budget()
+        return self
+
+    # ========== 结果 ==========
+
+    def _output(self, column: str, func: str) -> Any:
+        n = self._size
+        if func == "count":
+            return self._state(column, "count")[:n]
+        if func == "sum":
+            return self._state(column, "sum")[:n]
+        if func == "mean":
+            counts = self._state(column, "count")[:n]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(counts > 0, self._state(column, "sum")[:n] / counts, np.nan)
+        if func in ("min", "max"):
+            values = self._state(column, func)[:n]
+            if self._kinds.get(column) == "M":
+                dates = values.copy()
+                dates[dates == self._init_value(column, func)] = _INT64_MIN  # 全为空的分组 -> NaT
+                return pd.to_datetime(dates.view("datetime64[ns]"))
+            return values
+        return np.rint(hll_estimate(self._state(column, "hll")[:n])).astype(np.int64)
+
+    def result(self, sort: bool = True) -> pd.DataFrame:
+        """聚合结果（分组列 + 各聚合输出列）"""
+        if self._index is None or self._size == 0:
+            return pd.DataFrame(columns=self.group_by + [name for _, _, name in self.aggregations])
+        data = {name: self._output(column, func) for column, func, name in self.aggregations}
+        df = pd.DataFrame(data, index=self._index)
+        df.index.names = self.group_by
+        if sort:
+            df = df.sort_index()
+        return df.reset_index()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"rows": self.rows, "groups": self._size, "state_bytes": self.state_bytes,
+                "bytes_per_group": math.ceil(self.state_bytes / self._capacity) if self._capacity else 0}
@@ -1,40 +1,88 @@
 """
 RPA工具注册系统
 自动发现和注册所有RPA工具，转换为LangChain Tool格式
+
+注册表只保存元数据（名称、描述、所属工具、方法名），工具类及其依赖
+（cv2、pandas、openpyxl、pyautogui、langchain等）在首次调用时才导入和实例化。
 """
-from typing import List, Dict, Any
-from langchain.tools import Tool
-from langchain.pydantic_v1 import BaseModel, Field
+import importlib
+import inspect
 import logging
+import threading
+import time
+from typing import List, Dict, Any, Optional, Callable
 
-# 导入所有工具类
-from .screen_tools import ScreenTool
-from .vision_tools import VisionTool
-from .excel_tools import ExcelTool
-from .word_tools import WordTool
-from .data_tools import DataTool
+from .artifact_store import current_artifact_store
+from .profiling import profiler
 
 
 logger = logging.getLogger(__name__)
 
 
+# 工具实例属性名 -> (模块, 类名, 依赖的其他工具实例)
+TOOL_CLASSES = {
+    "screen_tool": (".screen_tools", "ScreenTool", ()),
+    "vision_tool": (".vision_tools", "VisionTool", ()),
+    "excel_tool": (".excel_tools", "ExcelTool", ()),
+    "word_tool": (".word_tools", "WordTool", ()),
+    "data_tool": (".data_tools", "DataTool", ()),
+    "harvest_tool": (".harvest_tools", "HarvestTool", ("screen_tool",)),
+}
+
+# 工具实例的默认执行类别（见 async_tools.TOOL_KINDS）
+TOOL_KINDS = {
+    "screen_tool": "gui",
+    "vision_tool": "gui",
+    "harvest_tool": "gui",
+    "excel_tool": "io",
+    "word_tool": "io",
+    "data_tool": "cpu",
+}
+
+
 class RPAToolRegistry:
     """RPA工具注册中心"""
     
     def __init__(self):
         self.tools = {}
-        self.langchain_tools = []
-        
-        # 初始化所有工具实例
-        self.screen_tool = ScreenTool()
-        self.vision_tool = VisionTool()
-        self.excel_tool = ExcelTool()
-        self.word_tool = WordTool()
-        self.data_tool = DataTool()
+        self._langchain_tools = None
+        self._async_executor = None
+        self._tool_selector = None
+        self._prompt_prefix = None
+        self.artifact_store = None
+        self._instances = {}
+        self._lock = threading.RLock()
         
-        # 注册工具
+        # 注册工具（仅元数据）
         self._register_all_tools()
     
+    # ========== 工具实例（按需创建） ==========
+    
+    def get_instance(self, attr: str):
+        """获取工具实例（首次访问时导入模块并实例化）"""
+        instance = self._instances.get(attr)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(attr)
+            if instance is None:
+                module_name, class_name, deps = TOOL_CLASSES[attr]
+                cls = getattr(importlib.import_module(module_name, __package__), class_name)
+                instance = cls(*[self.get_instance(dep) for dep in deps])
+                self._instances[attr] = instance
+                logger.debug(f"已加载工具: {class_name}")
+        return instance
+    
+    def __getattr__(self, attr):
+        # 兼容 registry.screen_tool 等属性访问
+        if attr in TOOL_CLASSES:
+            return self.get_instance(attr)
+        raise AttributeError(f"{type(self).__name__!s} 没有属性 {attr!r}")
+    
+    def loaded_tools(self) -> List[str]:
+        """已实例化的工具"""
+        return list(self._instances.keys())
+    
     def _register_all_tools(self):
         """注册所有RPA工具"""
         
@@ -42,146 +90,356 @@ class RPAToolRegistry:
         self._register_tool(
             name="click_at",
             description="点击屏幕指定坐标位置。参数: x(int), y(int), clicks(int, 默认1), button(str, 默认'left')",
-            func=self.screen_tool.click_at
+            tool="screen_tool",
+            method="click_at"
         )
         
         self._register_tool(
             name="type_text",
             description="在当前焦点位置输入文本（支持中文）。参数: text(str)",
-            func=self.screen_tool.type_text
+            tool="screen_tool",
+            method="type_text"
         )
         
         self._register_tool(
             name="press_key",
             description="按下键盘按键。参数: key(str, 如'enter', 'backspace'), presses(int, 默认1)",
-            func=self.screen_tool.press_key
+            tool="screen_tool",
+            method="press_key"
         )
         
         self._register_tool(
             name="hotkey",
             description="执行组合键操作。参数: *keys(可变参数, 如'ctrl', 'c')",
-            func=self.screen_tool.hotkey
+            tool="screen_tool",
+            method="hotkey"
         )
         
         self._register_tool(
             name="screenshot",
             description="截取屏幕。参数: region(tuple, 可选), save_path(str, 可选)",
-            func=self.screen_tool.screenshot
+            tool="screen_tool",
+            method="screenshot"
         )
         
         self._register_tool(
             name="scroll",
             description="滚动鼠标滚轮。参数: clicks(int, 正数向上负数向下)",
-            func=self.screen_tool.scroll
+            tool="screen_tool",
+            method="scroll"
+        )
+        
+        self._register_tool(
+            name="harvest_table",
+            description="通过剪贴板一次性采集界面表格为DataFrame。参数: mode(str, 'all'全选|'region'框选|'none'已选中), x(int, 可选), y(int, 可选), x2(int, 可选), y2(int, 可选), fmt(str, 默认'auto')",
+            tool="harvest_tool",
+            method="harvest_table"
         )
         
         # ========== 视觉识别工具 ==========
         self._register_tool(
             name="find_image",
             description="在屏幕上查找图像。参数: template_name(str), confidence(float, 可选)",
-            func=self.vision_tool.find_image
+            tool="vision_tool",
+            method="find_image"
         )
         
         self._register_tool(
             name="click_image",
             description="查找并点击图像。参数: template_name(str), clicks(int, 默认1), timeout(float, 默认10)",
-            func=self.vision_tool.click_image
+            tool="vision_tool",
+            method="click_image"
         )
         
         self._register_tool(
             name="wait_for_element",
             description="等待图像元素出现。参数: template_name(str), timeout(float, 默认10)",
-            func=self.vision_tool.wait_for_element
+            tool="vision_tool",
+            method="wait_for_element"
         )
         
         self._register_tool(
             name="click_relative",
             description="基于锚点图像的相对位置点击。参数: anchor_template(str), offset_x(int), offset_y(int)",
-            func=self.vision_tool.click_relative
+            tool="vision_tool",
+            method="click_relative"
         )
         
         # ========== Excel工具 ==========
         self._register_tool(
             name="read_excel",
             description="读取Excel文件。参数: file_path(str), sheet_name(str, 可选)",
-            func=self.excel_tool.read_excel
+            tool="excel_tool",
+            method="read_excel"
         )
         
         self._register_tool(
             name="write_excel",
             description="写入Excel文件。参数: data(DataFrame), file_path(str)",
-            func=self.excel_tool.write_excel
+            tool="excel_tool",
+            method="write_excel"
         )
         
         self._register_tool(
             name="filter_excel_data",
             description="过滤Excel数据。参数: data(DataFrame), column(str), condition(str), value(Any)",
-            func=self.excel_tool.filter_data
+            tool="excel_tool",
+            method="filter_data"
+        )
+        
+        self._register_tool(
+            name="query_excel_data",
+            description=("组合条件查询Excel数据（一次完成多个过滤条件和列选择）。参数: data(DataFrame)或file_path(str), "
+                         "where(条件树: [列, 运算符, 值] 或 {\"and\"/\"or\": [...]}、{\"not\": 条件}; "
+                         "运算符 == != > < >= <= in not_in between isnull notnull contains regex startswith endswith), "
+                         "columns(list, 可选), limit(int, 可选)"),
+            tool="excel_tool",
+            method="query_data"
+        )
+        
+        self._register_tool(
+            name="ingest_excel_files",
+            description=("并行读取并汇总多个Excel文件。参数: pattern(str, 如'data/**/*.xlsx'), "
+                         "group_by(str, 可选), agg_column(str, 可选), agg_func(str, 默认'sum'), "
+                         "column_map(dict, 可选), columns(list, 可选)"),
+            tool="excel_tool",
+            method="ingest_workbooks"
         )
         
         # ========== Word工具 ==========
         self._register_tool(
             name="extract_word_text",
             description="提取Word文档文本。参数: file_path(str)",
-            func=self.word_tool.extract_text
+            tool="word_tool",
+            method="extract_text"
         )
         
         self._register_tool(
             name="render_word_template",
             description="渲染Word模板。参数: template_path(str), data(dict), output_path(str)",
-            func=self.word_tool.render_template
+            tool="word_tool",
+            method="render_template"
         )
         
         self._register_tool(
             name="extract_word_info_regex",
             description="使用正则表达式从Word提取信息。参数: file_path(str), patterns(dict)",
-            func=self.word_tool.extract_info_by_regex
+            tool="word_tool",
+            method="extract_info_by_regex"
         )
         
         # ========== 数据处理工具 ==========
         self._register_tool(
             name="extract_by_regex",
             description="使用正则表达式提取文本。参数: text(str), pattern(str)",
-            func=self.data_tool.extract_by_regex
+            tool="data_tool",
+            method="extract_by_regex"
         )
         
         self._register_tool(
             name="parse_date",
             description="解析日期字符串。参数: date_str(str), format(str, 默认'%Y-%m-%d')",
-            func=self.data_tool.parse_date
+            tool="data_tool",
+            method="parse_date"
         )
         
         self._register_tool(
             name="calculate_date_offset",
             description="计算日期偏移。参数: base_date(str), offset_days(int)",
-            func=self.data_tool.calculate_date_offset
+            tool="data_tool",
+            method="calculate_date_offset"
         )
         
         logger.info(f"已注册 {len(self.tools)} 个RPA工具")
     
-    def _register_tool(self, name: str, description: str, func):
-        """注册单个工具"""
+    def _register_tool(self, name: str, description: str, func: Optional[Callable] = None,
+                       tool: Optional[str] = None, method: Optional[str] = None,
+                       kind: Optional[str] = None):
+        """
+        注册单个工具（调用包装为profiling span，记录执行日志和审计，并按会话存储解析/压缩大对象）
+        
+        span的阶段: resolve（还原参数中的句柄）、execute（工具方法）、log（执行摘要和审计入队）、
+        compact（结果中的大对象换成句柄）；未设置大对象存储时只有 execute / log。
+        
+        Args:
+            name: 工具名
+            description: 工具描述
+            func: 直接注册的可调用对象
+            tool, method: 延迟绑定的工具实例属性名和方法名（首次调用时加载）
+            kind: 执行类别 'gui' | 'io' | 'cpu'（默认按所属工具确定）
+        """
+        if func is None:
+            func = self._lazy_method(tool, method)
         self.tools[name] = {
             "name": name,
             "description": description,
-            "func": func
+            "func": profiler.wrap(self._with_artifacts(self._with_audit(func, name, tool, method), name), name),
+            "tool": tool,
+            "method": method,
+            "kind": kind or TOOL_KINDS.get(tool, "io")
         }
+        self._langchain_tools = None
+        if self._prompt_prefix is not None:
+            self._prompt_prefix.refresh()
+    
+    def _lazy_method(self, tool: str, method: str) -> Callable:
+        def call(*args, **kwargs):
+            return getattr(self.get_instance(tool), method)(*args, **kwargs)
+        call.__name__ = method
+        return call
+    
+    def _with_audit(self, func: Callable, name: str, tool: Optional[str],
+                    method: Optional[str]) -> Callable:
+        """记录执行摘要和审计（参数为还原句柄后的对象，结果为压缩前的完整结果）"""
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with profiler.phase("execute"):
+                    result = func(*args, **kwargs)
+            except Exception as e:
+                self._log_call(name, tool, method, args, kwargs,
+                               {"status": "error", "message": f"{type(e).__name__}: {e}"},
+                               time.perf_counter() - started)
+                raise
+            duration = time.perf_counter() - started
+            with profiler.phase("log"):
+                self._log_call(name, tool, method, args, kwargs, result, duration)
+            return result
+        call.__name__ = getattr(func, "__name__", name)
+        return call
+    
+    def _log_call(self, name, tool, method, args, kwargs, result, duration):
+        instance = self._instances.get(tool) if tool else None
+        params = dict(kwargs)
+        if args:
+            try:
+                # 位置参数按方法签名转为参数名（敏感参数按名称脱敏）
+                params = dict(inspect.signature(getattr(instance, method)).bind(*args, **kwargs).arguments)
+            except Exception:
+                params["args"] = list(args)
+        try:
+            if instance is not None and hasattr(instance, "log_execution"):
+                instance.log_execution(params, result, duration, method)
+                return
+            from .base_tool import RPAToolBase
+            if RPAToolBase.audit_store is not None:
+                RPAToolBase.audit_store.append(name, params, result, time.time() - duration, duration)
+        except Exception as e:
+            logger.error(f"执行记录失败({name}): {e}")
+    
+    def _with_artifacts(self, func: Callable, name: str) -> Callable:
+        def call(*args, **kwargs):
+            store = current_artifact_store()
+            if store is None:
+                store = self.artifact_store
+            if store is None:
+                return func(*args, **kwargs)
+            with profiler.phase("resolve"):
+                args = store.resolve(args)
+                kwargs = store.resolve(kwargs)
+            result = func(*args, **kwargs)
+            with profiler.phase("compact"):
+                return store.compact(result, source=name)
+        call.__name__ = getattr(func, "__name__", name)
+        return call
+    
+    def set_artifact_store(self, store):
+        """
+        设置默认的大对象存储
         
-        # 转换为LangChain Tool
-        langchain_tool = Tool(
-            name=name,
-            description=description,
-            func=lambda **kwargs: func(**kwargs)
-        )
-        self.langchain_tools.append(langchain_tool)
+        设置后，注册表调用的工具结果中的DataFrame、图像、长文本等会替换为
+        句柄+预览，参数中的句柄会还原为对象。多会话场景可用
+        artifact_store.use_artifact_store() 为每个会话指定独立存储。
+        """
+        self.artifact_store = store
+        return store
     
     def get_tool(self, name: str):
         """获取指定工具"""
         return self.tools.get(name)
     
-    def get_all_tools(self) -> List[Tool]:
-        """获取所有LangChain工具"""
-        return self.langchain_tools
+    def get_all_tools(self) -> List[Any]:
+        """获取所有LangChain工具（首次调用时导入langchain并构建，按名称排序以保证提示词稳定）"""
+        if self._langchain_tools is None:
+            from langchain.tools import Tool
+            tools = []
+            executor = self.get_async_executor()
+            for _, entry in sorted(self.tools.items()):
+                traced = entry["func"]
+                tools.append(Tool(
+                    name=entry["name"],
+                    description=entry["description"],
+                    func=lambda *args, _f=traced, **kwargs: _f(*args, **kwargs),
+                    coroutine=executor.coroutine_for(entry["name"])
+                ))
+            self._langchain_tools = tools
+        return self._langchain_tools
+    
+    @property
+    def langchain_tools(self) -> List[Any]:
+        return self.get_all_tools()
+    
+    # ========== 异步调用 ==========
+    
+    def get_async_executor(self):
+        """获取异步执行器（首次调用时创建，可用 set_async_executor 替换配置）"""
+        if self._async_executor is None:
+            from .async_tools import AsyncToolExecutor
+            with self._lock:
+                if self._async_executor is None:
+                    self._async_executor = AsyncToolExecutor(self)
+        return self._async_executor
+    
+    def set_async_executor(self, executor):
+        """设置异步执行器（如自定义线程池大小）"""
+        self._async_executor = executor
+        self._langchain_tools = None
+        return executor
+    
+    async def ainvoke(self, name: str, *args, **kwargs) -> Dict[str, Any]:
+        """异步调用工具（阻塞工作在执行器中完成，GUI操作按显示器串行）"""
+        return await self.get_async_executor().ainvoke(name, *args, **kwargs)
+    
+    # ========== 工具检索 ==========
+    
+    def get_tool_selector(self):
+        """获取工具选择器（首次调用时创建，工具向量随注册表缓存）"""
+        if self._tool_selector is None:
+            from .tool_selector import ToolSelector
+            with self._lock:
+                if self._tool_selector is None:
+                    self._tool_selector = ToolSelector(self)
+        return self._tool_selector
+    
+    def set_tool_selector(self, selector):
+        """设置工具选择器（如自定义top_k、嵌入模型）"""
+        self._tool_selector = selector
+        return selector
+    
+    def select_tools(self, instruction: str, top_k: Optional[int] = None) -> List[Any]:
+        """按指令选出最相关的LangChain工具（无明显相关工具时返回全部）"""
+        return self.get_tool_selector().get_tools(instruction, top_k)
+    
+    def get_prompt_prefix(self):
+        """获取规范化提示词前缀（见 prompt_prefix.PromptPrefix，工具变化时自动更新）"""
+        if self._prompt_prefix is None:
+            from .prompt_prefix import PromptPrefix
+            with self._lock:
+                if self._prompt_prefix is None:
+                    self._prompt_prefix = PromptPrefix(self)
+        return self._prompt_prefix
+    
+    def set_prompt_prefix(self, prefix):
+        """设置提示词前缀（如自定义系统说明）"""
+        self._prompt_prefix = prefix
+        return prefix
+    
+    # ========== 计划执行 ==========
+    
+    def run_plan(self, plan: List[Dict[str, Any]], max_workers: int = 8) -> Dict[str, Any]:
+        """按依赖并发执行工具计划（见 plan_executor.PlanExecutor）"""
+        from .plan_executor import PlanExecutor
+        return PlanExecutor(self, max_workers=max_workers).run(plan)
     
     def list_tools(self) -> List[str]:
         """列出所有工具名称"""
@@ -193,15 +451,41 @@ class RPAToolRegistry:
         return tool["description"] if tool else "工具不存在"
 
 
-# 全局工具注册实例
-tool_registry = RPAToolRegistry()
+# 全局工具注册实例（首次使用时创建）
+_registry: Optional[RPAToolRegistry] = None
+_registry_lock = threading.Lock()
 
 
-def get_rpa_tools() -> List[Tool]:
-    """获取所有RPA工具（供Agent使用）"""
-    return tool_registry.get_all_tools()
+def get_registry() -> RPAToolRegistry:
+    """获取全局工具注册实例"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = RPAToolRegistry()
+    return _registry
+
+
+def __getattr__(name):
+    # 兼容 from rpa_tools.tool_registry import tool_registry
+    if name == "tool_registry":
+        return get_registry()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_rpa_tools(instruction: Optional[str] = None, top_k: Optional[int] = None) -> List[Any]:
+    """
+    获取RPA工具（供Agent使用）
+    
+    Args:
+        instruction: 当前指令（提供时只返回最相关的top_k个工具）
+        top_k: 选择的工具数
+    """
+    if instruction:
+        return get_registry().select_tools(instruction, top_k)
+    return get_registry().get_all_tools()
 
 
 def get_tool_by_name(name: str):
     """根据名称获取工具"""
-    return tool_registry.get_tool(name)
+    return get_registry().get_tool(name)
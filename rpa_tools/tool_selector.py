@@ -0,0 +1,260 @@
+"""
+工具检索
+按当前指令从注册表中选出最相关的top-k工具，缩短每轮交给LLM的工具说明
+"""
+import hashlib
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+# 推荐的嵌入模型（需显式传入model_name；先下载到本地或用 allow_download=True 在启动时加载）
+RECOMMENDED_MODEL = "BAAI/bge-small-zh-v1.5"
+
+_CJK = re.compile(r"[㐀-鿿豈-﫿]")
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（中文约1字1token，其余约4字符1token）"""
+    cjk = len(_CJK.findall(text))
+    other = len(re.sub(r"\s+", "", _CJK.sub("", text)))
+    return cjk + math.ceil(other / 4)
+
+
+def tool_prompt_text(name: str, description: str) -> str:
+    """工具在提示词中的文本形式"""
+    return f"{name}: {description}"
+
+
+class CharNgramEmbedder:
+    """
+    字符n-gram TF-IDF向量（无sentence-transformers时的后备方案）
+
+    中文按单字和双字切分，英文按单词（含下划线分词）切分。
+    """
+
+    def __init__(self, ngram: int = 2):
+        self.ngram = ngram
+        self.idf: Dict[str, float] = {}
+
+    def _terms(self, text: str) -> List[str]:
+        text = text.lower()
+        terms = []
+        for word in _WORD.findall(text):
+            terms.append(word)
+            terms.extend(part for part in word.split("_") if part and part != word)
+        chars = _CJK.findall(text)
+        for n in range(1, self.ngram + 1):
+            terms.extend("".join(chars[i:i + n]) for i in range(len(chars) - n + 1))
+        return terms
+
+    def fit(self, texts: Sequence[str]):
+        df = Counter()
+        for text in texts:
+            df.update(set(self._terms(text)))
+        total = len(texts)
+        self.idf = {term: math.log((1 + total) / (1 + count)) + 1 for term, count in df.items()}
+        return self
+
+    def encode(self, texts: Sequence[str]) -> List[Dict[str, float]]:
+        vectors = []
+        for text in texts:
+            counts = Counter(t for t in self._terms(text) if t in self.idf)
+            vector = {t: c * self.idf[t] for t, c in counts.items()}
+            norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+            vectors.append({t: v / norm for t, v in vector.items()})
+        return vectors
+
+    @staticmethod
+    def similarity(a: Dict[str, float], b: Dict[str, float]) -> float:
+        if len(a) > len(b):
+            a, b = b, a
+        return sum(v * b.get(t, 0.0) for t, v in a.items())
+
+
+class ToolSelector:
+    """
+    工具选择器
+
+    工具描述只在注册表内容变化时重新向量化（可缓存到磁盘）；每步按指令选出top-k工具，
+    最高相似度低于阈值时回退到全部工具。结果中报告所选工具和全部工具的提示词token数。
+
+    默认使用字符n-gram检索；嵌入模型需显式指定，且默认只从本地加载（不联网下载），
+    可在启动时调用 refresh() 预先加载，避免首次选择时在Agent步骤中加载模型。
+    """
+
+    def __init__(self, registry=None, top_k: int = 6, min_score: float = 0.15,
+                 model_name: Optional[str] = None, cache_dir: Optional[str] = None,
+                 always_include: Sequence[str] = (), token_counter: Optional[Callable[[str], int]] = None,
+                 allow_download: bool = False):
+        """
+        Args:
+            registry: RPAToolRegistry（默认全局注册表）
+            top_k: 默认选出的工具数
+            min_score: 最高相似度低于该值时回退到全部工具
+            model_name: sentence-transformers模型名或本地路径（None或不可用时使用字符n-gram），
+                        如 RECOMMENDED_MODEL
+            cache_dir: 工具向量的磁盘缓存目录
+            always_include: 始终包含的工具
+            token_counter: 自定义token计数函数（默认粗略估算）
+            allow_download: 允许本地没有模型时从HuggingFace下载（默认只用本地文件）
+        """
+        if registry is None:
+            from .tool_registry import get_registry
+            registry = get_registry()
+        self.registry = registry
+        self.top_k = top_k
+        self.min_score = min_score
+        self.model_name = model_name
+        self.allow_download = allow_download
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.always_include = list(always_include)
+        self.count_tokens = token_counter or estimate_tokens
+
+        self._model = None
+        self._backend: Optional[str] = None
+        self._fingerprint: Optional[str] = None
+        self._names: List[str] = []
+        self._vectors: Any = None
+        self._ngram = CharNgramEmbedder()
+        self._lock = threading.Lock()
+        self.stats = {"selections": 0, "fallbacks": 0, "prompt_tokens": 0, "full_prompt_tokens": 0}
+
+    @property
+    def backend(self) -> Optional[str]:
+        """'embedding' | 'ngram'"""
+        return self._backend
+
+    # ========== 工具向量 ==========
+
+    def _tool_texts(self) -> Dict[str, str]:
+        return {name: tool_prompt_text(name, entry["description"])
+                for name, entry in sorted(self.registry.tools.items())}
+
+    def _load_model(self):
+        if self._backend is None:
+            self._backend = "ngram"
+            if self.model_name:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name,
+                                                      local_files_only=not self.allow_download)
+                    self._backend = "embedding"
+                except Exception as e:
+                    logger.info(f"嵌入模型不可用，使用字符n-gram检索: {e}")
+        return self._model
+
+    def _embed(self, texts: List[str]):
+        return self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+
+    def refresh(self, force: bool = False):
+        """注册表内容变化时重新向量化工具描述"""
+        texts = self._tool_texts()
+        fingerprint = hashlib.sha1("\n".join(texts.values()).encode("utf-8")).hexdigest()
+        with self._lock:
+            if not force and fingerprint == self._fingerprint:
+                return
+            self._load_model()
+            self._names = list(texts)
+            values = list(texts.values())
+            if self._backend == "embedding":
+                self._vectors = self._load_cached(fingerprint)
+                if self._vectors is None:
+                    self._vectors = self._embed(values)
+                    self._save_cached(fingerprint, self._vectors)
+            else:
+                self._ngram.fit(values)
+                self._vectors = self._ngram.encode(values)
+            self._fingerprint = fingerprint
+            logger.debug(f"工具向量已更新: {len(values)} 个工具 ({self._backend})")
+
+    def _cache_path(self, fingerprint: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        model = re.sub(r"[^A-Za-z0-9_.-]", "_", self.model_name or "")
+        return self.cache_dir / f"tools_{model}_{fingerprint[:16]}.npy"
+
+    def _load_cached(self, fingerprint: str):
+        path = self._cache_path(fingerprint)
+        if path is not None and path.exists():
+            import numpy as np
+            return np.load(path)
+        return None
+
+    def _save_cached(self, fingerprint: str, vectors):
+        path = self._cache_path(fingerprint)
+        if path is not None:
+            import numpy as np
+            path.parent.mkdir(parents=True, exist_ok=True)
+            np.save(path, vectors)
+
+    # ========== 选择 ==========
+
+    def score(self, instruction: str) -> Dict[str, float]:
+        """指令与每个工具的相似度"""
+        self.refresh()
+        if self._backend == "embedding":
+            query = self._embed([instruction])[0]
+            scores = self._vectors @ query
+            return {name: float(s) for name, s in zip(self._names, scores)}
+        query = self._ngram.encode([instruction])[0]
+        return {name: CharNgramEmbedder.similarity(query, vector)
+                for name, vector in zip(self._names, self._vectors)}
+
+    def select(self, instruction: str, top_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        为指令选择工具
+
+        Returns:
+            tools(工具名列表), scores, fallback(是否回退到全部工具),
+            prompt_tokens(所选工具说明的token数), full_prompt_tokens(全部工具的token数)
+        """
+        try:
+            top_k = top_k or self.top_k
+            texts = self._tool_texts()
+            full_tokens = sum(self.count_tokens(t) for t in texts.values())
+
+            scores = self.score(instruction) if instruction and instruction.strip() else {}
+            ranked = sorted(scores, key=scores.get, reverse=True)
+            fallback = not ranked or scores[ranked[0]] < self.min_score
+            if fallback:
+                names = list(texts)
+            else:
+                names = ranked[:top_k]
+                names += [n for n in self.always_include if n in texts and n not in names]
+            prompt_tokens = sum(self.count_tokens(texts[n]) for n in names)
+
+            self.stats["selections"] += 1
+            self.stats["fallbacks"] += int(fallback)
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["full_prompt_tokens"] += full_tokens
+            return {
+                "status": "success",
+                "tools": names,
+                "scores": {n: round(scores[n], 4) for n in names if n in scores},
+                "fallback": fallback,
+                "backend": self._backend,
+                "prompt_tokens": prompt_tokens,
+                "full_prompt_tokens": full_tokens,
+                "message": (f"选择 {len(names)}/{len(texts)} 个工具, "
+                            f"提示词 {prompt_tokens}/{full_tokens} tokens"
+                            + ("（回退到全部工具）" if fallback else ""))
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    def get_tools(self, instruction: str, top_k: Optional[int] = None) -> List[Any]:
+        """为指令选择LangChain工具（选择失败时返回全部工具）"""
+        tools = self.registry.get_all_tools()
+        result = self.select(instruction, top_k)
+        if result["status"] != "success":
+            return tools
+        by_name = {tool.name: tool for tool in tools}
+        return [by_name[n] for n in result["tools"] if n in by_name]
@@ -24,11 +24,55 @@ class VisionTool(RPAToolBase):
         # 多尺度搜索配置
         self.scales = [1.0, 0.95, 0.9, 0.85, 0.8, 0.75, 0.7]
         self.scale_cache = {}  # 缓存最佳缩放比例
+        
+        # 共享帧监视器（设置后等待类操作复用同一截屏循环）
+        self.frame_watcher = None
+        
+        # 共享帧缓冲区（设置后从截屏守护进程读取帧，不再自行截屏）
+        self.frame_source = None
     
     def execute(self, **kwargs) -> Dict[str, Any]:
         """通用执行接口"""
         return {"status": "success", "message": "请使用具体方法"}
     
+    def attach_frame_watcher(self, watcher=None):
+        """
+        挂载共享帧监视器
+        
+        Args:
+            watcher: FrameWatcher实例（None=按当前配置新建一个）
+        """
+        if watcher is None:
+            from .frame_watcher import FrameWatcher
+            watcher = FrameWatcher(image_dir=str(self.image_dir),
+                                   confidence=self.confidence,
+                                   grayscale=self.grayscale,
+                                   scales=self.scales)
+        self.frame_watcher = watcher
+        return watcher
+    
+    def attach_frame_source(self, source=None):
+        """
+        挂载共享帧缓冲区
+        
+        Args:
+            source: SharedFrameRing实例或共享内存名称（None=默认名称）
+        """
+        if source is None or isinstance(source, str):
+            from .shared_frames import SharedFrameRing, DEFAULT_RING_NAME
+            source = SharedFrameRing.attach(source or DEFAULT_RING_NAME)
+        self.frame_source = source
+        return source
+    
+    def _grab_screen(self) -> np.ndarray:
+        """获取当前屏幕RGB数组（优先读取共享帧缓冲区）"""
+        if self.frame_source is not None:
+            # 拷贝出槽位：匹配耗时可能超过一个环形周期，零拷贝视图会被守护进程覆盖
+            seq, frame = self.frame_source.latest(copy=True)
+            if frame is not None:
+                return frame
+        return np.array(pyautogui.screenshot())
+    
     # ========== 图像定位（PyAutoGUI方式） ==========
     
     def find_image(self, template_name: str, confidence: Optional[float] = None,
@@ -53,11 +97,20 @@ class VisionTool(RPAToolBase):
                 }
             
             conf = confidence if confidence is not None else self.confidence
-            location = pyautogui.locateOnScreen(
-                str(template_path),
-                confidence=conf,
-                region=region
-            )
+            if self.frame_source is not None:
+                from PIL import Image
+                location = pyautogui.locate(
+                    str(template_path),
+                    Image.fromarray(self._grab_screen()),
+                    confidence=conf,
+                    region=region
+                )
+            else:
+                location = pyautogui.locateOnScreen(
+                    str(template_path),
+                    confidence=conf,
+                    region=region
+                )
             
             if location:
                 center = pyautogui.center(location)
@@ -94,10 +147,18 @@ class VisionTool(RPAToolBase):
                 }
             
             conf = confidence if confidence is not None else self.confidence
-            locations = list(pyautogui.locateAllOnScreen(
-                str(template_path),
-                confidence=conf
-            ))
+            if self.frame_source is not None:
+                from PIL import Image
+                locations = list(pyautogui.locateAll(
+                    str(template_path),
+                    Image.fromarray(self._grab_screen()),
+                    confidence=conf
+                ))
+            else:
+                locations = list(pyautogui.locateAllOnScreen(
+                    str(template_path),
+                    confidence=conf
+                ))
             
             centers = [pyautogui.center(loc) for loc in locations]
             positions = [(c.x, c.y) for c in centers]
@@ -139,8 +200,7 @@ class VisionTool(RPAToolBase):
             h, w = template.shape[:2]
             
             # 截取屏幕
-            screenshot = pyautogui.screenshot()
-            screen = cv2.cvtColor(np.array(screenshot), 
+            screen = cv2.cvtColor(self._grab_screen(), 
                                 cv2.COLOR_RGB2GRAY if self.grayscale else cv2.COLOR_RGB2BGR)
             
             conf = confidence if confidence is not None else self.confidence
@@ -204,6 +264,15 @@ class VisionTool(RPAToolBase):
             interval: 检查间隔（秒）
             use_multiscale: 是否使用多尺度匹配
         """
+        if self.frame_watcher is not None:
+            result = self.frame_watcher.wait_for_template(
+                template_name, timeout=timeout,
+                scales=None if use_multiscale else [1.0]
+            )
+            if result.get("found"):
+                result["message"] = f"元素出现: {template_name}"
+            return result
+        
         start_time = time.time()
         
         while True:
@@ -227,6 +296,26 @@ class VisionTool(RPAToolBase):
             
             time.sleep(interval)
     
+    def watch_element(self, template_name: str, timeout: Optional[float] = None,
+                      callback=None, use_multiscale: bool = True):
+        """
+        异步等待图像元素出现（基于共享帧监视器）
+        
+        Args:
+            template_name: 模板图片文件名
+            timeout: 超时时间（秒，None=不超时）
+            callback: 出现或超时时的回调，参数为结果字典
+            use_multiscale: 是否使用多尺度匹配
+        
+        Returns:
+            concurrent.futures.Future，结果为结果字典
+        """
+        watcher = self.frame_watcher or self.attach_frame_watcher()
+        return watcher.watch_template(
+            template_name, timeout=timeout, callback=callback,
+            scales=None if use_multiscale else [1.0]
+        )
+    
     # ========== 点击图像 ==========
     
     def click_image(self, template_name: str, clicks: int = 1, 
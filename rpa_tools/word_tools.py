@@ -8,6 +8,7 @@ from typing import Dict, Any, List, Optional
 from pathlib import Path
 import re
 from .base_tool import RPAToolBase
+from .memo_cache import memoize
 
 
 class WordTool(RPAToolBase):
@@ -57,6 +58,7 @@ class WordTool(RPAToolBase):
     
     # ========== 内容提取 ==========
     
+    @memoize(path_arg="file_path")
     def extract_text(self, file_path: Optional[str] = None) -> Dict[str, Any]:
         """
         提取文档全部文本
@@ -84,6 +86,7 @@ class WordTool(RPAToolBase):
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
+    @memoize(path_arg="file_path")
     def extract_info_by_regex(self, file_path: str, patterns: Dict[str, str]) -> Dict[str, Any]:
         """
         使用正则表达式提取信息（基于现有word_process项目）
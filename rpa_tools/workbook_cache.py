@@ -0,0 +1,81 @@
+"""
+工作簿缓存
+进程内按 (路径, 大小, mtime) 缓存已解析的openpyxl工作簿，同一文件重复打开时无需重新解析XML；
+DataFrame读取结果由 memo_cache 按 (路径, 工作表, 参数, mtime) 缓存，两者统一失效
+"""
+import logging
+import os
+from typing import Any, Optional
+
+from .memo_cache import MemoCache, file_fingerprint, get_memo_cache
+
+
+logger = logging.getLogger(__name__)
+
+# openpyxl单元格对象的估算内存（字节）
+CELL_BYTES = 150
+
+workbook_cache = MemoCache(max_bytes=512 * 1024 * 1024)
+
+
+def get_workbook_cache() -> MemoCache:
+    """获取全局工作簿缓存"""
+    return workbook_cache
+
+
+def estimate_workbook_bytes(workbook) -> int:
+    """按单元格数估算工作簿内存占用"""
+    cells = sum(ws.max_row * ws.max_column for ws in workbook.worksheets)
+    return 4096 + cells * CELL_BYTES
+
+
+def workbook_dimensions(workbook) -> tuple:
+    """各工作表的 (名称, 最大行, 最大列)，用于判断取出后是否新建了单元格"""
+    return tuple((ws.title, ws.max_row, ws.max_column) for ws in workbook.worksheets)
+
+
+def _key(fingerprint: tuple) -> str:
+    return workbook_cache.make_key("workbook", fingerprint)
+
+
+def checkout_workbook(path: str) -> Optional[tuple]:
+    """
+    取出缓存的工作簿（编辑模式独占使用，取出后缓存中不再保留）
+
+    Returns:
+        (workbook, fingerprint)；未命中时返回None
+    """
+    if not workbook_cache.enabled or not os.path.isfile(path):
+        return None
+    fingerprint = file_fingerprint(path)
+    workbook = workbook_cache.pop(_key(fingerprint))
+    return None if workbook is None else (workbook, fingerprint)
+
+
+def checkin_workbook(path: str, workbook: Any, fingerprint: tuple,
+                     dimensions: Optional[tuple] = None) -> bool:
+    """
+    归还工作簿（仅当内容与磁盘文件一致，即fingerprint仍与文件匹配时缓存）
+
+    openpyxl编辑模式下读取表格范围外的单元格也会新建空单元格；传入取出时的
+    dimensions 后，尺寸变化的工作簿不再放回缓存。
+
+    Returns:
+        是否已缓存
+    """
+    if not workbook_cache.enabled or not os.path.isfile(path):
+        return False
+    if file_fingerprint(path) != fingerprint:
+        return False
+    if dimensions is not None and workbook_dimensions(workbook) != dimensions:
+        logger.debug(f"工作簿取出后尺寸已变化，不放回缓存: {path}")
+        return False
+    workbook_cache.put(_key(fingerprint), workbook, path=path,
+                       size=estimate_workbook_bytes(workbook), disk=False)
+    return True
+
+
+def invalidate_workbook(path: str):
+    """文件被写入后使工作簿和DataFrame缓存失效"""
+    workbook_cache.invalidate_path(path)
+    get_memo_cache().invalidate_path(path)
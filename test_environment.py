@@ -86,6 +86,333 @@ def test_rpa_dependencies():
         print(f"[FAIL] RPA依赖检查失败: {e}")
         return False
 
+# rpa_tools 导入及注册表构建的时间预算（秒）
+IMPORT_BUDGET_SECONDS = 0.5
+# 导入 rpa_tools 时不应加载的重量级依赖（应在首次调用工具时才导入）
+HEAVY_MODULES = ['cv2', 'pandas', 'numpy', 'openpyxl', 'docx', 'docxtpl',
+                 'pyautogui', 'pydirectinput', 'langchain', 'PIL']
+
+def test_import_budget():
+    """测试rpa_tools导入耗时（延迟导入检查）"""
+    print("\n" + "=" * 50)
+    print("测试4: rpa_tools导入耗时预算")
+    print("=" * 50)
+    
+    import json
+    import subprocess
+    import sys
+    from pathlib import Path
+    
+    # 在独立进程中测量，避免受当前进程已导入模块的影响
+    code = (
+        "import json, sys, time\n"
+        "t0 = time.perf_counter()\n"
+        "import rpa_tools\n"
+        "names = rpa_tools.get_registry().list_tools()\n"
+        "elapsed = time.perf_counter() - t0\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'tools': len(names), 'heavy': heavy}))\n"
+    )
+    
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=str(Path(__file__).resolve().parent),
+            capture_output=True, text=True, timeout=60
+        )
+        if proc.returncode != 0:
+            print(f"[FAIL] 导入失败: {proc.stderr.strip()}")
+            return False
+        
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"导入+构建注册表耗时: {report['elapsed'] * 1000:.1f} ms, 注册工具: {report['tools']} 个")
+        
+        passed = True
+        if report['heavy']:
+            print(f"[FAIL] 导入时加载了重量级依赖: {report['heavy']}")
+            passed = False
+        if report['elapsed'] > IMPORT_BUDGET_SECONDS:
+            print(f"[FAIL] 超出导入预算 {IMPORT_BUDGET_SECONDS}s")
+            passed = False
+        if passed:
+            print(f"[OK] 导入耗时在预算 {IMPORT_BUDGET_SECONDS}s 内，未加载重量级依赖")
+        return passed
+    except Exception as e:
+        print(f"[FAIL] 导入耗时检查失败: {e}")
+        return False
+
+def test_stream_aggregate():
+    """测试流式分组聚合（与pandas groupby一致，跨块/合并时类型变化不重复计数）"""
+    print("\n" + "=" * 50)
+    print("测试5: 流式分组聚合")
+    print("=" * 50)
+    
+    try:
+        import numpy as np
+        import pandas as pd
+        from rpa_tools.stream_aggregate import StreamingAggregator
+        
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            "区域": rng.choice(["华北", "华东", "华南"], 3000),
+            "金额": rng.gamma(2.0, 100.0, 3000).round(2),
+            "数量": rng.integers(1, 50, 3000),
+        })
+        agg = StreamingAggregator("区域", {"金额": ["sum", "mean", "min", "max"], "数量": "count"})
+        for start in range(0, len(df), 700):
+            agg.update(df.iloc[start:start + 700])
+        got = agg.result().set_index("区域").sort_index()
+        expected = df.groupby("区域").agg(金额_sum=("金额", "sum"), 金额_mean=("金额", "mean"),
+                                         金额_min=("金额", "min"), 金额_max=("金额", "max"),
+                                         数量_count=("数量", "count"))
+        pd.testing.assert_frame_equal(got[expected.columns], expected, check_dtype=False)
+        print("[OK] 分块聚合结果与pandas groupby一致")
+        
+        # 含空值的整数列读成float64：1/2/3 与 1.0/2.0 是同一组值
+        agg = StreamingAggregator("g", {"v": "approx_distinct"})
+        agg.update(pd.DataFrame({"g": [1, 1, 1], "v": [1, 2, 3]}))
+        agg.update(pd.DataFrame({"g": [1, 1, 1], "v": [1.0, 2.0, None]}))
+        assert agg.result()["v_approx_distinct"].iloc[0] == 3, agg.result()
+        
+        left = StreamingAggregator("g", {"v": "approx_distinct"})
+        left.update(pd.DataFrame({"g": [1, 1], "v": [5, 6]}))
+        right = StreamingAggregator("g", {"v": "approx_distinct"})
+        right.update(pd.DataFrame({"g": [1, 1], "v": pd.Series([5.0, "7"], dtype=object)}))
+        left.merge(right)
+        assert left.result()["v_approx_distinct"].iloc[0] == 3, left.result()
+        print("[OK] 类型不同的块和部分状态合并后去重计数正确")
+        return True
+    except Exception as e:
+        print(f"[FAIL] 流式分组聚合测试失败: {e!r}")
+        return False
+
+def test_infer_column_types():
+    """测试剪贴板表格类型推断（编号列保留前导零）"""
+    print("\n" + "=" * 50)
+    print("测试6: 表格类型推断")
+    print("=" * 50)
+    
+    try:
+        import pandas as pd
+        from rpa_tools.harvest_tools import infer_column_types
+        
+        df = pd.DataFrame({
+            "工号": ["001", "002", "120"],
+            "邮编": ["010020", "518000", ""],
+            "金额": ["1,200", "0.5", "3"],
+            "比例": ["10%", "0%", "5%"],
+            "日期": ["01/02/2024", "2024-03-01", "03/05/2024"],
+        })
+        result = infer_column_types(df)
+        assert result["工号"].tolist() == ["001", "002", "120"], result["工号"].tolist()
+        assert result["邮编"].iloc[0] == "010020", result["邮编"].tolist()
+        assert result["金额"].tolist() == [1200.0, 0.5, 3.0], result["金额"].tolist()
+        assert result["比例"].tolist() == [0.1, 0.0, 0.05], result["比例"].tolist()
+        assert pd.api.types.is_datetime64_any_dtype(result["日期"]), result["日期"].dtype
+        print("[OK] 编号列保留前导零，数值/百分比/日期列正确转换")
+        return True
+    except Exception as e:
+        print(f"[FAIL] 表格类型推断测试失败: {e!r}")
+        return False
+
+def test_audit_store():
+    """测试执行审计存储（追加、按工具/状态查询、大对象按引用落盘）"""
+    print("\n" + "=" * 50)
+    print("测试7: 执行审计存储")
+    print("=" * 50)
+    
+    import tempfile
+    from pathlib import Path
+    
+    try:
+        import pandas as pd
+        from rpa_tools.audit_store import AuditStore
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            store = AuditStore(str(Path(tmp) / "executions.db"))
+            df = pd.DataFrame({"金额": [1.0, 2.0]})
+            store.append("ExcelTool.read_excel", {"file_path": "a.xlsx"},
+                         {"status": "success", "message": "ok", "data": df}, duration=0.5)
+            df.loc[0, "金额"] = 99.0  # 入队后修改不影响记录
+            store.append("ExcelTool.write_excel", {"file_path": "b.xlsx"},
+                         {"status": "error", "message": "失败"})
+            store.append("ExcelToolkit.other", {}, {"status": "success"})
+            store.append("DataTool.parse_date", {"date_str": "2024-01-01"}, {"status": "success"})
+            assert store.flush(10), "flush超时"
+            
+            rows = store.query(tool="ExcelTool", include_payload=True)
+            assert sorted(r["tool"] for r in rows) == ["ExcelTool.read_excel", "ExcelTool.write_excel"], rows
+            assert [r["tool"] for r in store.query(status="error")] == ["ExcelTool.write_excel"]
+            record = store.query(tool="ExcelTool.read_excel", include_payload=True)[0]
+            assert record["duration"] == 0.5 and record["params"] == {"file_path": "a.xlsx"}
+            saved = AuditStore.load_artifact(record["result"]["data"])
+            assert saved["金额"].tolist() == [1.0, 2.0], saved
+            store.close()
+            assert store.flush(1) and store.append("x", {}, {}) is None
+        print("[OK] 追加、查询、大对象引用和关闭后行为正确")
+        return True
+    except Exception as e:
+        print(f"[FAIL] 执行审计存储测试失败: {e!r}")
+        return False
+
+def test_remote_codec():
+    """测试远程调用编解码往返、帧压缩和认证前帧大小限制"""
+    print("\n" + "=" * 50)
+    print("测试8: 远程调用编解码")
+    print("=" * 50)
+    
+    import socket
+    from datetime import date, datetime
+    
+    try:
+        import numpy as np
+        import pandas as pd
+        from rpa_tools import remote_tools as rt
+        
+        df = pd.DataFrame({"金额": [1.5, 2.0, None], "名称": ["a", None, "丙"],
+                           "日期": pd.to_datetime(["2024-01-01", "2024-02-01", "2024-03-01"])})
+        message = {"id": 7, "big": 1 << 70, "flag": True, "none": None, "bytes": b"\x00\xff",
+                   "when": datetime(2024, 5, 6, 7, 8, 9), "day": date(2024, 5, 6),
+                   "array": np.arange(12, dtype=np.int32).reshape(3, 4), "df": df,
+                   "series": pd.Series([1, 2], index=["x", "y"], name="s"), "nested": [1, "二", [3.0]]}
+        decoded = rt.decode(rt.encode(message))
+        assert {k: decoded[k] for k in ("id", "big", "flag", "none", "bytes", "when", "day", "nested")} == \
+            {k: message[k] for k in ("id", "big", "flag", "none", "bytes", "when", "day", "nested")}, decoded
+        assert decoded["array"].dtype == np.int32 and (decoded["array"] == message["array"]).all()
+        pd.testing.assert_frame_equal(decoded["df"], df)
+        pd.testing.assert_series_equal(decoded["series"], message["series"])
+        
+        a, b = socket.socketpair()
+        try:
+            rt.send_frame(a, {"data": "x" * 100000}, compress_threshold=1024)  # 压缩后很小
+            assert rt.recv_frame(b)["data"] == "x" * 100000
+            rt.send_frame(a, {"data": "x" * 100000}, compress_threshold=1024)
+            try:
+                rt.recv_frame(b, rt.MAX_AUTH_FRAME)  # 解压后超过认证前限制
+                raise AssertionError("认证前大帧未被拒绝")
+            except rt.RemoteToolError:
+                pass
+        finally:
+            a.close()
+            b.close()
+        
+        try:
+            rt.RemoteToolServer(registry=object(), host="0.0.0.0", port=0)
+            raise AssertionError("无令牌监听非回环地址未被拒绝")
+        except ValueError:
+            pass
+        assert rt.is_loopback("127.0.0.1") and rt.is_loopback("::1") and not rt.is_loopback("")
+        print("[OK] 编解码往返一致，压缩帧和认证前大小限制正确，无令牌对外监听被拒绝")
+        return True
+    except Exception as e:
+        print(f"[FAIL] 远程调用编解码测试失败: {e!r}")
+        return False
+
+def test_plan_executor():
+    """测试计划执行器（结果引用替换、失败传递给依赖步骤、上下文传入执行线程、路径锁）"""
+    print("\n" + "=" * 50)
+    print("测试9: 计划执行器")
+    print("=" * 50)
+    
+    import contextvars
+    
+    try:
+        from rpa_tools.plan_executor import PlanExecutor
+        
+        session = contextvars.ContextVar("test_session", default=None)
+        
+        def parse(text):
+            if not text.startswith("{"):
+                return {"status": "error", "message": "不是JSON"}
+            return {"status": "success", "data": {"name": text.strip("{}"), "items": [3, 4]}}
+        
+        def join(prefix, value):
+            return {"status": "success", "text": f"{prefix}-{value}", "session": session.get()}
+        
+        class FakeRegistry:
+            tools = {"parse": {"func": parse}, "join": {"func": join}}
+            
+            def get_tool(self, name):
+                return self.tools.get(name)
+        
+        plan = [
+            {"id": "a", "tool": "parse", "args": {"text": "{甲}"}},
+            {"id": "b", "tool": "join", "args": {"prefix": "${a.data.name}", "value": "${a.data.items.1}"}},
+            {"id": "bad", "tool": "parse", "args": {"text": "oops"}},
+            {"id": "c", "tool": "join", "args": {"prefix": "${bad.data.name}", "value": 1}},
+            {"id": "d", "tool": "join", "args": {"prefix": "x", "value": "${c.text}"}},
+        ]
+        session.set("会话1")
+        result = PlanExecutor(FakeRegistry(), max_workers=4).run(plan)
+        
+        results = result["results"]
+        assert results["b"]["text"] == "甲-4", results["b"]
+        assert results["b"]["session"] == "会话1", "上下文未传入执行线程"
+        status = {s["id"]: s["status"] for s in result["steps"]}
+        assert status == {"a": "success", "b": "success", "bad": "error", "c": "skipped", "d": "skipped"}, status
+        assert result["status"] == "error" and sorted(result["failed"]) == ["bad", "c", "d"], result["failed"]
+        
+        from rpa_tools.plan_executor import PlanStep
+        executor = PlanExecutor(FakeRegistry())
+        step = PlanStep("s", "join", {"template": "t.png", "save_path": "out.png", "prefix": "x"})
+        assert len([r for r in executor.resources_for(step) if r.startswith("path:")]) == 2
+        print("[OK] 引用替换、失败传递、上下文传递和路径资源推断正确")
+        return True
+    except Exception as e:
+        print(f"[FAIL] 计划执行器测试失败: {e!r}")
+        return False
+
+def test_excel_query():
+    """测试组合条件查询（条件树求值与pandas布尔运算一致、缺失值语义、校验和分块查询）"""
+    print("\n" + "=" * 50)
+    print("测试10: 组合条件查询")
+    print("=" * 50)
+    
+    try:
+        import numpy as np
+        import pandas as pd
+        from rpa_tools.excel_query import (build_mask, query_chunks, query_frame,
+                                           required_columns, validate)
+        
+        df = pd.DataFrame({
+            "区域": ["华北", "华东", None, "华南", "华东", "西北"],
+            "金额": [100.0, 250.0, 80.0, np.nan, 500.0, 300.0],
+            "编号": [1001, 1002, 2003, 2004, 1005, 3006],
+        })
+        where = {"and": [
+            {"or": [["区域", "==", "华东"], ["金额", "between", [90, 120]]]},
+            {"not": ["编号", "startswith", "2"]},
+            ["金额", "notnull"],
+        ]}
+        validate(where)
+        expected = (((df["区域"] == "华东") | df["金额"].between(90, 120))
+                    & ~df["编号"].astype(str).str.startswith("2") & df["金额"].notna())
+        assert (build_mask(df, where) == expected.to_numpy()).all(), build_mask(df, where)
+        
+        # != 和 not_in 不匹配缺失值
+        assert build_mask(df, ["区域", "!=", "华东"]).tolist() == [True, False, False, True, False, True]
+        assert build_mask(df, ["金额", "not_in", [100.0]]).tolist() == [False, True, True, False, True, True]
+        
+        for bad in ({"and": []}, ["金额", "~", 1], ["金额", ">"], ["金额", "between", 1]):
+            try:
+                validate(bad)
+                raise AssertionError(f"非法条件未被拒绝: {bad!r}")
+            except ValueError:
+                pass
+        
+        assert required_columns(where, ["编号"]) == ["编号", "区域", "金额"]
+        result = query_frame(df, where, columns=["编号"], limit=2)
+        assert result["编号"].tolist() == [1001, 1002], result
+        
+        chunks = (df.iloc[i:i + 2] for i in range(0, len(df), 2))
+        found, scanned = query_chunks(chunks, ["区域", "==", "华东"], columns=["金额"], limit=1)
+        assert found["金额"].tolist() == [250.0] and scanned == 2, (found, scanned)
+        print("[OK] 条件树求值、缺失值语义、校验和分块提前结束正确")
+        return True
+    except Exception as e:
+        print(f"[FAIL] 组合条件查询测试失败: {e!r}")
+        return False
+
 def main():
     """主测试函数"""
     print("\n" + "="*50)
@@ -98,6 +425,13 @@ def main():
     results.append(("Ollama直接调用", test_ollama_direct()))
     results.append(("LangChain集成", test_langchain_integration()))
     results.append(("RPA工具依赖", test_rpa_dependencies()))
+    results.append(("导入耗时预算", test_import_budget()))
+    results.append(("流式分组聚合", test_stream_aggregate()))
+    results.append(("表格类型推断", test_infer_column_types()))
+    results.append(("执行审计存储", test_audit_store()))
+    results.append(("远程调用编解码", test_remote_codec()))
+    results.append(("计划执行器", test_plan_executor()))
+    results.append(("组合条件查询", test_excel_query()))
     
     # 输出总结
     print("\n" + "=" * 50)